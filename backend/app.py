@@ -1,8 +1,6 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 import os
-import logging
-from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -13,17 +11,10 @@ load_dotenv(dotenv_path=env_path, override=True)
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 
-# Configurar logging
-if not os.path.exists('logs'):
-    os.mkdir('logs')
-
-file_handler = RotatingFileHandler('logs/biblioteca.log', maxBytes=10240000, backupCount=10)
-file_handler.setFormatter(logging.Formatter(
-    '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-))
-file_handler.setLevel(logging.INFO)
-app.logger.addHandler(file_handler)
-app.logger.setLevel(logging.INFO)
+# Configurar logging: JSON en logs/ escrito por un hilo aparte (ver utils/logging_pipeline.py)
+from utils.logging_pipeline import configurar_logging
+
+configurar_logging()
 app.logger.info('Biblioteca API startup')
 
 # Configurar CORS - En producción, cambiar a dominios específicos
@@ -32,13 +23,26 @@ CORS(app, resources={
     r"/api/*": {
         "origins": ALLOWED_ORIGINS,
         "methods": ["GET", "POST", "PUT", "DELETE", "PATCH"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "Last-Event-ID", "X-Leer-Primario"],
+        "expose_headers": ["ETag", "X-Leer-Primario"]
     }
 })
 
+# Métricas de Prometheus en /metrics (antes que los demás hooks)
+from utils import metrics
+
+metrics.init_app(app)
+
 # Importar controllers
+from controllers.auditoria_controller import auditoria_bp
 from controllers.auth_controller import auth_bp
+from controllers.batch_controller import batch_bp
+from controllers.cache_controller import cache_bp
+from controllers.dashboard_controller import dashboard_bp
+from controllers.evento_controller import eventos_bp
 from controllers.libro_controller import libros_bp
+from controllers.perfil_controller import perfiles_bp
+from controllers.reporte_controller import reportes_bp
 from controllers.usuario_controller import usuarios_bp
 from controllers.prestamo_controller import prestamos_bp
 
@@ -47,11 +51,59 @@ from utils.middleware import before_request_jwt
 
 app.before_request(before_request_jwt)
 
+# Profiler por muestreo (X-Profile o porcentaje configurado); usa request.user
+from utils import profiler
+
+profiler.init_app(app)
+
+# Sesión de base de datos por request (perezosa, cerrada en teardown)
+from utils import request_session
+
+request_session.init_app(app)
+
+# ETag en las respuestas JSON de GET: el cliente revalida con If-None-Match
+from utils.http import etag_condicional
+
+app.after_request(etag_condicional)
+
+# Salud: /api/health, /live y /ready leen el estado de la sonda de fondo
+from utils import health
+
+health.init_app(app)
+
 # Registrar blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(libros_bp, url_prefix='/api/libros')
 app.register_blueprint(usuarios_bp, url_prefix='/api/usuarios')
 app.register_blueprint(prestamos_bp, url_prefix='/api/prestamos')
+app.register_blueprint(cache_bp, url_prefix='/api/cache')
+app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+app.register_blueprint(batch_bp, url_prefix='/api/batch')
+app.register_blueprint(eventos_bp, url_prefix='/api/events')
+app.register_blueprint(perfiles_bp, url_prefix='/api/perfiles')
+app.register_blueprint(auditoria_bp, url_prefix='/api/auditoria')
+app.register_blueprint(reportes_bp, url_prefix='/api/reportes')
+
+# Hilos de fondo del proceso: sonda de la base, invalidación de la caché
+# local por cambios de otros workers (CACHE_BUS), escritor de auditoría y rollups de circulación. Con gunicorn --preload no se arrancan en el
+# master sino en cada worker, desde post_fork (ver gunicorn.conf.py)
+from cache.bus import iniciar_bus
+from utils.auditoria import iniciar_auditoria
+from utils.bitacora import iniciar_purga
+from utils.circulacion import iniciar_rollups
+from utils.health import iniciar_sonda
+
+
+def iniciar_procesos_de_fondo():
+    iniciar_sonda()
+    iniciar_bus()
+    iniciar_auditoria()
+    iniciar_rollups()
+    iniciar_purga()
+
+
+if not os.getenv('BIBLIOTECA_PRECARGA'):
+    iniciar_procesos_de_fondo()
 
 @app.route('/')
 def home():
@@ -62,20 +114,12 @@ def home():
             "auth": "/api/auth",
             "libros": "/api/libros",
             "usuarios": "/api/usuarios",
-            "prestamos": "/api/prestamos"
+            "prestamos": "/api/prestamos",
+            "dashboard": "/api/dashboard",
+            "events": "/api/events"
         }
     })
 
-@app.route('/api/health')
-def health():
-    """Endpoint para verificar el estado de la API"""
-    try:
-        from config.database import check_connection
-        check_connection()
-        return jsonify({"status": "healthy", "database": "connected"})
-    except Exception as e:
-        return jsonify({"status": "unhealthy", "error": str(e)}), 500
-
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint no encontrado"}), 404
@@ -0,0 +1,11 @@
+"""Micro-benchmarks de la capa de servicios sobre una base en proceso.
+
+Siembran un dataset determinista (10k, 100k o 1M libros) en SQLite o DuckDB,
+miden los caminos calientes de los servicios, guardan los resultados como
+JSON y fallan si algún caso empeora más que la tolerancia configurada
+respecto de la línea base. Uso:
+
+    cd backend
+    python -m benchmarks --tamano 10k --guardar-base
+    python -m benchmarks --tamano 10k --tolerancia 0.25
+"""
@@ -0,0 +1,128 @@
+"""CLI de los micro-benchmarks (python -m benchmarks --help)."""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session
+
+from benchmarks.cases import build_cases
+from benchmarks.dataset import parse_tamano, seed
+from benchmarks.runner import cargar, comparar, guardar, huella, medir, metadatos
+from cache import set_cache
+from config.database import create_db_engine
+
+BASELINES = Path(__file__).resolve().parent / "baselines"
+
+logger = logging.getLogger("benchmarks")
+
+
+def _tolerancias(valores):
+    tolerancias = {}
+    for valor in valores or []:
+        nombre, _, limite = valor.partition("=")
+        tolerancias[nombre] = float(limite)
+    return tolerancias
+
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--tamano", default="10k", help="10k, 100k, 1m o un número; admite lista separada por comas")
+    parser.add_argument(
+        "--url",
+        default="sqlite://",
+        help="URL de SQLAlchemy; {tamano} se reemplaza (p. ej. sqlite:///bench-{tamano}.db para reutilizar la siembra)",
+    )
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--calentamiento", type=int, default=3)
+    parser.add_argument("--casos", default="", help="Prefijos de casos a ejecutar, separados por comas")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--con-cache", action="store_true", help="Mide con la caché de entidades activa")
+    parser.add_argument("--base", help="JSON de línea base (por defecto baselines/<dialecto>-<tamano>.json)")
+    parser.add_argument("--guardar-base", action="store_true", help="Guarda el resultado como nueva línea base")
+    parser.add_argument("--salida", help="Guarda también el resultado en este archivo")
+    parser.add_argument("--tolerancia", type=float, default=0.20, help="Empeoramiento máximo de la mediana (0.20 = 20%%)")
+    parser.add_argument(
+        "--tolerancia-caso",
+        action="append",
+        metavar="CASO=VALOR",
+        help="Tolerancia específica para un caso; se puede repetir",
+    )
+    return parser.parse_args(argv)
+
+
+def ejecutar_tamano(args, etiqueta: str) -> bool:
+    libros = parse_tamano(etiqueta)
+    engine = create_db_engine(args.url.format(tamano=etiqueta))
+    sesiones = sessionmaker(bind=engine, class_=Session, autoflush=False, expire_on_commit=False)
+    dialecto = engine.dialect.name
+
+    logger.info("[%s] sembrando %d libros en %s", etiqueta, libros, dialecto)
+    cantidades = seed(engine, libros, args.semilla)
+
+    filtros = [f for f in args.casos.split(",") if f]
+    casos = [
+        caso
+        for caso in build_cases(sesiones, cantidades, args.semilla)
+        if not filtros or any(caso.nombre.startswith(f) for f in filtros)
+    ]
+
+    resultado = {"meta": metadatos(dialecto, cantidades), "casos": {}}
+    for caso in casos:
+        medicion = medir(caso, sesiones, args.repeticiones, args.calentamiento)
+        resultado["casos"][caso.nombre] = medicion
+        logger.info(
+            "[%s] %-34s mediana %10.3f ms  p95 %10.3f ms  x%.3f calibración",
+            etiqueta, caso.nombre, medicion["mediana_ms"], medicion["p95_ms"], medicion["relativo"],
+        )
+    engine.dispose()
+
+    ruta_base = Path(args.base.format(tamano=etiqueta)) if args.base else BASELINES / f"{dialecto}-{etiqueta}.json"
+    base = cargar(ruta_base)
+    regresiones = []
+    if base and not args.guardar_base:
+        if "huella" not in base.get("meta", {}):
+            logger.warning("[%s] %s no tiene calibración; regenerarla con --guardar-base", etiqueta, ruta_base)
+        regresiones = comparar(resultado, base, args.tolerancia, _tolerancias(args.tolerancia_caso))
+        resultado["regresiones"] = regresiones
+        otro_host = base["meta"].get("huella") != huella()
+        for regresion in regresiones:
+            (logger.warning if otro_host else logger.error)(
+                "[%s] REGRESIÓN %s: %s ms -> %s ms (+%.0f%% relativo a la calibración, tolerancia %.0f%%)",
+                etiqueta, regresion["caso"], regresion["base_ms"], regresion["actual_ms"],
+                regresion["cambio"] * 100, regresion["tolerancia"] * 100,
+            )
+        if otro_host and regresiones:
+            logger.warning(
+                "[%s] la línea base se midió en otro host (%s): las regresiones no hacen fallar la corrida",
+                etiqueta, base["meta"].get("huella"),
+            )
+            regresiones = []
+    elif not base and not args.guardar_base:
+        logger.warning("[%s] sin línea base en %s; use --guardar-base para crearla", etiqueta, ruta_base)
+
+    if args.guardar_base:
+        guardar(ruta_base, resultado)
+        logger.info("[%s] línea base guardada en %s", etiqueta, ruta_base)
+    if args.salida:
+        guardar(Path(args.salida.format(tamano=etiqueta)), resultado)
+    return not regresiones
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Los servicios registran cada operación; aquí solo interesan los tiempos
+    logging.getLogger("services").setLevel(logging.WARNING)
+    args = _argumentos(argv)
+    if not args.con_cache:
+        set_cache(None)
+
+    ok = True
+    for etiqueta in [t.strip().lower() for t in args.tamano.split(",") if t.strip()]:
+        ok = ejecutar_tamano(args, etiqueta) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
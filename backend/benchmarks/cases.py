@@ -0,0 +1,98 @@
+"""Casos medidos: caminos calientes de servicios, serialización y middleware."""
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from flask import Flask
+from sqlmodel import select
+
+from benchmarks.dataset import PASSWORD
+from models.libro import Libro
+from models.prestamo import Prestamo
+from services.auth_service import AuthService
+from services.inventario_service import InventarioService
+from services.libro_service import LibroService
+from services.prestamo_service import PrestamoService
+from services.usuario_service import UsuarioService
+from utils.middleware import before_request_jwt
+from utils.security import generate_token
+from utils.serializers import to_list
+
+
+@dataclass
+class Caso:
+    nombre: str
+    ejecutar: Callable
+    # Las escrituras se revierten después de medir para no alterar el dataset
+    escribe: bool = False
+    usa_sesion: bool = True
+    # 0 = las repeticiones generales de la corrida
+    repeticiones: int = 0
+
+
+def _prestamos(session):
+    service = PrestamoService(session)
+    # En SQLite/DuckDB no hay triggers: el inventario lo lleva la aplicación
+    service.inventario = InventarioService(session, modo="APLICACION", fragmentado=False)
+    return service
+
+
+def build_cases(sesiones, cantidades: Dict[str, int], semilla: int = 42) -> List[Caso]:
+    rng = random.Random(semilla)
+    libros = cantidades["libros"]
+    usuarios = cantidades["usuarios"]
+    pagina_profunda = max(libros // 100 // 2, 1)
+
+    with sesiones() as session:
+        muestra = list(session.exec(select(Libro).limit(1000)))
+        # Las escrituras se revierten: los libros con copias siguen teniéndolas en cada repetición
+        con_copias = list(session.exec(
+            select(Libro.id_libro).where(Libro.copias_disponibles > 0).limit(10_000)
+        ))
+
+    def crear_prestamo(session):
+        _prestamos(session).create(rng.choice(con_copias), rng.randint(1, usuarios), 14)
+
+    def devolver_prestamo(session):
+        id_prestamo = session.exec(
+            select(Prestamo.id_prestamo)
+            .where(Prestamo.estado == "ACTIVO")
+            .offset(rng.randrange(50))
+            .limit(1)
+        ).first()
+        _prestamos(session).devolver(id_prestamo)
+
+    app = Flask("benchmarks")
+    app.add_url_rule("/api/libros/", "libros", lambda: "")
+    token = generate_token(1, "usuario1@biblioteca.test", "BIBLIOTECARIO")
+
+    def middleware_jwt(_session):
+        with app.test_request_context(
+            "/api/libros/", headers={"Authorization": f"Bearer {token}"}
+        ):
+            if before_request_jwt() is not None:
+                raise RuntimeError("El middleware rechazó un token válido")
+
+    return [
+        Caso("libros.get_all", lambda s: LibroService(s).get_all(1, 100, None)),
+        Caso(
+            "libros.get_all_pagina_profunda",
+            lambda s: LibroService(s).get_all(pagina_profunda, 100, None),
+        ),
+        Caso("libros.search", lambda s: LibroService(s).search(titulo="secreto", limit=200)),
+        Caso("libros.search_genero", lambda s: LibroService(s).search(genero="historia", limit=200)),
+        Caso("libros.get_estadisticas", lambda s: LibroService(s).get_estadisticas()),
+        Caso("usuarios.get_pagina", lambda s: UsuarioService(s).get_pagina(limite=50)),
+        Caso("usuarios.get_pagina_prefijo", lambda s: UsuarioService(s).get_pagina(q="gar", rol="LECTOR", limite=50)),
+        Caso("prestamos.get_all", lambda s: _prestamos(s).get_all(), repeticiones=5),
+        Caso("prestamos.get_vencidos", lambda s: _prestamos(s).get_vencidos(), repeticiones=10),
+        Caso("prestamos.create", crear_prestamo, escribe=True),
+        Caso("prestamos.devolver", devolver_prestamo, escribe=True),
+        Caso(
+            "auth.login",
+            lambda s: AuthService(s).login("usuario2@biblioteca.test", PASSWORD),
+            repeticiones=5,
+        ),
+        Caso("serializers.to_list_1000", lambda _s: to_list(muestra), usa_sesion=False),
+        Caso("middleware.jwt", middleware_jwt, usa_sesion=False),
+    ]
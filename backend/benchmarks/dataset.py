@@ -0,0 +1,135 @@
+"""Dataset determinista para los benchmarks."""
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import func, insert, select, text
+
+from config.database import init_db
+from models.libro import Libro
+from models.prestamo import Prestamo
+from models.usuario import Usuario
+from utils.security import hash_password
+
+logger = logging.getLogger(__name__)
+
+TAMANOS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+PASSWORD = "benchmark123"
+LOTE = 10_000
+
+GENEROS = [
+    "Ficción", "Ciencia Ficción", "Fantasía", "Misterio", "Thriller", "Romance",
+    "Historia", "Ciencia", "Tecnología", "Filosofía", "Poesía", "Ensayo",
+]
+PALABRAS = [
+    "secreto", "historia", "sombra", "jardín", "legado", "reino", "destino",
+    "viaje", "memoria", "tormenta", "bosque", "fuego", "luna", "tiempo",
+]
+AUTORES = [
+    "García", "Rodríguez", "Martínez", "López", "González", "Pérez",
+    "Sánchez", "Ramírez", "Torres", "Flores", "Rivera", "Gómez",
+]
+
+
+def parse_tamano(valor: str) -> int:
+    valor = valor.strip().lower()
+    if valor in TAMANOS:
+        return TAMANOS[valor]
+    return int(valor)
+
+
+def proporciones(libros: int) -> Dict[str, int]:
+    """Usuarios y préstamos en proporción a los libros."""
+    return {
+        "libros": libros,
+        "usuarios": max(libros // 100, 100),
+        "prestamos": max(libros // 20, 500),
+    }
+
+
+def _ya_sembrado(engine, libros: int) -> bool:
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(Libro)).scalar() == libros
+
+
+def _insertar(connection, tabla, filas) -> None:
+    for inicio in range(0, len(filas), LOTE):
+        connection.execute(insert(tabla), filas[inicio:inicio + LOTE])
+
+
+def seed(engine, libros: int, semilla: int = 42) -> Dict[str, int]:
+    """Crea las tablas y siembra el dataset (omite la siembra si ya existe)."""
+    init_db(engine)
+    cantidades = proporciones(libros)
+    if _ya_sembrado(engine, libros):
+        return cantidades
+
+    rng = random.Random(semilla)
+    ahora = datetime(2025, 1, 1)
+    password = hash_password(PASSWORD)
+
+    usuarios = [
+        {
+            "id_usuario": i,
+            "nombre": f"{rng.choice(AUTORES)} {i}",
+            "email": f"usuario{i}@biblioteca.test",
+            "password": password,
+            "rol": "BIBLIOTECARIO" if i == 1 else "LECTOR",
+            "activo": "S",
+            "fecha_registro": ahora,
+            "version": 1,
+        }
+        for i in range(1, cantidades["usuarios"] + 1)
+    ]
+
+    copias = [rng.randint(1, 5) for _ in range(libros)]
+    disponibles = list(copias)
+    prestamos = []
+    for i in range(1, cantidades["prestamos"] + 1):
+        id_libro = rng.randint(1, libros)
+        fecha = ahora - timedelta(days=rng.randint(0, 60))
+        activo = rng.random() < 0.3 and disponibles[id_libro - 1] > 0
+        if activo:
+            disponibles[id_libro - 1] -= 1
+        prestamos.append({
+            "id_prestamo": i,
+            "id_libro": id_libro,
+            "id_usuario": rng.randint(1, cantidades["usuarios"]),
+            "fecha_prestamo": fecha,
+            "fecha_devolucion_esperada": fecha + timedelta(days=14),
+            "fecha_devolucion_real": None if activo else fecha + timedelta(days=rng.randint(1, 20)),
+            "estado": "ACTIVO" if activo else "DEVUELTO",
+        })
+
+    with engine.begin() as connection:
+        _insertar(connection, Usuario.__table__, usuarios)
+        filas = []
+        for i in range(1, libros + 1):
+            filas.append({
+                "id_libro": i,
+                "titulo": f"El {rng.choice(PALABRAS)} de {rng.choice(PALABRAS)} {i}",
+                "autor": f"{rng.choice(AUTORES)}, {rng.choice(AUTORES)}",
+                "isbn": f"978{i:010d}",
+                "anio_publicacion": rng.randint(1950, 2024),
+                "genero": rng.choice(GENEROS),
+                "numero_copias": copias[i - 1],
+                "copias_disponibles": disponibles[i - 1],
+                "fecha_registro": ahora,
+                "editorial": None,
+                "version": 1,
+            })
+            if len(filas) == LOTE:
+                _insertar(connection, Libro.__table__, filas)
+                filas = []
+        _insertar(connection, Libro.__table__, filas)
+        _insertar(connection, Prestamo.__table__, prestamos)
+        if engine.dialect.name == "duckdb":
+            # Los ids se sembraron explícitos: las secuencias de init_db siguen desde el último
+            for tabla, cantidad in ((Usuario, len(usuarios)), (Libro, libros), (Prestamo, len(prestamos))):
+                connection.execute(text(
+                    f"SELECT max(nextval('{tabla.__tablename__}_seq')) FROM range({cantidad})"
+                ))
+
+    logger.info("Dataset sembrado: %s", cantidades)
+    return cantidades
@@ -0,0 +1,148 @@
+"""Medición de casos y comparación contra líneas base JSON.
+
+Los tiempos absolutos dependen de la máquina y de su carga del momento. Por
+eso antes de cada iteración de un caso se cronometra un trabajo de
+calibración fijo (Python y SQLite en memoria, sin el código de la app). La
+comparación usa el cociente entre las medianas del caso y de su calibración,
+medidas en el mismo proceso y en el mismo intervalo. La línea base guarda
+además la huella del host: en otro host las regresiones se informan como
+advertencias y no hacen fallar la corrida.
+"""
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import sqlalchemy
+
+from benchmarks.cases import Caso
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    indice = min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)
+    return ordenados[indice]
+
+
+def _calibrar() -> float:
+    """Segundos de un trabajo fijo de CPU, representativo de lo que hacen los casos."""
+    inicio = time.perf_counter()
+    conexion = sqlite3.connect(":memory:")
+    try:
+        conexion.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, texto TEXT)")
+        conexion.executemany("INSERT INTO t (texto) VALUES (?)", ((f"libro {i}",) for i in range(1000)))
+        conexion.execute("SELECT count(*) FROM t WHERE texto LIKE '%9%'").fetchone()
+    finally:
+        conexion.close()
+    json.dumps(sorted({str(i): [i, str(i)] for i in range(2500)}.items()))
+    return time.perf_counter() - inicio
+
+
+def medir(caso: Caso, sesiones, repeticiones: int, calentamiento: int) -> Dict:
+    """Ejecuta el caso y devuelve sus estadísticas en milisegundos."""
+    repeticiones = caso.repeticiones or repeticiones
+    tiempos, calibraciones = [], []
+    for iteracion in range(calentamiento + repeticiones):
+        calibracion = _calibrar()
+        session = sesiones() if caso.usa_sesion else None
+        try:
+            inicio = time.perf_counter()
+            caso.ejecutar(session)
+            if session is not None:
+                if caso.escribe:
+                    session.flush()
+                else:
+                    session.commit()
+            transcurrido = time.perf_counter() - inicio
+        finally:
+            if session is not None:
+                session.rollback()
+                session.close()
+        if iteracion >= calentamiento:
+            tiempos.append(transcurrido * 1000)
+            calibraciones.append(calibracion * 1000)
+
+    mediana = statistics.median(tiempos)
+    calibracion_ms = statistics.median(calibraciones)
+    return {
+        "repeticiones": repeticiones,
+        "min_ms": round(min(tiempos), 3),
+        "mediana_ms": round(mediana, 3),
+        "p95_ms": round(_percentil(tiempos, 95), 3),
+        "media_ms": round(statistics.fmean(tiempos), 3),
+        "max_ms": round(max(tiempos), 3),
+        "calibracion_ms": round(calibracion_ms, 3),
+        "relativo": round(mediana / max(calibracion_ms, 1e-6), 4),
+    }
+
+
+def _modelo_cpu() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as archivo:
+            for linea in archivo:
+                if linea.startswith("model name"):
+                    return linea.partition(":")[2].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def huella() -> Dict:
+    """Lo que hace comparables dos corridas: mismo hardware e intérprete."""
+    return {
+        "sistema": platform.system(),
+        "arquitectura": platform.machine(),
+        "cpu": _modelo_cpu(),
+        "cpus": os.cpu_count(),
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "sqlalchemy": sqlalchemy.__version__,
+    }
+
+
+def metadatos(dialecto: str, cantidades: Dict[str, int]) -> Dict:
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "dialecto": dialecto,
+        "dataset": cantidades,
+        "huella": huella(),
+        "plataforma": platform.platform(),
+    }
+
+
+def guardar(ruta: Path, resultado: Dict) -> None:
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def cargar(ruta: Path) -> Optional[Dict]:
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+
+def comparar(
+    actual: Dict, base: Dict, tolerancia: float, tolerancias: Dict[str, float]
+) -> List[Dict]:
+    """Casos cuya mediana relativa supera la de la línea base por más de la tolerancia."""
+    regresiones = []
+    for nombre, medicion in actual["casos"].items():
+        anterior = base.get("casos", {}).get(nombre)
+        if not anterior or "relativo" not in anterior:
+            continue
+        limite = tolerancias.get(nombre, tolerancia)
+        cambio = medicion["relativo"] / max(anterior["relativo"], 1e-6) - 1
+        medicion["cambio"] = round(cambio, 4)
+        if cambio > limite:
+            regresiones.append({
+                "caso": nombre,
+                "base_ms": anterior["mediana_ms"],
+                "actual_ms": medicion["mediana_ms"],
+                "cambio": round(cambio, 4),
+                "tolerancia": limite,
+            })
+    return regresiones
@@ -0,0 +1,241 @@
+"""Caché read-through para lecturas de entidades de los servicios.
+
+Se guardan los dicts ya serializados que devuelven los servicios (no
+entidades del ORM, que dependen de su sesión). Las claves tienen la forma
+``familia:identificador`` (``libro:42``, ``usuario:7``) o solo ``familia``
+(``generos``, ``estadisticas``); las estadísticas de aciertos se agregan por
+familia. Las escrituras registran sus claves con ``invalidar_al_confirmar`` y
+se eliminan cuando la transacción confirma.
+"""
+import contextvars
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache.backends import MemoriaBackend, RedisBackend
+from config.settings import (
+    CACHE_BACKEND,
+    CACHE_MAX_MB,
+    CACHE_PREFIJO,
+    CACHE_TTL_ESTADISTICAS_S,
+    CACHE_TTL_S,
+    CACHE_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+_PENDIENTES = "cache_invalidar"
+
+_ttl_maximo = contextvars.ContextVar("cache_ttl_maximo", default=None)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Tipo no serializable en caché: {type(value).__name__}")
+
+
+def clave(familia: str, identificador=None) -> str:
+    return familia if identificador is None else f"{familia}:{identificador}"
+
+
+def _familia(clave_: str) -> str:
+    return clave_.split(":", 1)[0]
+
+
+@contextmanager
+def ttl_maximo(segundos: int):
+    """Acota el TTL de lo que se guarde dentro del bloque.
+
+    Se usa en las lecturas servidas por la réplica, que pueden estar
+    atrasadas respecto de una invalidación ya procesada.
+    """
+    token = _ttl_maximo.set(segundos)
+    try:
+        yield
+    finally:
+        _ttl_maximo.reset(token)
+
+
+class _ContadorFamilia:
+    __slots__ = ("aciertos", "fallos", "invalidaciones", "errores")
+
+    def __init__(self):
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self.errores = 0
+
+
+class Cache:
+    def __init__(self, backend, ttl: int, ttl_por_familia: Optional[Dict[str, int]] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.ttl_por_familia = ttl_por_familia or {}
+        self._contadores: Dict[str, _ContadorFamilia] = {}
+        self._lock = threading.Lock()
+
+    def _sumar(self, familia: str, campo: str) -> None:
+        # += no es atómico entre hilos: sin el lock se pierden incrementos
+        with self._lock:
+            contador = self._contadores.get(familia)
+            if contador is None:
+                contador = self._contadores[familia] = _ContadorFamilia()
+            setattr(contador, campo, getattr(contador, campo) + 1)
+
+    def obtener(self, clave_: str, cargar: Callable, ttl: Optional[int] = None):
+        """Devuelve el valor cacheado o lo carga, guarda y devuelve."""
+        familia = _familia(clave_)
+        try:
+            guardado = self.backend.get(clave_)
+        except Exception as error:
+            self._sumar(familia, "errores")
+            logger.warning("Caché no disponible al leer %s: %s", clave_, error)
+            return cargar()
+
+        if guardado is not None:
+            self._sumar(familia, "aciertos")
+            return json.loads(guardado)
+
+        self._sumar(familia, "fallos")
+        valor = cargar()
+        ttl = ttl or self.ttl_por_familia.get(familia, self.ttl)
+        if _ttl_maximo.get() is not None:
+            ttl = min(ttl, _ttl_maximo.get())
+        try:
+            self.backend.set(
+                clave_,
+                json.dumps(valor, default=_json_default).encode("utf-8"),
+                ttl,
+            )
+        except Exception as error:
+            self._sumar(familia, "errores")
+            logger.warning("Caché no disponible al escribir %s: %s", clave_, error)
+        return valor
+
+    def invalidar(self, *claves: str) -> None:
+        if not claves:
+            return
+        for clave_ in claves:
+            self._sumar(_familia(clave_), "invalidaciones")
+        try:
+            self.backend.delete(*claves)
+        except Exception as error:
+            logger.warning("Caché no disponible al invalidar %s: %s", claves, error)
+
+    def invalidar_familia(self, familia: str) -> None:
+        self._sumar(familia, "invalidaciones")
+        try:
+            self.backend.delete_familia(familia)
+        except Exception as error:
+            logger.warning("Caché no disponible al invalidar la familia %s: %s", familia, error)
+
+    def invalidar_al_confirmar(self, session, *claves: str) -> None:
+        """Invalida ahora y otra vez cuando la transacción de session confirme.
+
+        La primera invalidación cubre lecturas posteriores en la misma
+        transacción; la segunda, a otra request que haya vuelto a cachear el
+        valor viejo mientras la transacción seguía abierta.
+        """
+        self.invalidar(*claves)
+        session.info.setdefault(_PENDIENTES, set()).update(claves)
+
+    def limpiar(self) -> None:
+        self.backend.clear()
+
+    def contadores(self) -> Dict[str, Dict[str, int]]:
+        """Contadores por familia, sin consultar el backend (para /metrics)."""
+        with self._lock:
+            return {
+                familia: {campo: getattr(contador, campo) for campo in _ContadorFamilia.__slots__}
+                for familia, contador in self._contadores.items()
+            }
+
+    def estadisticas(self) -> Dict:
+        familias = {}
+        for familia, contador in sorted(self.contadores().items()):
+            lecturas = contador["aciertos"] + contador["fallos"]
+            familias[familia] = {
+                **contador,
+                "tasa_aciertos": round(contador["aciertos"] / lecturas, 4) if lecturas else None,
+            }
+        try:
+            almacenamiento = self.backend.info()
+        except Exception as error:
+            almacenamiento = {"backend": self.backend.nombre, "error": str(error)}
+        return {"almacenamiento": almacenamiento, "familias": familias}
+
+
+class _SinCache(Cache):
+    """Cache nula (CACHE_BACKEND=ninguno): siempre carga desde la base."""
+
+    def __init__(self):
+        super().__init__(backend=None, ttl=0)
+
+    def obtener(self, clave_, cargar, ttl=None):
+        return cargar()
+
+    def invalidar(self, *claves):
+        return None
+
+    def invalidar_familia(self, familia):
+        return None
+
+    def limpiar(self):
+        return None
+
+    def estadisticas(self):
+        return {"almacenamiento": {"backend": "ninguno"}, "familias": {}}
+
+
+_cache: Optional[Cache] = None
+_cache_lock = threading.Lock()
+
+
+def _crear_cache() -> Cache:
+    # Agregados que no siempre se invalidan por clave: TTL corto
+    ttl_por_familia = {
+        familia: CACHE_TTL_ESTADISTICAS_S
+        for familia in ("estadisticas", "dashboard", "dashboard_lector", "libros_disponibles")
+    }
+    if CACHE_BACKEND == "ninguno":
+        return _SinCache()
+    if CACHE_BACKEND == "redis":
+        return Cache(RedisBackend(CACHE_URL, CACHE_PREFIJO), CACHE_TTL_S, ttl_por_familia)
+    if CACHE_BACKEND == "memoria":
+        return Cache(MemoriaBackend(int(CACHE_MAX_MB * 1024 * 1024)), CACHE_TTL_S, ttl_por_familia)
+    raise RuntimeError(f"CACHE_BACKEND inválido: {CACHE_BACKEND} (memoria, redis o ninguno)")
+
+
+def set_cache(cache: Optional[Cache]) -> None:
+    """Reemplaza la caché del proceso; None la desactiva (benchmarks y scripts)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache if cache is not None else _SinCache()
+
+
+def get_cache() -> Cache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _crear_cache()
+    return _cache
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_confirmadas(session):
+    claves = session.info.pop(_PENDIENTES, None)
+    if claves:
+        get_cache().invalidar(*claves)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session):
+    session.info.pop(_PENDIENTES, None)
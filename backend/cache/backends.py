@@ -0,0 +1,126 @@
+"""Backends de almacenamiento para la caché de entidades."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class MemoriaBackend:
+    """LRU en proceso con expiración por entrada y tope de memoria.
+
+    Guarda los valores ya serializados (bytes), de modo que el tamaño contado
+    es exacto y cada lectura devuelve una copia independiente.
+    """
+
+    nombre = "memoria"
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._expulsiones = 0
+        self._lock = threading.Lock()
+
+    def get(self, clave: str) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira <= time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave: str, valor: bytes, ttl: int) -> None:
+        tamano = len(clave) + len(valor)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                antigua = next(iter(self._datos))
+                self._quitar(antigua)
+                self._expulsiones += 1
+
+    def delete(self, *claves: str) -> None:
+        with self._lock:
+            for clave in claves:
+                self._quitar(clave)
+
+    def delete_familia(self, familia: str) -> None:
+        prefijo = familia + ":"
+        with self._lock:
+            for clave in [c for c in self._datos if c == familia or c.startswith(prefijo)]:
+                self._quitar(clave)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def _quitar(self, clave: str) -> None:
+        entrada = self._datos.pop(clave, None)
+        if entrada is not None:
+            self._bytes -= len(clave) + len(entrada[1])
+
+    def info(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": self.nombre,
+                "entradas": len(self._datos),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "expulsiones": self._expulsiones,
+            }
+
+
+class RedisBackend:
+    """Caché compartida entre procesos y nodos sobre Redis (dependencia opcional).
+
+    El tope de memoria lo aplica el propio servidor (maxmemory +
+    maxmemory-policy allkeys-lru, ver docker-compose.yml).
+    """
+
+    nombre = "redis"
+
+    def __init__(self, url: str, prefijo: str):
+        try:
+            import redis
+        except ImportError as error:
+            raise RuntimeError(
+                "CACHE_BACKEND=redis requiere el paquete 'redis' (pip install redis)"
+            ) from error
+        self.prefijo = prefijo
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, clave: str) -> Optional[bytes]:
+        return self._cliente.get(self.prefijo + clave)
+
+    def set(self, clave: str, valor: bytes, ttl: int) -> None:
+        self._cliente.set(self.prefijo + clave, valor, ex=ttl)
+
+    def delete(self, *claves: str) -> None:
+        if claves:
+            self._cliente.delete(*(self.prefijo + clave for clave in claves))
+
+    def delete_familia(self, familia: str) -> None:
+        claves = list(self._cliente.scan_iter(match=f"{self.prefijo}{familia}:*", count=500))
+        self._cliente.delete(self.prefijo + familia, *claves)
+
+    def clear(self) -> None:
+        claves = list(self._cliente.scan_iter(match=self.prefijo + "*", count=500))
+        if claves:
+            self._cliente.delete(*claves)
+
+    def info(self) -> Dict:
+        memoria = self._cliente.info("memory")
+        return {
+            "backend": self.nombre,
+            "bytes": memoria.get("used_memory"),
+            "max_bytes": memoria.get("maxmemory"),
+            "politica": memoria.get("maxmemory_policy"),
+        }
@@ -0,0 +1,259 @@
+"""Bus de invalidación de la caché local entre workers y nodos.
+
+Cada proceso mantiene su propia caché en memoria; una escritura atendida por
+otro worker solo se ve aquí cuando la entrada expira. El bus escucha los
+cambios de LIBROS, USUARIOS y PRESTAMOS en la base y elimina solo las claves
+afectadas, lo que permite usar TTL largos:
+
+- ``cqn``: Continuous Query Notification mediante suscripciones de
+  python-oracledb (requiere modo thick y ``GRANT CHANGE NOTIFICATION``).
+  Si la suscripción falla se pasa al sondeo.
+- ``sondeo``: lee cada CACHE_BUS_INTERVALO_S la bitácora CAMBIOS_ENTIDADES
+  que alimentan los triggers de 12_bitacora_cambios.sql.
+
+La purga de la bitácora no depende del bus: ver utils/bitacora.py.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from cache import clave, get_cache
+from config.database import DB_HOST, DB_PASSWORD, DB_PORT, DB_SERVICE, DB_USER, get_session
+from config.settings import CACHE_BUS, CACHE_BUS_INTERVALO_S
+from models.cambio_entidad import CambioEntidad
+from repositories.cambio_repository import CambioEntidadRepository
+
+logger = logging.getLogger(__name__)
+
+# Claves sin identificador que dependen de cada tabla
+FAMILIAS_AGREGADAS = {
+    "LIBROS": ("estadisticas", "generos", "dashboard", "libros_disponibles"),
+    "PRESTAMOS": ("estadisticas", "dashboard", "libros_disponibles"),
+    "USUARIOS": (),
+}
+
+
+def claves_afectadas(tabla: str, id_registro: Optional[int], id_libro: Optional[int]) -> List[str]:
+    claves = list(FAMILIAS_AGREGADAS.get(tabla, ()))
+    if tabla == "LIBROS" and id_registro is not None:
+        claves.append(clave("libro", id_registro))
+    elif tabla == "PRESTAMOS" and id_libro is not None:
+        claves.append(clave("libro", id_libro))
+    elif tabla == "USUARIOS" and id_registro is not None:
+        claves.append(clave("usuario", id_registro))
+    return claves
+
+
+def _familia_de_tabla(tabla: str) -> str:
+    return {"LIBROS": "libro", "PRESTAMOS": "libro", "USUARIOS": "usuario"}[tabla]
+
+
+class SondeoBitacora:
+    """Lee CAMBIOS_ENTIDADES por id creciente y evicta las claves afectadas.
+
+    Un id menor puede confirmarse después que uno mayor (transacciones
+    concurrentes, como una devolución en lote de cientos de filas); los
+    huecos se guardan como rangos, sin importar su tamaño, y se vuelven a
+    consultar durante ESPERA_HUECOS_S. Si se acumulan más de MAX_HUECOS
+    rangos se descartan y se llama a ``huecos_descartados``. Las subclases
+    cambian qué se hace con cada lote en ``procesar``.
+    """
+
+    LIMITE_LOTE = 1000
+    ESPERA_HUECOS_S = 30
+    MAX_HUECOS = 200
+
+    def __init__(self, cache, intervalo_s: float):
+        self.cache = cache
+        self.intervalo_s = intervalo_s
+        self._ultimo: Optional[int] = None
+        # (desde, hasta) inclusivo -> cuándo se vio el hueco
+        self._huecos: Dict[Tuple[int, int], float] = {}
+
+    def ejecutar(self, detener: threading.Event) -> None:
+        while not detener.is_set():
+            try:
+                completo = self.sondear()
+            except Exception as error:
+                logger.warning("Sondeo de la bitácora de cambios falló: %s", error)
+                completo = True
+            if completo:
+                detener.wait(self.intervalo_s)
+
+    def sondear(self) -> bool:
+        """Procesa un lote; devuelve False si quedaron cambios por leer."""
+        with get_session() as session:
+            repo = CambioEntidadRepository(session)
+            if self._ultimo is None:
+                # Al arrancar la caché está vacía: no hace falta releer el historial
+                self._ultimo = repo.get_ultimo_id()
+                return True
+            cambios = repo.get_posteriores(self._ultimo, list(self._huecos), self.LIMITE_LOTE)
+            self.procesar(session, cambios)
+
+        self._avanzar(cambio.id_cambio for cambio in cambios)
+        return len(cambios) < self.LIMITE_LOTE
+
+    def procesar(self, session, cambios: List[CambioEntidad]) -> None:
+        """Evicta de la caché las claves afectadas por el lote."""
+        claves = set()
+        for cambio in cambios:
+            claves.update(claves_afectadas(cambio.tabla, cambio.id_registro, cambio.id_libro))
+        if claves:
+            self.cache.invalidar(*claves)
+
+    def huecos_descartados(self) -> None:
+        """Se dejaron de seguir huecos: pudo perderse algún cambio, se vacía la caché."""
+        self.cache.limpiar()
+
+    def _avanzar(self, ids: Iterable[int]) -> None:
+        ahora = time.monotonic()
+        for id_cambio in sorted(ids):
+            if id_cambio <= self._ultimo:
+                self._llenar_hueco(id_cambio)
+                continue
+            if id_cambio > self._ultimo + 1:
+                self._huecos[(self._ultimo + 1, id_cambio - 1)] = ahora
+            self._ultimo = id_cambio
+
+        vencidos = [h for h, visto in self._huecos.items() if ahora - visto > self.ESPERA_HUECOS_S]
+        for hueco in vencidos:
+            del self._huecos[hueco]
+        if len(self._huecos) > self.MAX_HUECOS:
+            logger.warning(
+                "Bitácora de cambios: %d huecos sin confirmar; se descartan", len(self._huecos)
+            )
+            self._huecos.clear()
+            self.huecos_descartados()
+
+    def _llenar_hueco(self, id_cambio: int) -> None:
+        """Quita id_cambio del rango que lo contiene, partiéndolo si hace falta."""
+        for desde, hasta in self._huecos:
+            if desde <= id_cambio <= hasta:
+                visto = self._huecos.pop((desde, hasta))
+                if desde < id_cambio:
+                    self._huecos[(desde, id_cambio - 1)] = visto
+                if id_cambio < hasta:
+                    self._huecos[(id_cambio + 1, hasta)] = visto
+                return
+
+
+class NotificacionesOracle:
+    """Suscripción CQN sobre LIBROS, USUARIOS y PRESTAMOS.
+
+    Oracle notifica ROWIDs; se traducen a claves con una consulta por tabla.
+    Para borrados (la fila ya no existe) o notificaciones sin filas se
+    invalida la familia completa.
+    """
+
+    CONSULTAS = {
+        "LIBROS": "SELECT id_libro FROM libros",
+        "USUARIOS": "SELECT id_usuario FROM usuarios",
+        "PRESTAMOS": "SELECT id_prestamo, id_libro FROM prestamos",
+    }
+    IDS_POR_ROWID = {
+        "LIBROS": "SELECT id_libro, NULL FROM libros WHERE ROWID IN ({})",
+        "USUARIOS": "SELECT id_usuario, NULL FROM usuarios WHERE ROWID IN ({})",
+        "PRESTAMOS": "SELECT id_prestamo, id_libro FROM prestamos WHERE ROWID IN ({})",
+    }
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def ejecutar(self, detener: threading.Event) -> None:
+        import oracledb
+
+        connection = oracledb.connect(
+            user=DB_USER,
+            password=DB_PASSWORD,
+            dsn=f"{DB_HOST}:{DB_PORT}/{DB_SERVICE}",
+            events=True,
+        )
+        try:
+            subscription = connection.subscribe(
+                callback=self._notificacion,
+                operations=oracledb.OPCODE_ALLOPS,
+                qos=oracledb.SUBSCR_QOS_ROWIDS | oracledb.SUBSCR_QOS_RELIABLE,
+                client_initiated=True,
+            )
+            for consulta in self.CONSULTAS.values():
+                subscription.registerquery(consulta)
+            logger.info("Bus de caché: suscripción CQN registrada")
+            detener.wait()
+            connection.unsubscribe(subscription)
+        finally:
+            connection.close()
+
+    def _notificacion(self, message) -> None:
+        import oracledb
+
+        for table in getattr(message, "tables", []):
+            tabla = table.name.split(".")[-1].upper()
+            if tabla not in self.CONSULTAS:
+                continue
+            rowids = [
+                row.rowid
+                for row in table.rows or []
+                if not row.operation & oracledb.OPCODE_DELETE
+            ]
+            if not table.rows or len(rowids) < len(table.rows):
+                self.cache.invalidar_familia(_familia_de_tabla(tabla))
+                for familia in FAMILIAS_AGREGADAS[tabla]:
+                    self.cache.invalidar(familia)
+            if rowids:
+                self._invalidar_rowids(tabla, rowids)
+
+    def _invalidar_rowids(self, tabla: str, rowids: List[str]) -> None:
+        marcadores = ", ".join(f":r{i}" for i in range(len(rowids)))
+        consulta = text(self.IDS_POR_ROWID[tabla].format(marcadores))
+        with get_session() as session:
+            filas = session.execute(
+                consulta, {f"r{i}": rowid for i, rowid in enumerate(rowids)}
+            ).all()
+        claves = set()
+        for id_registro, id_libro in filas:
+            claves.update(claves_afectadas(tabla, id_registro, id_libro))
+        if claves:
+            self.cache.invalidar(*claves)
+
+
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _ejecutar(modo: str) -> None:
+    cache = get_cache()
+    if modo == "cqn":
+        try:
+            NotificacionesOracle(cache).ejecutar(_detener)
+            return
+        except Exception as error:
+            logger.warning("Bus de caché: CQN no disponible (%s); se usa sondeo", error)
+    SondeoBitacora(cache, CACHE_BUS_INTERVALO_S).ejecutar(_detener)
+
+
+def iniciar_bus() -> None:
+    """Arranca el hilo del bus en este proceso (idempotente y seguro tras fork)."""
+    global _hilo, _pid
+    # "auto" sin resolver: un solo proceso (flask run, scripts), no hay a quién avisar
+    if CACHE_BUS in ("ninguno", "auto"):
+        return
+    with _lock:
+        if _pid == os.getpid() and _hilo is not None and _hilo.is_alive():
+            return
+        _detener.clear()
+        _pid = os.getpid()
+        _hilo = threading.Thread(
+            target=_ejecutar, args=(CACHE_BUS,), name="cache-bus", daemon=True
+        )
+        _hilo.start()
+
+
+def detener_bus() -> None:
+    _detener.set()
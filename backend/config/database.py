@@ -1,34 +1,166 @@
-"""Configuración de conexión a Oracle Database usando SQLModel (SQLAlchemy)."""
+"""Configuración de conexión a la base de datos usando SQLModel (SQLAlchemy).
+
+Por defecto se conecta a Oracle con DB_USER/DB_HOST/...; DB_URL permite usar
+cualquier URL de SQLAlchemy, por ejemplo ``sqlite://`` o ``duckdb:///:memory:``
+(requiere duckdb-engine) para pruebas y benchmarks en proceso. Con esos
+motores no hay triggers: usar INVENTARIO_MODO=APLICACION.
+"""
+import logging
 import os
 from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
-from sqlalchemy import text
-from sqlalchemy.engine import URL
+from sqlalchemy import DefaultClause, Integer, event, literal, select, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
 from sqlmodel import Session, SQLModel, create_engine
 
+from config.settings import INVENTARIO_MODO
+from utils.sql_instrumentation import instrumentar
+
 # Cargar .env desde el directorio raíz del proyecto
 env_path = Path(__file__).resolve().parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path, override=True)
 
+logger = logging.getLogger(__name__)
+
+# URL completa de SQLAlchemy; si se define, reemplaza a DB_USER/DB_HOST/...
+DB_URL = os.getenv('DB_URL', '')
+
 DB_USER = os.getenv('DB_USER')
 DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_HOST = os.getenv('DB_HOST', 'localhost')
 DB_PORT = os.getenv('DB_PORT', '1521')
 DB_SERVICE = os.getenv('DB_SERVICE', 'XEPDB1')
 
-_database_url = URL.create(
-    "oracle+oracledb",
-    username=DB_USER,
-    password=DB_PASSWORD,
-    host=DB_HOST,
-    port=int(DB_PORT) if DB_PORT else None,
-    query={"service_name": DB_SERVICE},
+# Réplica de solo lectura opcional (Active Data Guard u otra instancia)
+DB_REPLICA_URL = os.getenv('DB_REPLICA_URL', '')
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST', '')
+DB_REPLICA_PORT = os.getenv('DB_REPLICA_PORT', DB_PORT)
+DB_REPLICA_SERVICE = os.getenv('DB_REPLICA_SERVICE', DB_SERVICE)
+DB_REPLICA_USER = os.getenv('DB_REPLICA_USER', DB_USER)
+DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD', DB_PASSWORD)
+# Retraso máximo tolerado antes de volver al primario, cada cuánto se mide y
+# cuánto tiempo lee del primario un usuario después de escribir
+DB_REPLICA_MAX_LAG_S = float(os.getenv('DB_REPLICA_MAX_LAG_S', '5'))
+DB_REPLICA_CHECK_S = float(os.getenv('DB_REPLICA_CHECK_S', '5'))
+DB_REPLICA_STICKY_S = float(os.getenv('DB_REPLICA_STICKY_S', '5'))
+
+# Pool por proceso (cada worker de gunicorn tiene el suyo; ver gunicorn.conf.py)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT_S = float(os.getenv('DB_POOL_TIMEOUT_S', '30'))
+
+# Reintentos ante conflictos de versión (concurrencia optimista)
+CONFLICT_RETRIES = int(os.getenv('DB_CONFLICT_RETRIES', '3'))
+
+
+
+def oracle_url(user, password, host, port, service) -> URL:
+    return URL.create(
+        "oracle+oracledb",
+        username=user,
+        password=password,
+        host=host,
+        port=int(port) if port else None,
+        query={"service_name": service},
+    )
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _rowcount_duckdb(conn, cursor, statement, parameters, context, executemany):
+    """DuckDB informa las filas de un INSERT/UPDATE/DELETE como resultado y
+    deja rowcount en -1; los repositorios usan rowcount para detectar, por
+    ejemplo, un libro sin copias."""
+    sentencia = statement.lstrip()[:6].upper()
+    if executemany or sentencia not in ("INSERT", "UPDATE", "DELETE") or "RETURNING" in statement.upper():
+        return
+    fila = cursor.fetchone()
+    context._rowcount = fila[0] if fila else 0
+
+
+def _sin_bloqueos_de_fila(dialect) -> None:
+    """DuckDB no admite SELECT ... FOR UPDATE: un solo escritor por proceso y
+    control optimista, así que el bloqueo se omite al compilar."""
+
+    class Compilador(dialect.statement_compiler):
+        def for_update_clause(self, select, **kw):
+            return ""
+
+    dialect.statement_compiler = Compilador
+
+
+def create_db_engine(url):
+    """Crea el engine instrumentado con las opciones de su dialecto."""
+    new_engine = _crear_engine(url)
+    instrumentar(new_engine)
+    return new_engine
+
+
+def _crear_engine(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    en_memoria = url.database in (None, "", ":memory:")
+
+    if backend == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}
+        if en_memoria:
+            # Una sola conexión compartida: cada conexión nueva sería otra base vacía
+            options["poolclass"] = StaticPool
+        new_engine = create_engine(url, echo=False, **options)
+        event.listen(new_engine, "connect", _sqlite_pragmas)
+        return new_engine
+
+    if backend == "duckdb":
+        options = {"poolclass": StaticPool} if en_memoria else {}
+        new_engine = create_engine(url, echo=False, **options)
+        event.listen(new_engine, "after_cursor_execute", _rowcount_duckdb)
+        _sin_bloqueos_de_fila(new_engine.dialect)
+        return new_engine
+
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_S,
+        echo=False,
+    )
+
+
+engine = create_db_engine(
+    DB_URL or oracle_url(DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE)
 )
 
-engine = create_engine(_database_url, pool_pre_ping=True, echo=False)
+if engine.dialect.name != "oracle" and INVENTARIO_MODO == "TRIGGER":
+    logger.warning(
+        "%s no tiene los triggers de inventario: "
+        "use INVENTARIO_MODO=APLICACION para mantener copias_disponibles",
+        engine.dialect.name,
+    )
+
+# Engine propio de la sonda de salud (utils/health.py): una sola conexión,
+# fuera del pool de las requests, para que un pool saturado no demore la sonda
+# ni se cuente como caída de la base. SQLite y DuckDB no tienen esa espera.
+if engine.dialect.name in ("sqlite", "duckdb"):
+    sonda_engine = engine
+else:
+    sonda_engine = create_engine(
+        engine.url,
+        pool_pre_ping=True,
+        pool_size=1,
+        max_overflow=0,
+        echo=False,
+    )
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -38,6 +170,27 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+replica_engine = None
+ReplicaSessionLocal = None
+if DB_REPLICA_URL or DB_REPLICA_HOST:
+    replica_engine = create_db_engine(
+        DB_REPLICA_URL
+        or oracle_url(
+            DB_REPLICA_USER,
+            DB_REPLICA_PASSWORD,
+            DB_REPLICA_HOST,
+            DB_REPLICA_PORT,
+            DB_REPLICA_SERVICE,
+        )
+    )
+    ReplicaSessionLocal = sessionmaker(
+        bind=replica_engine,
+        class_=Session,
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
 
 @contextmanager
 def get_session():
@@ -53,13 +206,92 @@ def get_session():
         session.close()
 
 
-def check_connection() -> None:
-    """Verifica que la conexión a la base de datos sea funcional."""
-    with engine.connect() as connection:
-        connection.execute(text("SELECT 1 FROM DUAL"))
+def run_in_session(operation, retries: int = CONFLICT_RETRIES):
+    """Ejecuta operation(session) en una transacción propia, reintentando si
+    otra transacción modificó las mismas filas entre la lectura y el UPDATE.
+
+    Solo para operaciones que releen y recalculan todo en cada intento; si el
+    último intento también choca, el StaleDataError llega al controller (409).
+    """
+    for attempt in range(1, max(retries, 1) + 1):
+        try:
+            with get_session() as session:
+                return operation(session)
+        except StaleDataError:
+            if attempt >= retries:
+                raise
+
+
+def dispose_engines() -> None:
+    """Descarta las conexiones heredadas del proceso padre (después de un fork).
+
+    close=False: los sockets siguen siendo del padre; el hijo solo deja de
+    usarlos y abre los suyos.
+    """
+    engine.dispose(close=False)
+    if sonda_engine is not engine:
+        sonda_engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.dispose(close=False)
+
+
+def calentar_engines() -> None:
+    """Abre y devuelve al pool una conexión del primario y otra de la réplica.
+
+    Así la primera request del worker no paga el login en Oracle.
+    """
+    for motor in (engine, replica_engine):
+        if motor is not None:
+            with motor.connect():
+                pass
+
+
+def check_connection(timeout_s: Optional[float] = None) -> None:
+    """Verifica que la conexión a la base de datos sea funcional.
+
+    Usa la conexión propia de la sonda, no el pool de las requests. Con
+    timeout_s, en Oracle la consulta se corta si el servidor no responde
+    (call_timeout del driver).
+    """
+    with sonda_engine.connect() as connection:
+        driver = connection.connection.dbapi_connection
+        limitar = timeout_s is not None and hasattr(driver, "call_timeout")
+        if limitar:
+            driver.call_timeout = int(timeout_s * 1000)
+        try:
+            # En Oracle se compila como SELECT 1 FROM DUAL
+            connection.execute(select(literal(1)))
+        finally:
+            if limitar:
+                driver.call_timeout = 0
+
+
+def _secuencias_duckdb(target) -> None:
+    """DuckDB no tiene columnas autoincrementales: usa una secuencia por tabla."""
+    with target.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            claves = list(table.primary_key.columns)
+            if len(claves) != 1 or not isinstance(claves[0].type, Integer):
+                continue
+            columna = claves[0]
+            secuencia = f"{table.name}_seq"
+            siguiente = f"nextval('{secuencia}')"
+            # Un engine anterior ya pudo asignar el default: la metadata es global
+            propio = columna.server_default is not None and str(columna.server_default.arg) == siguiente
+            if columna.autoincrement is False or (columna.server_default is not None and not propio):
+                continue
+            connection.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {secuencia}"))
+            if not propio:
+                DefaultClause(text(siguiente))._set_parent_with_dispatch(columna)
+
 
+def init_db(target=None) -> None:
+    """Crea las tablas si no existen (solo para entornos de prueba).
 
-def init_db() -> None:
-    """Crea las tablas si no existen (solo para entornos de prueba)."""
+    En Oracle el esquema real lo crean los scripts de database/.
+    """
     import models  # noqa: F401  (registra las entidades en la metadata)
-    SQLModel.metadata.create_all(engine)
+    target = target or engine
+    if target.dialect.name == "duckdb":
+        _secuencias_duckdb(target)
+    SQLModel.metadata.create_all(target)
@@ -0,0 +1,147 @@
+"""Parámetros de la aplicación configurables por variables de entorno."""
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Cargar .env desde el directorio raíz del proyecto
+env_path = Path(__file__).resolve().parent.parent.parent / '.env'
+load_dotenv(dotenv_path=env_path, override=True)
+
+# Quién mantiene LIBROS.COPIAS_DISPONIBLES:
+#   TRIGGER    -> los triggers de 03_triggers.sql (comportamiento histórico)
+#   APLICACION -> PrestamoService con sentencias set-based (ver 09_inventario_sin_triggers.sql)
+INVENTARIO_MODO = os.getenv('INVENTARIO_MODO', 'TRIGGER').strip().upper()
+INVENTARIO_MODOS_VALIDOS = ('TRIGGER', 'APLICACION')
+
+# Contador fragmentado para libros con alta contención (requiere 10_inventario_slots.sql)
+INVENTARIO_FRAGMENTADO = os.getenv('INVENTARIO_FRAGMENTADO', 'false').lower() == 'true'
+INVENTARIO_SLOTS = int(os.getenv('INVENTARIO_SLOTS', '8'))
+# Un libro se fragmenta cuando acumula CONTENCION_EVENTOS esperas de más de
+# CONTENCION_MS sobre su fila dentro de CONTENCION_VENTANA_S segundos.
+INVENTARIO_CONTENCION_MS = float(os.getenv('INVENTARIO_CONTENCION_MS', '50'))
+INVENTARIO_CONTENCION_EVENTOS = int(os.getenv('INVENTARIO_CONTENCION_EVENTOS', '5'))
+INVENTARIO_CONTENCION_VENTANA_S = float(os.getenv('INVENTARIO_CONTENCION_VENTANA_S', '60'))
+
+# Caché de lecturas de entidades: memoria (por proceso), redis (compartida) o ninguno
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memoria').strip().lower()
+CACHE_URL = os.getenv('CACHE_URL', 'redis://localhost:6379/0')
+CACHE_PREFIJO = os.getenv('CACHE_PREFIJO', 'biblioteca:')
+CACHE_TTL_S = int(os.getenv('CACHE_TTL_S', '60'))
+CACHE_TTL_ESTADISTICAS_S = int(os.getenv('CACHE_TTL_ESTADISTICAS_S', '30'))
+CACHE_MAX_MB = float(os.getenv('CACHE_MAX_MB', '64'))
+
+# Bus de invalidación entre workers (ver cache/bus.py y 12_bitacora_cambios.sql):
+#   auto    -> sondeo si gunicorn.conf.py arranca varios workers con
+#              CACHE_BACKEND=memoria; ninguno en un solo proceso
+#   ninguno -> cada worker solo ve sus propias escrituras hasta que expire el TTL
+#   sondeo  -> lee la bitácora CAMBIOS_ENTIDADES cada CACHE_BUS_INTERVALO_S
+#   cqn     -> Continuous Query Notification de Oracle, con sondeo como respaldo
+CACHE_BUS = os.getenv('CACHE_BUS', 'auto').strip().lower()
+CACHE_BUS_MODOS_VALIDOS = ('auto', 'ninguno', 'sondeo', 'cqn')
+CACHE_BUS_INTERVALO_S = float(os.getenv('CACHE_BUS_INTERVALO_S', '1'))
+CACHE_BUS_RETENCION_H = float(os.getenv('CACHE_BUS_RETENCION_H', '24'))
+
+# Métricas de Prometheus en GET /metrics (ver utils/metrics.py). Con varios
+# workers de gunicorn, PROMETHEUS_MULTIPROC_DIR debe apuntar a un directorio
+# compartido por todos, vacío al arrancar
+METRICAS_HABILITADAS = os.getenv('METRICAS_HABILITADAS', 'true').lower() == 'true'
+METRICAS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+METRICAS_VOLCADO_S = float(os.getenv('METRICAS_VOLCADO_S', '5'))
+
+# Instrumentación SQL (ver utils/sql_instrumentation.py): umbral del log de
+# consultas lentas, repeticiones de una misma sentencia por request que se
+# reportan como posible N+1 y cabecera X-DB-Detalle en todas las respuestas
+# (si no, solo para bibliotecarios que envían X-Debug-SQL: 1)
+SQL_LENTA_MS = float(os.getenv('SQL_LENTA_MS', '250'))
+SQL_N_MAS_1_UMBRAL = int(os.getenv('SQL_N_MAS_1_UMBRAL', '10'))
+SQL_CABECERA_DETALLE = os.getenv('SQL_CABECERA_DETALLE', 'false').lower() == 'true'
+
+# Profiler por muestreo (ver utils/profiler.py): cada cuánto se toma la pila,
+# porcentaje de requests perfiladas al azar al arrancar, dónde se guardan los
+# .folded y cuántos se conservan
+PERFILES_INTERVALO_MS = float(os.getenv('PERFILES_INTERVALO_MS', '2'))
+PERFILES_MUESTREO_PCT = float(os.getenv('PERFILES_MUESTREO_PCT', '0'))
+PERFILES_DIR = os.getenv('PERFILES_DIR', 'logs/profiles')
+PERFILES_MAX_ARCHIVOS = int(os.getenv('PERFILES_MAX_ARCHIVOS', '200'))
+
+# Logging (ver utils/logging_pipeline.py): los INFO de una misma plantilla
+# por encima de LOG_INFO_MAX_POR_S por segundo se muestrean 1 de cada
+# LOG_INFO_MUESTREO_N; con la cola llena los registros se descartan
+LOG_DIR = os.getenv('LOG_DIR', 'logs')
+LOG_NIVEL = os.getenv('LOG_NIVEL', 'INFO').strip().upper()
+LOG_CONSOLA = os.getenv('LOG_CONSOLA', 'true').lower() == 'true'
+LOG_COLA_MAX = int(os.getenv('LOG_COLA_MAX', '10000'))
+LOG_INFO_MAX_POR_S = int(os.getenv('LOG_INFO_MAX_POR_S', '20'))
+LOG_INFO_MUESTREO_N = int(os.getenv('LOG_INFO_MUESTREO_N', '100'))
+
+# POST /api/batch (ver utils/batch.py): requests por lote, costo total
+# permitido e hilos por proceso para ejecutar sub-requests en paralelo
+LOTE_MAX_SOLICITUDES = int(os.getenv('LOTE_MAX_SOLICITUDES', '10'))
+LOTE_COSTO_MAX = int(os.getenv('LOTE_COSTO_MAX', '20'))
+LOTE_PARALELISMO = int(os.getenv('LOTE_PARALELISMO', '4'))
+
+# Sonda de la base en segundo plano y cortocircuito (ver utils/health.py):
+# cada cuánto se verifica, cuánto puede tardar una verificación y cuántas
+# fallidas seguidas abren el circuito
+SALUD_INTERVALO_S = float(os.getenv('SALUD_INTERVALO_S', '5'))
+SALUD_TIMEOUT_S = float(os.getenv('SALUD_TIMEOUT_S', '3'))
+SALUD_FALLOS_UMBRAL = int(os.getenv('SALUD_FALLOS_UMBRAL', '2'))
+
+# Altas masivas (POST /api/usuarios/importar): filas por request (cada una es
+# un bcrypt de ~0,25 s de CPU; archivos mayores con importar_usuarios.py) e
+# hilos para calcular los bcrypt en paralelo (bcrypt libera el GIL; 0 = uno por CPU)
+IMPORTACION_MAX_FILAS = int(os.getenv('IMPORTACION_MAX_FILAS', '500'))
+BCRYPT_HILOS = int(os.getenv('BCRYPT_HILOS', '0')) or os.cpu_count() or 1
+
+# Feed de cambios GET /api/events (ver utils/events.py): cada cuánto se lee la
+# bitácora, eventos recientes que se guardan para reanudar, streams abiertos
+# por proceso (cada uno ocupa un hilo del worker), duración de un stream antes
+# de que el cliente se reconecte, intervalo de keepalive y eventos encolados
+# por cliente antes de cortarle el stream
+EVENTOS_INTERVALO_S = float(os.getenv('EVENTOS_INTERVALO_S', '1'))
+EVENTOS_BUFFER = int(os.getenv('EVENTOS_BUFFER', '1000'))
+EVENTOS_MAX_CONEXIONES = int(os.getenv('EVENTOS_MAX_CONEXIONES', '4'))
+EVENTOS_DURACION_MAX_S = float(os.getenv('EVENTOS_DURACION_MAX_S', '300'))
+EVENTOS_KEEPALIVE_S = float(os.getenv('EVENTOS_KEEPALIVE_S', '15'))
+EVENTOS_COLA_MAX = int(os.getenv('EVENTOS_COLA_MAX', '500'))
+
+# Auditoría (ver utils/auditoria.py): eventos en la cola de memoria de cada
+# proceso, cada cuánto y en lotes de cuántos se pasan del outbox a
+# AUDITORIA_EVENTOS, y antigüedad a partir de la cual el outbox se barre
+# (eventos que no pasaron por la cola: cola llena o worker reiniciado)
+AUDITORIA_COLA_MAX = int(os.getenv('AUDITORIA_COLA_MAX', '10000'))
+AUDITORIA_INTERVALO_S = float(os.getenv('AUDITORIA_INTERVALO_S', '1'))
+AUDITORIA_LOTE = int(os.getenv('AUDITORIA_LOTE', '500'))
+AUDITORIA_GRACIA_S = float(os.getenv('AUDITORIA_GRACIA_S', '60'))
+
+# Rollups de circulación (ver services/circulacion_service.py): cada cuánto
+# el hilo de fondo aplica la bitácora de préstamos (0 = solo el job nocturno
+# rollup_circulacion.py), antigüedad mínima de un cambio para aplicarlo (deja
+# confirmar a las transacciones en curso) y días que el job nocturno
+# recalcula completos
+REPORTES_INTERVALO_S = float(os.getenv('REPORTES_INTERVALO_S', '60'))
+REPORTES_MARGEN_S = float(os.getenv('REPORTES_MARGEN_S', '60'))
+REPORTES_VENTANA_DIAS = int(os.getenv('REPORTES_VENTANA_DIAS', '2'))
+
+# Recomendaciones de libros (ver utils/similares.py): directorio de los
+# archivos que genera construir_similares.py, vecinos guardados por libro y
+# mínimo de usuarios en común para considerar parecidos dos libros
+SIMILARES_DIR = os.getenv('SIMILARES_DIR', 'data/similares')
+SIMILARES_K = int(os.getenv('SIMILARES_K', '20'))
+SIMILARES_MIN_COMUNES = int(os.getenv('SIMILARES_MIN_COMUNES', '2'))
+
+if INVENTARIO_MODO not in INVENTARIO_MODOS_VALIDOS:
+    raise RuntimeError(
+        f"INVENTARIO_MODO inválido: {INVENTARIO_MODO}. "
+        f"Valores permitidos: {', '.join(INVENTARIO_MODOS_VALIDOS)}"
+    )
+
+if CACHE_BUS not in CACHE_BUS_MODOS_VALIDOS:
+    raise RuntimeError(
+        f"CACHE_BUS inválido: {CACHE_BUS}. "
+        f"Valores permitidos: {', '.join(CACHE_BUS_MODOS_VALIDOS)}"
+    )
+
+if INVENTARIO_FRAGMENTADO and INVENTARIO_MODO != 'APLICACION':
+    raise RuntimeError("INVENTARIO_FRAGMENTADO requiere INVENTARIO_MODO=APLICACION")
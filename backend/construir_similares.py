@@ -0,0 +1,45 @@
+"""
+Construye las recomendaciones "quienes pidieron este libro también pidieron"
+que sirve GET /api/libros/<id>/similares (requiere numpy y scipy).
+Ejecutar con: python construir_similares.py [--completo]
+
+Sin opciones suma los préstamos nuevos desde la última ejecución (o construye
+si no hay estado previo); --completo relee todo el historial, lo que además
+descuenta los préstamos eliminados.
+"""
+import argparse
+import logging
+import sys
+
+from config.database import SessionLocal
+from config.settings import SIMILARES_DIR
+from services.recomendacion_service import RecomendacionService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construye las recomendaciones de libros")
+    parser.add_argument("--completo", action="store_true", help="relee todo el historial de préstamos")
+    parser.add_argument("--directorio", default=SIMILARES_DIR)
+    args = parser.parse_args(argv)
+
+    session = SessionLocal()
+    try:
+        servicio = RecomendacionService(session, args.directorio)
+        resultado = servicio.construir() if args.completo else servicio.actualizar()
+    except (OSError, RuntimeError) as error:
+        logger.error("No se pudieron construir las recomendaciones: %s", error)
+        return 1
+    finally:
+        session.close()
+    logger.info(
+        "Recomendaciones en %s: %d libros, %d préstamos procesados (hasta el préstamo %d)",
+        args.directorio, resultado["libros"], resultado["prestamos"], resultado["ultimo_prestamo"],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,25 @@
+from .auditoria_controller import auditoria_bp
 from .auth_controller import auth_bp
+from .batch_controller import batch_bp
+from .cache_controller import cache_bp
+from .dashboard_controller import dashboard_bp
+from .evento_controller import eventos_bp
 from .libro_controller import libros_bp
+from .perfil_controller import perfiles_bp
 from .prestamo_controller import prestamos_bp
+from .reporte_controller import reportes_bp
 from .usuario_controller import usuarios_bp
 
-__all__ = ["auth_bp", "libros_bp", "prestamos_bp", "usuarios_bp"]
+__all__ = [
+    "auditoria_bp",
+    "auth_bp",
+    "batch_bp",
+    "cache_bp",
+    "dashboard_bp",
+    "eventos_bp",
+    "libros_bp",
+    "perfiles_bp",
+    "prestamos_bp",
+    "reportes_bp",
+    "usuarios_bp",
+]
@@ -0,0 +1,24 @@
+"""Controller del registro de auditoría (solo bibliotecarios)."""
+from flask import Blueprint, jsonify, request
+
+from services.auditoria_service import AuditoriaService
+from utils.http import api_route
+from utils.request_session import db_session, replica_read
+from utils.security import role_required
+
+auditoria_bp = Blueprint("auditoria", __name__)
+
+
+@auditoria_bp.route("/", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+@replica_read
+def get_auditoria():
+    result = AuditoriaService(db_session).buscar(
+        entidad=request.args.get("entidad") or None,
+        id_registro=request.args.get("id_registro", type=int),
+        id_actor=request.args.get("id_actor", type=int),
+        antes=request.args.get("antes") or None,
+        limite=request.args.get("limite", type=int),
+    )
+    return jsonify(result)
@@ -3,9 +3,9 @@ import logging
 
 from flask import Blueprint, jsonify, request
 
-from config.database import get_session
 from services.auth_service import AuthService
 from utils.http import api_route
+from utils.request_session import db_session
 
 auth_bp = Blueprint("auth", __name__)
 logger = logging.getLogger(__name__)
@@ -15,8 +15,7 @@ logger = logging.getLogger(__name__)
 @api_route
 def login():
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = AuthService(session).login(data.get("email"), data.get("password"))
+    result = AuthService(db_session).login(data.get("email"), data.get("password"))
     return jsonify(result)
 
 
@@ -24,8 +23,7 @@ def login():
 @api_route
 def register():
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = AuthService(session).register(
-            data.get("nombre"), data.get("email"), data.get("password")
-        )
+    result = AuthService(db_session).register(
+        data.get("nombre"), data.get("email"), data.get("password")
+    )
     return jsonify(result), 201
@@ -0,0 +1,16 @@
+"""Controller de lotes: varias requests GET en una sola (ver utils/batch.py)."""
+from flask import Blueprint, jsonify, request
+
+from utils import batch
+from utils.http import api_route
+
+batch_bp = Blueprint("batch", __name__)
+
+
+@batch_bp.route("", methods=["POST"])
+@api_route
+def ejecutar_lote():
+    data = request.get_json(silent=True) or {}
+    lote = batch.validar(data.get("solicitudes"))
+    respuestas = batch.ejecutar(lote, paralelo=data.get("paralelo", True) is not False)
+    return jsonify({"respuestas": respuestas})
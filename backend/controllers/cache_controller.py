@@ -0,0 +1,27 @@
+"""Controllers de administración de la caché de entidades."""
+import logging
+
+from flask import Blueprint, jsonify, request
+
+from cache import get_cache
+from utils.http import api_route
+from utils.security import role_required
+
+cache_bp = Blueprint("cache", __name__)
+logger = logging.getLogger(__name__)
+
+
+@cache_bp.route("/estadisticas", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def get_estadisticas_cache():
+    return jsonify(get_cache().estadisticas())
+
+
+@cache_bp.route("/", methods=["DELETE"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def limpiar_cache():
+    get_cache().limpiar()
+    logger.info("Caché vaciada por usuario %s", request.user["email"])
+    return jsonify({"success": True, "message": "Caché vaciada exitosamente"})
@@ -0,0 +1,15 @@
+"""Controller del dashboard: todos los widgets en una sola request."""
+from flask import Blueprint, jsonify, request
+
+from services.dashboard_service import DashboardService
+from utils.http import api_route
+from utils.request_session import db_session, replica_read
+
+dashboard_bp = Blueprint("dashboard", __name__)
+
+
+@dashboard_bp.route("/", methods=["GET"])
+@api_route
+@replica_read
+def get_dashboard():
+    return jsonify(DashboardService(db_session).get_dashboard(request.user))
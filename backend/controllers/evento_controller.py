@@ -0,0 +1,31 @@
+"""Controller del feed de cambios en vivo (server-sent events, ver utils/events.py)."""
+from flask import Blueprint, Response, request
+
+from services.exceptions import ValidationError
+from utils.events import canal, transmitir
+from utils.health import sonda
+from utils.http import api_route
+
+eventos_bp = Blueprint("eventos", __name__)
+
+
+@eventos_bp.route("", methods=["GET"])
+@api_route
+def stream_eventos():
+    # Last-Event-ID al reconectarse (EventSource lo envía solo); ?ultimo= como alternativa
+    ultimo = request.headers.get("Last-Event-ID") or request.args.get("ultimo")
+    try:
+        ultimo_id = int(ultimo) if ultimo else None
+    except ValueError:
+        raise ValidationError("Last-Event-ID inválido")
+
+    sonda.verificar()
+    suscripcion, pendientes, posicion = canal.suscribir(request.user, ultimo_id)
+    response = Response(
+        transmitir(suscripcion, pendientes, posicion),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Si el cliente se va antes de leer, el generador nunca arranca: se libera acá
+    response.call_on_close(lambda: canal.cancelar(suscripcion))
+    return response
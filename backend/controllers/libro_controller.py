@@ -6,9 +6,10 @@ from datetime import datetime
 
 from flask import Blueprint, jsonify, make_response, request
 
-from config.database import get_session
+from services.inventario_service import InventarioService
 from services.libro_service import LibroService
 from utils.http import api_route
+from utils.request_session import db_session, replica_read, run_in_request_session
 from utils.security import role_required
 
 libros_bp = Blueprint("libros", __name__)
@@ -17,41 +18,50 @@ logger = logging.getLogger(__name__)
 
 @libros_bp.route("/", methods=["GET"])
 @api_route
+@replica_read
 def get_libros():
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 100, type=int)
     limit = request.args.get("limit", type=int)
-    with get_session() as session:
-        result = LibroService(session).get_all(page, per_page, limit)
+    result = LibroService(db_session).get_all(page, per_page, limit)
     return jsonify(result)
 
 
 @libros_bp.route("/<int:id_libro>", methods=["GET"])
 @api_route
+@replica_read
 def get_libro(id_libro):
-    with get_session() as session:
-        libro = LibroService(session).get_by_id(id_libro)
+    libro = LibroService(db_session).get_by_id(id_libro)
     return jsonify(libro)
 
 
+@libros_bp.route("/<int:id_libro>/similares", methods=["GET"])
+@api_route
+@replica_read
+def get_libros_similares(id_libro):
+    limite = request.args.get("limite", type=int)
+    result = LibroService(db_session).get_similares(id_libro, limite)
+    return jsonify(result)
+
+
 @libros_bp.route("/generos", methods=["GET"])
 @api_route
+@replica_read
 def get_generos():
-    with get_session() as session:
-        generos = LibroService(session).get_generos()
+    generos = LibroService(db_session).get_generos()
     return jsonify(generos)
 
 
 @libros_bp.route("/search", methods=["GET"])
 @api_route
+@replica_read
 def search_libros():
     titulo = request.args.get("titulo", "")
     autor = request.args.get("autor", "")
     isbn = request.args.get("isbn", "")
     genero = request.args.get("genero", "")
     limit = request.args.get("limit", 200, type=int)
-    with get_session() as session:
-        libros = LibroService(session).search(titulo, autor, isbn, genero, limit)
+    libros = LibroService(db_session).search(titulo, autor, isbn, genero, limit)
     return jsonify(libros)
 
 
@@ -60,8 +70,7 @@ def search_libros():
 @api_route
 def create_libro():
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = LibroService(session).create(data)
+    result = LibroService(db_session).create(data)
     return jsonify(result), 201
 
 
@@ -70,19 +79,21 @@ def create_libro():
 @api_route
 def update_libro(id_libro):
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = LibroService(session).update(id_libro, data)
+    result = run_in_request_session(lambda session: LibroService(session).update(id_libro, data))
     return jsonify(result)
 
 
 @libros_bp.route("/<int:id_libro>/copias", methods=["PATCH"])
+@role_required(["BIBLIOTECARIO"])
 @api_route
 def update_copias(id_libro):
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = LibroService(session).update_copias(
-            id_libro, data.get("copias_disponibles")
-        )
+    result = LibroService(db_session).update_copias(
+        id_libro,
+        copias=data.get("copias_disponibles"),
+        delta=data.get("delta"),
+        version=data.get("version"),
+    )
     return jsonify(result)
 
 
@@ -90,25 +101,26 @@ def update_copias(id_libro):
 @role_required(["BIBLIOTECARIO"])
 @api_route
 def delete_libro(id_libro):
-    with get_session() as session:
-        result = LibroService(session).delete(id_libro)
+    result = LibroService(db_session).delete(id_libro)
     return jsonify(result)
 
 
 @libros_bp.route("/bajo-stock", methods=["GET"])
 @api_route
+@replica_read
 def libros_bajo_stock():
-    with get_session() as session:
-        libros = LibroService(session).get_bajo_stock()
+    libros = LibroService(db_session).get_bajo_stock()
     return jsonify(libros)
 
 
 @libros_bp.route("/export/csv", methods=["GET"])
 @role_required(["BIBLIOTECARIO"])
 @api_route
+@replica_read
 def export_libros_csv():
-    with get_session() as session:
-        libros = LibroService(session).get_all_for_export()
+    libros = LibroService(db_session).get_all_for_export()
+    # Solo lectura: devuelve la conexión antes de armar el CSV
+    db_session.commit()
 
     output = io.StringIO()
     writer = csv.writer(output)
@@ -125,14 +137,22 @@ def export_libros_csv():
     response.headers["Content-Disposition"] = (
         f'attachment; filename=libros_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
     )
-    logger.info(f"Exportación CSV: {len(libros)} libros exportados por usuario {request.user['email']}")
+    logger.info("Exportación CSV: %d libros exportados por usuario %s", len(libros), request.user["email"])
 
     return response
 
 
 @libros_bp.route("/estadisticas", methods=["GET"])
 @api_route
+@replica_read
 def get_estadisticas():
-    with get_session() as session:
-        stats = LibroService(session).get_estadisticas()
+    stats = LibroService(db_session).get_estadisticas()
     return jsonify(stats)
+
+
+@libros_bp.route("/inventario/conciliacion", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def conciliar_inventario():
+    resultado = InventarioService(db_session).conciliar()
+    return jsonify(resultado)
@@ -0,0 +1,60 @@
+"""Controllers de los perfiles de requests capturados por utils/profiler.py."""
+import logging
+
+from flask import Blueprint, jsonify, request, send_from_directory
+
+from services.exceptions import NotFoundError, ValidationError
+from utils import profiler
+from utils.http import api_route
+from utils.security import role_required
+
+perfiles_bp = Blueprint("perfiles", __name__)
+logger = logging.getLogger(__name__)
+
+
+@perfiles_bp.route("/", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def listar_perfiles():
+    return jsonify(profiler.listar())
+
+
+@perfiles_bp.route("/<nombre>", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def descargar_perfil(nombre):
+    if not profiler.NOMBRE_VALIDO.match(nombre) or not (profiler.directorio() / nombre).is_file():
+        raise NotFoundError("Perfil no encontrado")
+    return send_from_directory(
+        profiler.directorio(), nombre, as_attachment=True, mimetype="text/plain"
+    )
+
+
+@perfiles_bp.route("/muestreo", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def get_muestreo():
+    return jsonify({"porcentaje": profiler.muestreo.porcentaje()})
+
+
+@perfiles_bp.route("/muestreo", methods=["PUT"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def configurar_muestreo():
+    data = request.get_json(silent=True) or {}
+    try:
+        porcentaje = float(data.get("porcentaje"))
+        minutos = int(data.get("minutos", 10))
+    except (TypeError, ValueError):
+        raise ValidationError("porcentaje (0-100) y minutos deben ser numéricos")
+    if not 0 <= porcentaje <= 100 or minutos < 1:
+        raise ValidationError("porcentaje debe estar entre 0 y 100 y minutos ser positivo")
+
+    profiler.muestreo.configurar(porcentaje, minutos * 60)
+    logger.info(
+        "Muestreo de perfiles al %s%% por %d min configurado por %s",
+        porcentaje,
+        minutos,
+        request.user["email"],
+    )
+    return jsonify({"porcentaje": porcentaje, "minutos": minutos})
@@ -3,9 +3,9 @@ import logging
 
 from flask import Blueprint, jsonify, request
 
-from config.database import get_session
 from services.prestamo_service import PrestamoService
 from utils.http import api_route
+from utils.request_session import db_session, replica_read
 from utils.security import role_required
 
 prestamos_bp = Blueprint("prestamos", __name__)
@@ -14,25 +14,25 @@ logger = logging.getLogger(__name__)
 
 @prestamos_bp.route("/", methods=["GET"])
 @api_route
+@replica_read
 def get_prestamos():
-    with get_session() as session:
-        prestamos = PrestamoService(session).get_all()
+    prestamos = PrestamoService(db_session).get_all()
     return jsonify(prestamos)
 
 
 @prestamos_bp.route("/activos", methods=["GET"])
 @api_route
+@replica_read
 def get_prestamos_activos():
-    with get_session() as session:
-        prestamos = PrestamoService(session).get_activos()
+    prestamos = PrestamoService(db_session).get_activos()
     return jsonify(prestamos)
 
 
 @prestamos_bp.route("/usuario/<int:id_usuario>", methods=["GET"])
 @api_route
+@replica_read
 def get_prestamos_usuario(id_usuario):
-    with get_session() as session:
-        prestamos = PrestamoService(session).get_by_usuario(id_usuario)
+    prestamos = PrestamoService(db_session).get_by_usuario(id_usuario)
     return jsonify(prestamos)
 
 
@@ -41,12 +41,11 @@ def get_prestamos_usuario(id_usuario):
 @api_route
 def create_prestamo():
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = PrestamoService(session).create(
-            data.get("id_libro"),
-            data.get("id_usuario"),
-            data.get("dias_prestamo"),
-        )
+    result = PrestamoService(db_session).create(
+        data.get("id_libro"),
+        data.get("id_usuario"),
+        data.get("dias_prestamo"),
+    )
     return jsonify(result), 201
 
 
@@ -54,14 +53,22 @@ def create_prestamo():
 @role_required(["BIBLIOTECARIO"])
 @api_route
 def devolver_prestamo(id_prestamo):
-    with get_session() as session:
-        result = PrestamoService(session).devolver(id_prestamo)
+    result = PrestamoService(db_session).devolver(id_prestamo)
+    return jsonify(result)
+
+
+@prestamos_bp.route("/devolver", methods=["PUT"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def devolver_prestamos_lote():
+    data = request.get_json(silent=True) or {}
+    result = PrestamoService(db_session).devolver_lote(data.get("ids"))
     return jsonify(result)
 
 
 @prestamos_bp.route("/vencidos", methods=["GET"])
 @api_route
+@replica_read
 def get_prestamos_vencidos():
-    with get_session() as session:
-        prestamos = PrestamoService(session).get_vencidos()
+    prestamos = PrestamoService(db_session).get_vencidos()
     return jsonify(prestamos)
@@ -0,0 +1,32 @@
+"""Controller de reportes de circulación (solo bibliotecarios)."""
+from flask import Blueprint, jsonify, request
+
+from services.circulacion_service import CirculacionService
+from utils.http import api_route
+from utils.request_session import db_session, replica_read
+from utils.security import role_required
+
+reportes_bp = Blueprint("reportes", __name__)
+
+
+@reportes_bp.route("/circulacion", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+@replica_read
+def get_circulacion():
+    result = CirculacionService(db_session).get_serie(
+        dimension=request.args.get("dimension") or None,
+        desde=request.args.get("desde") or None,
+        hasta=request.args.get("hasta") or None,
+        intervalo=request.args.get("intervalo") or None,
+        top=request.args.get("top", type=int),
+    )
+    return jsonify(result)
+
+
+@reportes_bp.route("/circulacion/estado", methods=["GET"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+@replica_read
+def get_estado_circulacion():
+    return jsonify(CirculacionService(db_session).get_estado())
@@ -3,28 +3,41 @@ import logging
 
 from flask import Blueprint, jsonify, request
 
-from config.database import get_session
+from config.settings import IMPORTACION_MAX_FILAS
+from services.exceptions import ValidationError
 from services.usuario_service import UsuarioService
 from utils.http import api_route
+from utils.importacion import detectar_formato, leer_registros
+from utils.request_session import db_session, replica_read, run_in_request_session
 from utils.security import role_required
 
 usuarios_bp = Blueprint("usuarios", __name__)
 logger = logging.getLogger(__name__)
 
+# Tope de tamaño del archivo de importación, holgado para filas de 100 caracteres por campo
+BYTES_POR_FILA = 1024
+
 
 @usuarios_bp.route("/", methods=["GET"])
 @api_route
+@replica_read
 def get_usuarios():
-    with get_session() as session:
-        usuarios = UsuarioService(session).get_all()
-    return jsonify(usuarios)
+    result = UsuarioService(db_session).get_pagina(
+        q=request.args.get("q", ""),
+        campo=request.args.get("campo") or None,
+        rol=request.args.get("rol") or None,
+        activo=request.args.get("activo") or None,
+        cursor=request.args.get("cursor") or None,
+        limite=request.args.get("limite", type=int),
+    )
+    return jsonify(result)
 
 
 @usuarios_bp.route("/<int:id_usuario>", methods=["GET"])
 @api_route
+@replica_read
 def get_usuario(id_usuario):
-    with get_session() as session:
-        usuario = UsuarioService(session).get_by_id(id_usuario)
+    usuario = UsuarioService(db_session).get_by_id(id_usuario)
     return jsonify(usuario)
 
 
@@ -33,18 +46,45 @@ def get_usuario(id_usuario):
 @api_route
 def create_usuario_admin():
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = UsuarioService(session).create_admin(data)
+    result = UsuarioService(db_session).create_admin(data)
     return jsonify(result), 201
 
 
+@usuarios_bp.route("/importar", methods=["POST"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def importar_usuarios():
+    """Alta masiva desde un archivo CSV o JSONL (campo ``archivo`` o cuerpo crudo)."""
+    if (request.content_length or 0) > IMPORTACION_MAX_FILAS * BYTES_POR_FILA:
+        raise ValidationError(f"Máximo {IMPORTACION_MAX_FILAS} usuarios por importación")
+    archivo = request.files.get("archivo")
+    if archivo is not None:
+        contenido, nombre, tipo = archivo.read(), archivo.filename or "", archivo.mimetype
+    else:
+        contenido, nombre, tipo = request.get_data(), "", request.mimetype
+    if not contenido:
+        raise ValidationError("Se requiere un archivo CSV o JSONL")
+    formato = detectar_formato(request.args.get("formato"), nombre, tipo)
+    registros = leer_registros(contenido, formato, IMPORTACION_MAX_FILAS)
+    result = UsuarioService(db_session).importar(registros)
+    return jsonify(result), 201 if result["creados"] else 200
+
+
+@usuarios_bp.route("/estado", methods=["PATCH"])
+@role_required(["BIBLIOTECARIO"])
+@api_route
+def cambiar_estado_usuarios():
+    data = request.get_json(silent=True) or {}
+    result = UsuarioService(db_session).cambiar_estado_lote(data.get("ids"), data.get("activo"))
+    return jsonify(result)
+
+
 @usuarios_bp.route("/<int:id_usuario>", methods=["PUT"])
 @role_required(["BIBLIOTECARIO"])
 @api_route
 def update_usuario(id_usuario):
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = UsuarioService(session).update(id_usuario, data)
+    result = run_in_request_session(lambda session: UsuarioService(session).update(id_usuario, data))
     return jsonify(result)
 
 
@@ -53,10 +93,11 @@ def update_usuario(id_usuario):
 @api_route
 def toggle_estado_usuario(id_usuario):
     data = request.get_json(silent=True) or {}
-    with get_session() as session:
-        result = UsuarioService(session).toggle_estado(
-            id_usuario, data.get("activo")
+    result = run_in_request_session(
+        lambda session: UsuarioService(session).toggle_estado(
+            id_usuario, data.get("activo"), data.get("version")
         )
+    )
     return jsonify(result)
 
 
@@ -64,6 +105,5 @@ def toggle_estado_usuario(id_usuario):
 @role_required(["BIBLIOTECARIO"])
 @api_route
 def delete_usuario(id_usuario):
-    with get_session() as session:
-        result = UsuarioService(session).delete(id_usuario)
+    result = UsuarioService(db_session).delete(id_usuario)
     return jsonify(result)
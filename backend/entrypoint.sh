@@ -57,4 +57,4 @@ if [ "${FLASK_DEBUG:-False}" = "True" ] || [ "${FLASK_DEBUG:-false}" = "true" ];
     echo "==> [backend] Modo desarrollo (hot-reload)"
     exec flask --app app run --debug --host 0.0.0.0 --port "${PORT:-5000}"
 fi
-exec gunicorn --bind 0.0.0.0:"${PORT:-5000}" app:app
+exec gunicorn -c gunicorn.conf.py app:app
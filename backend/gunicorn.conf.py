@@ -0,0 +1,149 @@
+"""Configuración de gunicorn (se carga con ``gunicorn -c gunicorn.conf.py app:app``).
+
+Perfil gthread (por defecto): la app se importa una sola vez en el master
+(``preload_app``) y los workers la heredan por fork, compartiendo copy-on-write
+el código y los datos importados; ``gc.freeze()`` antes del fork evita que el
+recolector toque esas páginas. Cada worker descarta las conexiones heredadas
+y arranca sus hilos de fondo; antes de aceptar requests abre una conexión por
+engine y carga en la caché los géneros y las estadísticas del catálogo.
+
+El tamaño sigue al pool de SQLAlchemy, que es por proceso: cada worker atiende
+DB_POOL_SIZE hilos (una conexión por hilo sin esperar al pool), más
+EVENTOS_MAX_CONEXIONES hilos para los streams de /api/events, que no retienen
+conexiones. La cantidad de workers se limita para que
+workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW + 1, la conexión de la sonda de
+salud) no supere DB_CONEXIONES_MAX, el presupuesto de sesiones de Oracle para
+la API.
+
+Con varios workers y CACHE_BACKEND=memoria cada worker tiene su caché: con
+CACHE_BUS=auto se activa el sondeo de la bitácora y con CACHE_BUS=ninguno no
+se arranca.
+
+Con GUNICORN_WORKER_CLASS=gevent (requiere ``pip install gevent``) no se
+precarga: el monkey patching del worker tiene que ocurrir antes de importar la
+app. Por eso acá solo se importa config.settings, que no abre conexiones ni
+importa SQLAlchemy.
+"""
+import gc
+import multiprocessing
+import os
+import time
+
+# Primero settings: carga .env (con override) antes de leer os.environ
+from config import settings
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+# Más la conexión propia de la sonda de salud (config.database.sonda_engine)
+_conexiones_por_worker = DB_POOL_SIZE + DB_MAX_OVERFLOW + 1
+_conexiones_max = int(os.getenv("DB_CONEXIONES_MAX", "60"))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(
+    os.getenv("GUNICORN_WORKERS")
+    or max(1, min(multiprocessing.cpu_count() * 2, _conexiones_max // _conexiones_por_worker))
+)
+threads = int(os.getenv("GUNICORN_THREADS") or DB_POOL_SIZE + settings.EVENTOS_MAX_CONEXIONES)
+# gevent: requests concurrentes por worker; las que no usan la base (caché) no ocupan conexión
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS") or _conexiones_por_worker * 4)
+
+preload_app = worker_class != "gevent"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+# Reciclar workers acota fugas de memoria; con la app precargada el reemplazo es un fork
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+# Heartbeat en memoria: un disco lento no debe hacer que el master mate workers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(M)sms'
+
+# Se resuelve antes de importar la app: cache/bus.py lee settings.CACHE_BUS al importarse
+if settings.CACHE_BUS == "auto":
+    settings.CACHE_BUS = "sondeo" if workers > 1 and settings.CACHE_BACKEND == "memoria" else "ninguno"
+    os.environ["CACHE_BUS"] = settings.CACHE_BUS
+elif settings.CACHE_BUS == "ninguno" and workers > 1 and settings.CACHE_BACKEND == "memoria":
+    raise RuntimeError(
+        f"CACHE_BUS=ninguno con {workers} workers y CACHE_BACKEND=memoria: cada worker "
+        "serviría datos viejos de los demás. Use CACHE_BUS=sondeo o cqn, CACHE_BACKEND=redis "
+        "o GUNICORN_WORKERS=1"
+    )
+
+if preload_app:
+    # app.py no arranca sus hilos de fondo en el master (ver post_fork)
+    os.environ["BIBLIOTECA_PRECARGA"] = "1"
+
+_inicio = time.monotonic()
+
+
+def on_starting(server):
+    from utils import metrics
+
+    metrics.limpiar_directorio()
+    server.log.info(
+        "Perfil %s: %d workers x %d hilos, pool %d+%d por worker, preload=%s, bus de caché=%s",
+        worker_class, workers, threads, DB_POOL_SIZE, DB_MAX_OVERFLOW, preload_app, settings.CACHE_BUS,
+    )
+
+
+def when_ready(server):
+    if preload_app:
+        # Lo importado hasta acá queda fuera del GC: las páginas siguen compartidas tras el fork
+        gc.collect()
+        gc.freeze()
+    server.log.info("Master listo en %.2f s", time.monotonic() - _inicio)
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import iniciar_procesos_de_fondo
+    from config.database import dispose_engines
+
+    dispose_engines()
+    iniciar_procesos_de_fondo()
+
+
+def _calentar_caches(session):
+    from services.libro_service import LibroService
+
+    servicio = LibroService(session)
+    servicio.get_generos()
+    servicio.get_estadisticas()
+
+
+def post_worker_init(worker):
+    """Calienta el worker antes de que acepte conexiones.
+
+    Abre una conexión por engine (primario y réplica) y carga las entradas de
+    caché más pedidas. Si la base no responde, el worker arranca igual: la
+    sonda de salud y el circuito se encargan de esas requests.
+    """
+    inicio = time.monotonic()
+    from app import app
+    from config.database import calentar_engines, run_in_session
+
+    try:
+        with app.app_context():
+            calentar_engines()
+            run_in_session(_calentar_caches)
+        estado = "ok"
+    except Exception as error:
+        estado = error
+    worker.log.info(
+        "Worker %s listo en %.0f ms (calentamiento: %s)",
+        worker.pid, (time.monotonic() - inicio) * 1000, estado,
+    )
+
+
+def child_exit(server, worker):
+    from utils import metrics
+
+    server.log.info("Worker %s terminó", worker.pid)
+    try:
+        metrics.archivar_proceso(worker.pid)
+    except Exception as error:
+        server.log.warning("No se pudieron archivar las métricas del worker %s: %s", worker.pid, error)
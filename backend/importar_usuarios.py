@@ -0,0 +1,64 @@
+"""
+Alta masiva de usuarios desde un archivo CSV o JSONL, sin el tope de filas de
+POST /api/usuarios/importar (inscripciones de inicio de semestre).
+Ejecutar con: python importar_usuarios.py alumnos.csv [--formato csv|jsonl]
+
+Procesa el archivo en lotes de IMPORTACION_MAX_FILAS y confirma cada lote;
+si se interrumpe, volver a ejecutarlo omite los emails ya importados.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from config.database import SessionLocal
+from config.settings import BCRYPT_HILOS, IMPORTACION_MAX_FILAS
+from services.exceptions import ServiceError
+from services.usuario_service import UsuarioService
+from utils.importacion import detectar_formato, leer_registros
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def importar(ruta: Path, formato: str = None):
+    registros = leer_registros(
+        ruta.read_bytes(), detectar_formato(formato, ruta.name), max_filas=sys.maxsize
+    )
+    totales = {"creados": 0, "total_duplicados": 0, "total_errores": 0}
+    for inicio in range(0, len(registros), IMPORTACION_MAX_FILAS):
+        session = SessionLocal()
+        try:
+            resultado = UsuarioService(session).importar(registros[inicio:inicio + IMPORTACION_MAX_FILAS])
+            session.commit()
+        finally:
+            session.close()
+        for error in resultado["errores"]:
+            logger.warning("Línea %s: %s", error["linea"], error["error"])
+        for campo in totales:
+            totales[campo] += resultado[campo]
+        logger.info("Procesadas %d de %d filas", min(inicio + IMPORTACION_MAX_FILAS, len(registros)), len(registros))
+    return totales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa usuarios desde un archivo CSV o JSONL")
+    parser.add_argument("archivo", type=Path)
+    parser.add_argument("--formato", choices=("csv", "jsonl"))
+    args = parser.parse_args(argv)
+
+    logger.info("Calculando hashes con %d hilos", BCRYPT_HILOS)
+    try:
+        totales = importar(args.archivo, args.formato)
+    except (OSError, ServiceError) as error:
+        logger.error("No se pudo importar %s: %s", args.archivo, error)
+        return 1
+    logger.info(
+        "Importación completada: %d creados, %d duplicados, %d con errores",
+        totales["creados"], totales["total_duplicados"], totales["total_errores"],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
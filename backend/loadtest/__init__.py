@@ -0,0 +1,11 @@
+"""Generador de carga HTTP contra la API en ejecución.
+
+Inicia sesión con usuarios reales por /api/auth/login y repite una mezcla
+ponderada de navegación del catálogo, búsquedas, préstamos y devoluciones,
+con una conexión keep-alive por usuario virtual. También puede reproducir un
+access log. Informa p50/p95/p99 por endpoint, throughput y tasa de errores
+en JSON y HTML. Solo usa la biblioteca estándar. Uso:
+
+    cd backend
+    python -m loadtest --usuario admin@biblioteca.com:admin123 --concurrencia 20 --duracion 60
+"""
@@ -0,0 +1,205 @@
+"""CLI del generador de carga (python -m loadtest --help)."""
+import argparse
+import csv
+import logging
+import random
+import sys
+import threading
+import time
+from itertools import cycle
+
+from loadtest import replay, report
+from loadtest.client import Cliente
+from loadtest.workload import EstadoCompartido, Mezcla, descubrir, parse_mezcla
+
+logger = logging.getLogger("loadtest")
+
+
+def _credenciales(args):
+    credenciales = []
+    for valor in args.usuario or []:
+        email, _, password = valor.partition(":")
+        credenciales.append((email, password))
+    if args.usuarios_csv:
+        with open(args.usuarios_csv, encoding="utf-8") as archivo:
+            for fila in csv.DictReader(archivo):
+                credenciales.append((fila["email"], fila["password"]))
+    return credenciales
+
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description=__doc__)
+    parser.add_argument("--url", default="http://localhost:5000", help="URL base del backend")
+    parser.add_argument("--usuario", action="append", metavar="EMAIL:PASSWORD", help="Se puede repetir")
+    parser.add_argument("--usuarios-csv", help="CSV con columnas email,password")
+    parser.add_argument("--concurrencia", type=int, default=10, help="Usuarios virtuales simultáneos")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos de prueba")
+    parser.add_argument("--peticiones", type=int, default=0, help="Detener tras N operaciones de la mezcla (0 = sin límite)")
+    parser.add_argument("--rampa", type=float, default=0, help="Segundos para arrancar todos los usuarios")
+    parser.add_argument("--pausa-ms", type=float, default=0, help="Tiempo de reflexión entre peticiones")
+    parser.add_argument("--mezcla", default="", help="Pesos, p. ej. buscar=50,prestar=10")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--replay", help="Access log a reproducir en lugar de la mezcla")
+    parser.add_argument("--metodos", default="GET", help="Métodos a reproducir del log")
+    parser.add_argument(
+        "--velocidad",
+        type=float,
+        default=0,
+        help="Respeta los tiempos del log acelerados por este factor (0 = lo más rápido posible)",
+    )
+    parser.add_argument("--json", default="reporte_carga.json", help="Reporte JSON")
+    parser.add_argument("--html", default="reporte_carga.html", help="Reporte HTML")
+    return parser.parse_args(argv)
+
+
+class Prueba:
+    def __init__(self, args, credenciales):
+        self.args = args
+        self.credenciales = credenciales
+        self.estado = EstadoCompartido()
+        self.mezcla = Mezcla(parse_mezcla(args.mezcla))
+        self.clientes = []
+        self.detener = threading.Event()
+        self._contador = 0
+        self._lock = threading.Lock()
+        self._cola_replay = None
+
+    def _reservar_peticion(self) -> bool:
+        """Cuenta la petición; False cuando se alcanzó --peticiones."""
+        if not self.args.peticiones:
+            return True
+        with self._lock:
+            if self._contador >= self.args.peticiones:
+                self.detener.set()
+                return False
+            self._contador += 1
+            return True
+
+    def _usuario_virtual(self, indice, email, password, inicio):
+        time.sleep(self.args.rampa * indice / max(self.args.concurrencia, 1))
+        rng = random.Random(None if self.args.semilla is None else self.args.semilla + indice)
+        cliente = Cliente(self.args.url, self.args.timeout)
+        self.clientes.append(cliente)
+        usuario = cliente.login(email, password)
+        if usuario is None:
+            logger.error("Login fallido para %s", email)
+            return
+        mezcla = self.mezcla.para_rol(usuario["rol"])
+        pausa = self.args.pausa_ms / 1000
+
+        while not self.detener.is_set() and self._reservar_peticion():
+            if self._cola_replay is not None:
+                if not self._siguiente_replay(cliente, inicio):
+                    break
+            elif mezcla.nombres:
+                mezcla.ejecutar_una(cliente, self.estado, rng)
+            else:
+                break
+            if pausa:
+                time.sleep(pausa)
+        cliente.cerrar()
+
+    def _siguiente_replay(self, cliente, inicio) -> bool:
+        with self._lock:
+            try:
+                desfase, metodo, ruta = next(self._cola_replay)
+            except StopIteration:
+                return False
+        if self.args.velocidad:
+            espera = inicio + desfase / self.args.velocidad - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+        cliente.solicitar(metodo, ruta)
+        return True
+
+    def preparar(self) -> bool:
+        cliente = Cliente(self.args.url, self.args.timeout)
+        ids = []
+        for email, password in self.credenciales:
+            usuario = cliente.login(email, password)
+            if usuario is not None:
+                ids.append(usuario["id"])
+        if not ids:
+            logger.error("Ningún usuario pudo iniciar sesión")
+            return False
+        self.estado.ids_lector = ids
+        descubrir(cliente, self.estado)
+        cliente.cerrar()
+
+        if self.args.replay:
+            metodos = {m.strip().upper() for m in self.args.metodos.split(",")}
+            peticiones = replay.cargar(self.args.replay, metodos)
+            logger.info("Reproduciendo %d peticiones de %s", len(peticiones), self.args.replay)
+            self._cola_replay = iter(peticiones)
+        return True
+
+    def ejecutar(self) -> float:
+        inicio = time.perf_counter()
+        hilos = []
+        credenciales = cycle(self.credenciales)
+        for indice in range(self.args.concurrencia):
+            email, password = next(credenciales)
+            hilo = threading.Thread(
+                target=self._usuario_virtual,
+                args=(indice, email, password, inicio),
+                name=f"vu-{indice}",
+                daemon=True,
+            )
+            hilo.start()
+            hilos.append(hilo)
+
+        limite = inicio + self.args.duracion
+        while any(h.is_alive() for h in hilos) and time.perf_counter() < limite:
+            time.sleep(0.2)
+        self.detener.set()
+        for hilo in hilos:
+            hilo.join(self.args.timeout)
+        return time.perf_counter() - inicio
+
+    def muestras(self):
+        return [muestra for cliente in self.clientes for muestra in cliente.muestras]
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = _argumentos(argv)
+    credenciales = _credenciales(args)
+    if not credenciales:
+        logger.error("Indique al menos un --usuario EMAIL:PASSWORD o --usuarios-csv")
+        return 2
+
+    prueba = Prueba(args, credenciales)
+    if not prueba.preparar():
+        return 1
+    duracion = prueba.ejecutar()
+
+    parametros = {
+        "url": args.url,
+        "concurrencia": args.concurrencia,
+        "usuarios": len(credenciales),
+        "mezcla": args.mezcla or "default",
+        "replay": args.replay,
+        "pausa_ms": args.pausa_ms,
+    }
+    resultado = report.construir(prueba.muestras(), duracion, parametros)
+    report.guardar(resultado, args.json, args.html)
+
+    total = resultado["total"]
+    if total:
+        logger.info(
+            "%s peticiones en %s s (%s req/s), errores %.2f%%, p50 %s ms, p95 %s ms, p99 %s ms",
+            total["peticiones"], resultado["duracion_s"], total["throughput_rps"],
+            total["tasa_errores"] * 100, total["p50_ms"], total["p95_ms"], total["p99_ms"],
+        )
+    for nombre, resumen in resultado["endpoints"].items():
+        logger.info(
+            "  %-40s %7s  p95 %9s ms  errores %.2f%%",
+            nombre, resumen["peticiones"], resumen["p95_ms"], resumen["tasa_errores"] * 100,
+        )
+    logger.info("Reportes: %s, %s", args.json, args.html)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
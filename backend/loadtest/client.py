@@ -0,0 +1,100 @@
+"""Cliente HTTP keep-alive que registra la latencia de cada petición."""
+import http.client
+import json
+import re
+import socket
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+_ID = re.compile(r"/\d+(?=/|$)")
+
+# Errores que indican que el servidor cerró la conexión keep-alive
+_DESCONEXIONES = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+def etiqueta(metodo: str, ruta: str) -> str:
+    """Agrupa rutas por endpoint: /api/libros/42?x=1 -> GET /api/libros/<id>."""
+    return f"{metodo} {_ID.sub('/<id>', ruta.split('?', 1)[0])}"
+
+
+# (etiqueta, milisegundos, status); status 0 = error de conexión
+Muestra = Tuple[str, float, int]
+
+
+class Cliente:
+    """Una conexión persistente por usuario virtual (no es thread-safe)."""
+
+    def __init__(self, base_url: str, timeout: float):
+        partes = urlsplit(base_url)
+        self.https = partes.scheme == "https"
+        self.host = partes.hostname
+        self.port = partes.port or (443 if self.https else 80)
+        self.prefijo = partes.path.rstrip("/")
+        self.timeout = timeout
+        self.token: Optional[str] = None
+        self.muestras: List[Muestra] = []
+        self._conexion = None
+
+    def _conectar(self):
+        clase = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self._conexion = clase(self.host, self.port, timeout=self.timeout)
+        return self._conexion
+
+    def cerrar(self) -> None:
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+    def _enviar(self, metodo, ruta, cuerpo, headers) -> Tuple[int, bytes]:
+        for intento in range(2):
+            conexion = self._conexion or self._conectar()
+            try:
+                conexion.request(metodo, self.prefijo + ruta, body=cuerpo, headers=headers)
+                respuesta = conexion.getresponse()
+                return respuesta.status, respuesta.read()
+            except _DESCONEXIONES:
+                # Keep-alive expirado del lado del servidor: reconectar una vez
+                self.cerrar()
+                if intento:
+                    raise
+
+    def solicitar(self, metodo: str, ruta: str, datos=None, nombre: Optional[str] = None):
+        """Envía la petición y devuelve (status, json o None)."""
+        headers = {"Accept": "application/json", "Connection": "keep-alive"}
+        cuerpo = None
+        if datos is not None:
+            cuerpo = json.dumps(datos).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        inicio = time.perf_counter()
+        try:
+            status, contenido = self._enviar(metodo, ruta, cuerpo, headers)
+        except (OSError, socket.timeout, http.client.HTTPException):
+            self.cerrar()
+            status, contenido = 0, b""
+        transcurrido = (time.perf_counter() - inicio) * 1000
+        self.muestras.append((nombre or etiqueta(metodo, ruta), transcurrido, status))
+
+        if not contenido:
+            return status, None
+        try:
+            return status, json.loads(contenido)
+        except ValueError:
+            return status, None
+
+    def login(self, email: str, password: str) -> Optional[dict]:
+        status, datos = self.solicitar(
+            "POST", "/api/auth/login", {"email": email, "password": password}
+        )
+        if status != 200 or not datos:
+            return None
+        self.token = datos["token"]
+        return datos["user"]
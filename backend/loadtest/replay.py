@@ -0,0 +1,44 @@
+"""Lectura de access logs (formato common/combined, como el de gunicorn)."""
+import re
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+_LINEA = re.compile(
+    r'\[(?P<fecha>[^\]]+)\]\s+"(?P<metodo>[A-Z]+) (?P<ruta>\S+) HTTP/[\d.]+"'
+)
+_FORMATO_FECHA = "%d/%b/%Y:%H:%M:%S %z"
+
+# (segundos desde la primera línea, método, ruta)
+Peticion = Tuple[float, str, str]
+
+
+def _fecha(texto: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(texto, _FORMATO_FECHA)
+    except ValueError:
+        return None
+
+
+def parse_lineas(lineas: Iterable[str], metodos: Set[str]) -> Iterator[Peticion]:
+    """Peticiones /api/ de los métodos indicados, con su desfase en segundos.
+
+    El log no guarda los cuerpos, por eso por defecto solo se reproducen GET.
+    """
+    inicio = None
+    for linea in lineas:
+        coincidencia = _LINEA.search(linea)
+        if not coincidencia:
+            continue
+        metodo, ruta = coincidencia.group("metodo"), coincidencia.group("ruta")
+        if metodo not in metodos or not ruta.startswith("/api/") or ruta.startswith("/api/auth/"):
+            continue
+        fecha = _fecha(coincidencia.group("fecha"))
+        if inicio is None and fecha is not None:
+            inicio = fecha
+        desfase = (fecha - inicio).total_seconds() if fecha and inicio else 0.0
+        yield desfase, metodo, ruta
+
+
+def cargar(ruta: str, metodos: Set[str]) -> List[Peticion]:
+    with open(ruta, encoding="utf-8", errors="replace") as archivo:
+        return list(parse_lineas(archivo, metodos))
@@ -0,0 +1,118 @@
+"""Agregación de muestras y reportes JSON/HTML."""
+import html
+import json
+import statistics
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable
+
+from loadtest.client import Muestra
+
+
+def _percentil(ordenados, p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    indice = max(int(-(-p * len(ordenados) // 100)) - 1, 0)
+    return ordenados[min(indice, len(ordenados) - 1)]
+
+
+def _resumen(tiempos, estados, duracion_s: float) -> Dict:
+    ordenados = sorted(tiempos)
+    errores = sum(1 for status in estados if status == 0 or status >= 500)
+    rechazos = sum(1 for status in estados if 400 <= status < 500)
+    return {
+        "peticiones": len(ordenados),
+        "throughput_rps": round(len(ordenados) / duracion_s, 2) if duracion_s else None,
+        "errores": errores,
+        "tasa_errores": round(errores / len(ordenados), 4),
+        "rechazos_4xx": rechazos,
+        "p50_ms": round(_percentil(ordenados, 50), 2),
+        "p95_ms": round(_percentil(ordenados, 95), 2),
+        "p99_ms": round(_percentil(ordenados, 99), 2),
+        "media_ms": round(statistics.fmean(ordenados), 2),
+        "max_ms": round(ordenados[-1], 2),
+    }
+
+
+def construir(muestras: Iterable[Muestra], duracion_s: float, parametros: Dict) -> Dict:
+    tiempos = defaultdict(list)
+    estados = defaultdict(list)
+    for nombre, ms, status in muestras:
+        tiempos[nombre].append(ms)
+        estados[nombre].append(status)
+
+    todos_tiempos = [ms for lista in tiempos.values() for ms in lista]
+    todos_estados = [s for lista in estados.values() for s in lista]
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "duracion_s": round(duracion_s, 2),
+        "parametros": parametros,
+        "total": _resumen(todos_tiempos, todos_estados, duracion_s) if todos_tiempos else {},
+        "endpoints": {
+            nombre: _resumen(tiempos[nombre], estados[nombre], duracion_s)
+            for nombre in sorted(tiempos, key=lambda n: -len(tiempos[n]))
+        },
+    }
+
+
+_COLUMNAS = [
+    ("peticiones", "Peticiones"),
+    ("throughput_rps", "req/s"),
+    ("tasa_errores", "Errores"),
+    ("rechazos_4xx", "4xx"),
+    ("p50_ms", "p50 ms"),
+    ("p95_ms", "p95 ms"),
+    ("p99_ms", "p99 ms"),
+    ("max_ms", "máx ms"),
+]
+
+
+def _fila(nombre: str, resumen: Dict, clase: str = "") -> str:
+    celdas = "".join(
+        f"<td>{resumen[clave]:.2%}</td>" if clave == "tasa_errores" else f"<td>{resumen[clave]}</td>"
+        for clave, _ in _COLUMNAS
+    )
+    return f'<tr class="{clase}"><th>{html.escape(nombre)}</th>{celdas}</tr>'
+
+
+def a_html(reporte: Dict) -> str:
+    encabezado = "".join(f"<th>{titulo}</th>" for _, titulo in _COLUMNAS)
+    filas = [_fila(nombre, resumen) for nombre, resumen in reporte["endpoints"].items()]
+    if reporte["total"]:
+        filas.append(_fila("Total", reporte["total"], "total"))
+    parametros = html.escape(json.dumps(reporte["parametros"], ensure_ascii=False))
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>Prueba de carga - {reporte['fecha']}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; margin: 2rem; color: #222; }}
+table {{ border-collapse: collapse; }}
+th, td {{ padding: .35rem .8rem; border-bottom: 1px solid #ddd; text-align: right; }}
+tr th:first-child {{ text-align: left; font-family: monospace; font-weight: normal; }}
+thead th {{ background: #f3f3f3; }}
+tr.total th, tr.total td {{ font-weight: bold; border-top: 2px solid #999; }}
+code {{ background: #f3f3f3; padding: .2rem; }}
+</style>
+</head>
+<body>
+<h1>Prueba de carga</h1>
+<p>{reporte['fecha']} &middot; {reporte['duracion_s']} s</p>
+<p><code>{parametros}</code></p>
+<table>
+<thead><tr><th>Endpoint</th>{encabezado}</tr></thead>
+<tbody>
+{chr(10).join(filas)}
+</tbody>
+</table>
+</body>
+</html>
+"""
+
+
+def guardar(reporte: Dict, ruta_json=None, ruta_html=None) -> None:
+    if ruta_json:
+        Path(ruta_json).write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding="utf-8")
+    if ruta_html:
+        Path(ruta_html).write_text(a_html(reporte), encoding="utf-8")
@@ -0,0 +1,156 @@
+"""Mezcla ponderada de operaciones que simula el uso real de la biblioteca."""
+import random
+import threading
+from typing import Callable, Dict, List
+from urllib.parse import urlencode
+
+from loadtest.client import Cliente
+
+BUSQUEDAS = [
+    "secreto", "historia", "sombra", "jardín", "legado", "reino", "destino",
+    "viaje", "memoria", "garcía", "martínez", "ciencia", "amor", "guerra",
+]
+
+# Peso relativo de cada operación; las de escritura requieren un BIBLIOTECARIO
+MEZCLA_DEFAULT = {
+    "listar_libros": 30,
+    "ver_libro": 20,
+    "buscar": 25,
+    "generos": 5,
+    "estadisticas": 5,
+    "prestamos_activos": 5,
+    "prestar": 5,
+    "devolver": 5,
+}
+ESCRITURAS = {"prestar", "devolver"}
+
+
+def parse_mezcla(texto: str) -> Dict[str, int]:
+    """'buscar=50,prestar=10' -> pesos; las no mencionadas conservan el default."""
+    mezcla = dict(MEZCLA_DEFAULT)
+    for parte in filter(None, (p.strip() for p in texto.split(","))):
+        nombre, _, peso = parte.partition("=")
+        if nombre not in MEZCLA_DEFAULT:
+            raise ValueError(f"Operación desconocida en la mezcla: {nombre}")
+        mezcla[nombre] = int(peso)
+    return mezcla
+
+
+class EstadoCompartido:
+    """Datos descubiertos durante la prueba que necesitan las operaciones."""
+
+    def __init__(self):
+        self.ids_libro: List[int] = []
+        self.total_paginas = 1
+        self.generos: List[str] = []
+        self.ids_lector: List[int] = []
+        self._activos: List[int] = []
+        self._lock = threading.Lock()
+
+    def agregar_activos(self, ids: List[int]) -> None:
+        with self._lock:
+            self._activos = list(set(self._activos) | set(ids))
+
+    def tomar_activo(self, rng: random.Random):
+        with self._lock:
+            if not self._activos:
+                return None
+            return self._activos.pop(rng.randrange(len(self._activos)))
+
+
+def descubrir(cliente: Cliente, estado: EstadoCompartido) -> None:
+    """Lee el catálogo una vez para elegir ids y géneros existentes."""
+    _, pagina = cliente.solicitar("GET", "/api/libros/?page=1&per_page=100")
+    if pagina:
+        estado.total_paginas = max(pagina.get("total_pages", 1), 1)
+        estado.ids_libro = [libro["ID_LIBRO"] for libro in pagina.get("libros", [])]
+    _, generos = cliente.solicitar("GET", "/api/libros/generos")
+    if isinstance(generos, list):
+        estado.generos = [g for g in generos if isinstance(g, str)]
+    _, activos = cliente.solicitar("GET", "/api/prestamos/activos")
+    if isinstance(activos, list):
+        estado.agregar_activos([p["ID_PRESTAMO"] for p in activos])
+
+
+def _listar_libros(cliente, estado, rng):
+    pagina = rng.randint(1, min(estado.total_paginas, 50))
+    _, datos = cliente.solicitar(
+        "GET", f"/api/libros/?page={pagina}&per_page=100", nombre="GET /api/libros/?page"
+    )
+    if datos and rng.random() < 0.1 and len(estado.ids_libro) < 5000:
+        estado.ids_libro.extend(libro["ID_LIBRO"] for libro in datos.get("libros", [])[:10])
+
+
+def _ver_libro(cliente, estado, rng):
+    if estado.ids_libro:
+        cliente.solicitar("GET", f"/api/libros/{rng.choice(estado.ids_libro)}")
+
+
+def _buscar(cliente, estado, rng):
+    if estado.generos and rng.random() < 0.3:
+        consulta = {"genero": rng.choice(estado.generos)}
+    else:
+        consulta = {"titulo": rng.choice(BUSQUEDAS)}
+    cliente.solicitar("GET", f"/api/libros/search?{urlencode({**consulta, 'limit': 50})}")
+
+
+def _generos(cliente, estado, rng):
+    cliente.solicitar("GET", "/api/libros/generos")
+
+
+def _estadisticas(cliente, estado, rng):
+    cliente.solicitar("GET", "/api/libros/estadisticas")
+
+
+def _prestamos_activos(cliente, estado, rng):
+    _, activos = cliente.solicitar("GET", "/api/prestamos/activos")
+    if isinstance(activos, list):
+        estado.agregar_activos([p["ID_PRESTAMO"] for p in activos])
+
+
+def _prestar(cliente, estado, rng):
+    if not estado.ids_libro or not estado.ids_lector:
+        return
+    cliente.solicitar(
+        "POST",
+        "/api/prestamos/",
+        {"id_libro": rng.choice(estado.ids_libro), "id_usuario": rng.choice(estado.ids_lector)},
+    )
+
+
+def _devolver(cliente, estado, rng):
+    id_prestamo = estado.tomar_activo(rng)
+    if id_prestamo is not None:
+        cliente.solicitar("PUT", f"/api/prestamos/{id_prestamo}/devolver")
+
+
+OPERACIONES: Dict[str, Callable] = {
+    "listar_libros": _listar_libros,
+    "ver_libro": _ver_libro,
+    "buscar": _buscar,
+    "generos": _generos,
+    "estadisticas": _estadisticas,
+    "prestamos_activos": _prestamos_activos,
+    "prestar": _prestar,
+    "devolver": _devolver,
+}
+
+
+class Mezcla:
+    def __init__(self, pesos: Dict[str, int]):
+        self.nombres = [nombre for nombre, peso in pesos.items() if peso > 0]
+        self.pesos = [pesos[nombre] for nombre in self.nombres]
+
+    def para_rol(self, rol: str) -> "Mezcla":
+        """Los lectores no pueden prestar ni devolver."""
+        if rol == "BIBLIOTECARIO":
+            return self
+        return Mezcla({
+            nombre: peso
+            for nombre, peso in zip(self.nombres, self.pesos)
+            if nombre not in ESCRITURAS
+        })
+
+    def ejecutar_una(self, cliente: Cliente, estado: EstadoCompartido, rng: random.Random) -> None:
+        nombre = rng.choices(self.nombres, weights=self.pesos)[0]
+        OPERACIONES[nombre](cliente, estado, rng)
@@ -1,5 +1,21 @@
+from .auditoria import AuditoriaEvento, AuditoriaOutbox
+from .cambio_entidad import CambioEntidad
+from .circulacion import CirculacionDiaria, MarcaRollup
+from .latido_replica import LatidoReplica
 from .libro import Libro
+from .libro_slot import LibroSlot
 from .prestamo import Prestamo
 from .usuario import Usuario
 
-__all__ = ["Libro", "Prestamo", "Usuario"]
+__all__ = [
+    "AuditoriaEvento",
+    "AuditoriaOutbox",
+    "CambioEntidad",
+    "CirculacionDiaria",
+    "LatidoReplica",
+    "Libro",
+    "LibroSlot",
+    "MarcaRollup",
+    "Prestamo",
+    "Usuario",
+]
@@ -0,0 +1,39 @@
+"""Entidades de AUDITORIA_OUTBOX y AUDITORIA_EVENTOS (ver utils/auditoria.py)."""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index, Text
+from sqlmodel import Field, SQLModel
+
+
+class EventoAuditoriaBase(SQLModel):
+    """Quién hizo qué sobre qué registro, y desde dónde."""
+
+    id_evento: str = Field(primary_key=True, max_length=32)
+    fecha: datetime
+    accion: str = Field(max_length=30)
+    entidad: str = Field(max_length=20)
+    id_registro: Optional[int] = Field(default=None)
+    id_actor: Optional[int] = Field(default=None)
+    rol_actor: Optional[str] = Field(default=None, max_length=20)
+    origen: Optional[str] = Field(default=None, max_length=200)
+    ip: Optional[str] = Field(default=None, max_length=45)
+    detalle: Optional[str] = Field(default=None, sa_type=Text)
+
+
+class AuditoriaOutbox(EventoAuditoriaBase, table=True):
+    """Escrita en la misma transacción que la operación auditada."""
+
+    __tablename__ = "auditoria_outbox"
+    __table_args__ = (Index("idx_auditoria_outbox_fecha", "fecha"),)
+
+
+class AuditoriaEvento(EventoAuditoriaBase, table=True):
+    """Registro definitivo; lo llena el hilo de auditoría desde el outbox."""
+
+    __tablename__ = "auditoria_eventos"
+    __table_args__ = (
+        Index("idx_auditoria_eventos_registro", "entidad", "id_registro", "fecha"),
+        Index("idx_auditoria_eventos_actor", "id_actor", "fecha"),
+        Index("idx_auditoria_eventos_fecha", "fecha"),
+    )
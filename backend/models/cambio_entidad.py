@@ -0,0 +1,25 @@
+"""Entidad que representa la tabla CAMBIOS_ENTIDADES (bitácora de cambios)."""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlmodel import Field, SQLModel
+
+
+class CambioEntidad(SQLModel, table=True):
+    """Fila escrita por los triggers de 12_bitacora_cambios.sql en cada cambio.
+
+    La leen los workers para invalidar su caché local y el feed de eventos.
+    """
+
+    __tablename__ = "cambios_entidades"
+
+    id_cambio: Optional[int] = Field(default=None, primary_key=True)
+    tabla: str = Field(max_length=30)
+    operacion: str = Field(max_length=1)
+    id_registro: int
+    id_libro: Optional[int] = Field(default=None)
+    estado: Optional[str] = Field(default=None, max_length=20)
+    fecha: Optional[datetime] = Field(
+        default=None, index=True, sa_column_kwargs={"server_default": func.now()}
+    )
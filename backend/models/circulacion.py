@@ -0,0 +1,32 @@
+"""Entidades de los rollups de circulación (ver services/circulacion_service.py)."""
+from datetime import date, datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class CirculacionDiaria(SQLModel, table=True):
+    """Préstamos y devoluciones de un día para un valor de una dimensión.
+
+    La clave (dimension, dia, valor) sirve también de índice para leer una
+    serie por rango de fechas.
+    """
+
+    __tablename__ = "circulacion_diaria"
+
+    dimension: str = Field(primary_key=True, max_length=10)
+    dia: date = Field(primary_key=True)
+    valor: str = Field(primary_key=True, max_length=100)
+    prestamos: int = Field(default=0)
+    devoluciones: int = Field(default=0)
+    devoluciones_tardias: int = Field(default=0)
+
+
+class MarcaRollup(SQLModel, table=True):
+    """Hasta qué id de CAMBIOS_ENTIDADES está aplicado un rollup."""
+
+    __tablename__ = "rollup_marcas"
+
+    nombre: str = Field(primary_key=True, max_length=50)
+    ultimo_id: int = Field(default=0)
+    actualizado: Optional[datetime] = Field(default=None)
@@ -0,0 +1,14 @@
+"""Entidad que representa la tabla LATIDO_REPLICA (latido del primario)."""
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class LatidoReplica(SQLModel, table=True):
+    """Única fila que un job del primario actualiza cada segundo con su hora UTC
+    (16_latido_replica.sql); leída en la réplica, su antigüedad es el retraso."""
+
+    __tablename__ = "latido_replica"
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    fecha: datetime
@@ -2,9 +2,13 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import text
+from sqlalchemy import Column, Integer, func, text
 from sqlmodel import Field, SQLModel
 
+# Control de concurrencia optimista: SQLAlchemy incluye "WHERE version = :leida"
+# en cada UPDATE del ORM y lanza StaleDataError si otra transacción la cambió.
+_version = Column("version", Integer, nullable=False, server_default=text("1"))
+
 
 class Libro(SQLModel, table=True):
     __tablename__ = "libros"
@@ -18,6 +22,9 @@ class Libro(SQLModel, table=True):
     numero_copias: int = Field(default=1, ge=0)
     copias_disponibles: int = Field(default=1, ge=0)
     fecha_registro: Optional[datetime] = Field(
-        default=None, sa_column_kwargs={"server_default": text("SYSDATE")}
+        default=None, sa_column_kwargs={"server_default": func.now()}
     )
     editorial: Optional[str] = Field(default=None, max_length=100)
+    version: Optional[int] = Field(default=None, sa_column=_version)
+
+    __mapper_args__ = {"version_id_col": _version}
@@ -0,0 +1,10 @@
+"""Entidad que representa la tabla LIBROS_SLOTS (contador fragmentado de copias)."""
+from sqlmodel import Field, SQLModel
+
+
+class LibroSlot(SQLModel, table=True):
+    __tablename__ = "libros_slots"
+
+    id_libro: int = Field(foreign_key="libros.id_libro", primary_key=True)
+    slot: int = Field(primary_key=True, ge=0)
+    copias_disponibles: int = Field(default=0, ge=0)
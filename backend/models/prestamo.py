@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import text
+from sqlalchemy import func
 from sqlmodel import Field, SQLModel
 
 
@@ -13,7 +13,7 @@ class Prestamo(SQLModel, table=True):
     id_libro: int = Field(foreign_key="libros.id_libro", index=True)
     id_usuario: int = Field(foreign_key="usuarios.id_usuario", index=True)
     fecha_prestamo: Optional[datetime] = Field(
-        default=None, sa_column_kwargs={"server_default": text("SYSDATE")}
+        default=None, sa_column_kwargs={"server_default": func.now()}
     )
     fecha_devolucion_esperada: datetime
     fecha_devolucion_real: Optional[datetime] = Field(default=None)
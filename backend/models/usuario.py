@@ -2,9 +2,12 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import text
+from sqlalchemy import Column, Index, Integer, func, text
 from sqlmodel import Field, SQLModel
 
+# Versión de fila para concurrencia optimista (igual que en models/libro.py)
+_version = Column("version", Integer, nullable=False, server_default=text("1"))
+
 
 class Usuario(SQLModel, table=True):
     __tablename__ = "usuarios"
@@ -15,6 +18,14 @@ class Usuario(SQLModel, table=True):
     password: str = Field(max_length=255)
     rol: str = Field(default="LECTOR", max_length=20)
     fecha_registro: Optional[datetime] = Field(
-        default=None, sa_column_kwargs={"server_default": text("SYSDATE")}
+        default=None, sa_column_kwargs={"server_default": func.now()}
     )
     activo: str = Field(default="S", max_length=1)
+    version: Optional[int] = Field(default=None, sa_column=_version)
+
+    __mapper_args__ = {"version_id_col": _version}
+    # Orden y búsqueda por prefijo del directorio (ver database/13_directorio_usuarios.sql)
+    __table_args__ = (
+        Index("idx_usuarios_nombre_upper", func.upper(text("nombre")), "id_usuario"),
+        Index("idx_usuarios_email_lower", func.lower(text("email")), "id_usuario"),
+    )
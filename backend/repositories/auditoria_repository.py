@@ -0,0 +1,78 @@
+"""Repositorio del outbox y del registro de auditoría."""
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+
+from models.auditoria import AuditoriaEvento, AuditoriaOutbox
+from repositories.base import BaseRepository, lotes
+
+
+class AuditoriaRepository(BaseRepository[AuditoriaEvento]):
+    def __init__(self, session: Session):
+        super().__init__(session, AuditoriaEvento)
+
+    def insertar_outbox(self, filas: List[Dict]) -> None:
+        for lote in lotes(filas):
+            self.session.execute(insert(AuditoriaOutbox), lote)
+
+    def reclamar(self, ids: List[str]) -> Set[str]:
+        """Bloquea las filas del outbox con esos ids que nadie más tiene tomadas."""
+        reclamados: Set[str] = set()
+        for lote in lotes(ids):
+            stmt = (
+                select(AuditoriaOutbox.id_evento)
+                .where(AuditoriaOutbox.id_evento.in_(lote))
+                .with_for_update(skip_locked=True)
+            )
+            reclamados.update(self.session.execute(stmt).scalars())
+        return reclamados
+
+    def reclamar_antiguos(self, antes_de: datetime, limite: int) -> List[AuditoriaOutbox]:
+        """Bloquea hasta ``limite`` filas del outbox anteriores a ``antes_de``.
+
+        Oracle no admite FETCH FIRST con FOR UPDATE; con SKIP LOCKED las filas
+        se bloquean al leerlas, así que se leen solo ``limite`` del cursor.
+        """
+        stmt = (
+            select(AuditoriaOutbox)
+            .where(AuditoriaOutbox.fecha < antes_de)
+            .order_by(AuditoriaOutbox.fecha)
+            .with_for_update(skip_locked=True)
+        )
+        resultado = self.session.execute(stmt)
+        try:
+            return list(resultado.scalars().fetchmany(limite))
+        finally:
+            resultado.close()
+
+    def mover(self, filas: List[Dict]) -> None:
+        """INSERT de array en AUDITORIA_EVENTOS y borrado de esas filas del outbox."""
+        for lote in lotes(filas):
+            self.session.execute(insert(AuditoriaEvento), lote)
+            self.session.execute(
+                delete(AuditoriaOutbox)
+                .where(AuditoriaOutbox.id_evento.in_([fila["id_evento"] for fila in lote]))
+                .execution_options(synchronize_session=False)
+            )
+
+    def buscar(
+        self,
+        entidad: Optional[str],
+        id_registro: Optional[int],
+        id_actor: Optional[int],
+        antes_de: Optional[datetime],
+        limite: int,
+    ) -> List[AuditoriaEvento]:
+        stmt = select(AuditoriaEvento)
+        if entidad:
+            stmt = stmt.where(AuditoriaEvento.entidad == entidad)
+        if id_registro is not None:
+            stmt = stmt.where(AuditoriaEvento.id_registro == id_registro)
+        if id_actor is not None:
+            stmt = stmt.where(AuditoriaEvento.id_actor == id_actor)
+        if antes_de is not None:
+            stmt = stmt.where(AuditoriaEvento.fecha < antes_de)
+        stmt = stmt.order_by(AuditoriaEvento.fecha.desc(), AuditoriaEvento.id_evento).limit(limite)
+        return list(self.session.exec(stmt))
@@ -1,10 +1,18 @@
 """Repositorio base con operaciones CRUD genéricas."""
-from typing import Generic, List, Optional, Type, TypeVar
+from typing import Generic, Iterable, List, Optional, Sequence, Type, TypeVar
 
 from sqlmodel import Session, SQLModel, select
 
 ModelType = TypeVar("ModelType", bound=SQLModel)
 
+# Oracle admite hasta 1000 expresiones en un IN; también es el tamaño de lote de los executemany
+LOTE = 1000
+
+
+def lotes(valores: Sequence, tamano: int = LOTE) -> Iterable[Sequence]:
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
 
 class BaseRepository(Generic[ModelType]):
     def __init__(self, session: Session, model: Type[ModelType]):
@@ -0,0 +1,47 @@
+"""Repositorio de lectura de la bitácora CAMBIOS_ENTIDADES."""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_
+from sqlmodel import Session, select
+
+from models.cambio_entidad import CambioEntidad
+from repositories.base import BaseRepository
+
+
+class CambioEntidadRepository(BaseRepository[CambioEntidad]):
+    def __init__(self, session: Session):
+        super().__init__(session, CambioEntidad)
+
+    def get_ultimo_id(self) -> int:
+        stmt = select(func.coalesce(func.max(CambioEntidad.id_cambio), 0))
+        return int(self.session.execute(stmt).scalar_one())
+
+    def get_primer_id(self) -> Optional[int]:
+        stmt = select(func.min(CambioEntidad.id_cambio))
+        return self.session.execute(stmt).scalar_one()
+
+    def get_posteriores(
+        self, ultimo_id: int, huecos: Optional[List[Tuple[int, int]]] = None, limite: int = 1000
+    ) -> List[CambioEntidad]:
+        """Cambios con id mayor a ultimo_id, más los de los huecos previos (rangos inclusivos)."""
+        condicion = CambioEntidad.id_cambio > ultimo_id
+        if huecos:
+            condicion = or_(
+                condicion, *(CambioEntidad.id_cambio.between(desde, hasta) for desde, hasta in huecos)
+            )
+        stmt = (
+            select(CambioEntidad)
+            .where(condicion)
+            .order_by(CambioEntidad.id_cambio)
+            .limit(limite)
+        )
+        return list(self.session.exec(stmt))
+
+    def purgar(self, antes_de: datetime) -> int:
+        stmt = (
+            delete(CambioEntidad)
+            .where(CambioEntidad.fecha < antes_de)
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.execute(stmt).rowcount
@@ -0,0 +1,117 @@
+"""Repositorio de los rollups de circulación y de su marca de avance."""
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+
+from models.cambio_entidad import CambioEntidad
+from models.circulacion import CirculacionDiaria, MarcaRollup
+from models.libro import Libro
+from models.prestamo import Prestamo
+from models.usuario import Usuario
+from repositories.base import BaseRepository, lotes
+
+
+class CirculacionRepository(BaseRepository[CirculacionDiaria]):
+    def __init__(self, session: Session):
+        super().__init__(session, CirculacionDiaria)
+
+    def bloquear_marca(self, nombre: str, esperar: bool = True) -> Optional[MarcaRollup]:
+        """Marca bloqueada hasta el commit (la crea si falta); None si otro
+        proceso la tiene tomada y ``esperar`` es False."""
+        stmt = (
+            select(MarcaRollup)
+            .where(MarcaRollup.nombre == nombre)
+            .with_for_update(skip_locked=not esperar)
+        )
+        marca = self.session.exec(stmt).first()
+        if marca is not None:
+            return marca
+        if not esperar and self.session.get(MarcaRollup, nombre) is not None:
+            return None
+        return self.add(MarcaRollup(nombre=nombre))
+
+    def get_marca(self, nombre: str) -> Optional[MarcaRollup]:
+        return self.session.get(MarcaRollup, nombre)
+
+    def get_cambios_prestamos(self, despues_de: int, corte: datetime, limite: int) -> List[Tuple[int, int]]:
+        """(id_cambio, id_prestamo) de la bitácora posteriores a la marca y anteriores al corte."""
+        stmt = (
+            select(CambioEntidad.id_cambio, CambioEntidad.id_registro)
+            .where(
+                CambioEntidad.id_cambio > despues_de,
+                CambioEntidad.tabla == "PRESTAMOS",
+                CambioEntidad.fecha < corte,
+            )
+            .order_by(CambioEntidad.id_cambio)
+            .limit(limite)
+        )
+        return [tuple(fila) for fila in self.session.execute(stmt).all()]
+
+    def get_ultimo_cambio_antes(self, corte: datetime) -> Optional[int]:
+        stmt = select(func.max(CambioEntidad.id_cambio)).where(CambioEntidad.fecha < corte)
+        return self.session.execute(stmt).scalar_one()
+
+    def get_primer_cambio(self) -> Optional[int]:
+        return self.session.execute(select(func.min(CambioEntidad.id_cambio))).scalar_one()
+
+    def get_dias_de_prestamos(self, ids_prestamo: List[int]) -> Set[date]:
+        """Días de préstamo y de devolución de esos préstamos."""
+        dias: Set[date] = set()
+        for lote in lotes(sorted(set(ids_prestamo))):
+            stmt = select(Prestamo.fecha_prestamo, Prestamo.fecha_devolucion_real).where(
+                Prestamo.id_prestamo.in_(lote)
+            )
+            for fechas in self.session.execute(stmt).all():
+                dias.update(fecha.date() for fecha in fechas if fecha is not None)
+        return dias
+
+    def get_primer_prestamo(self) -> Optional[datetime]:
+        return self.session.execute(select(func.min(Prestamo.fecha_prestamo))).scalar_one()
+
+    def _movimientos(self, columna, desde: datetime, hasta: datetime) -> list:
+        stmt = (
+            select(
+                columna,
+                Prestamo.fecha_devolucion_esperada,
+                Libro.genero,
+                Libro.editorial,
+                Usuario.fecha_registro,
+            )
+            .join(Libro, Prestamo.id_libro == Libro.id_libro)
+            .join(Usuario, Prestamo.id_usuario == Usuario.id_usuario)
+            .where(columna >= desde, columna < hasta)
+        )
+        return list(self.session.execute(stmt).all())
+
+    def get_prestados(self, desde: datetime, hasta: datetime) -> list:
+        """(fecha_prestamo, esperada, genero, editorial, fecha_registro) en el rango."""
+        return self._movimientos(Prestamo.fecha_prestamo, desde, hasta)
+
+    def get_devueltos(self, desde: datetime, hasta: datetime) -> list:
+        """(fecha_devolucion_real, esperada, genero, editorial, fecha_registro) en el rango."""
+        return self._movimientos(Prestamo.fecha_devolucion_real, desde, hasta)
+
+    def reemplazar_dias(self, dias: List[date], filas: List[Dict]) -> None:
+        """Borra los rollups de esos días e inserta los recalculados (array DML)."""
+        for lote in lotes(sorted(dias)):
+            self.session.execute(
+                delete(CirculacionDiaria)
+                .where(CirculacionDiaria.dia.in_(lote))
+                .execution_options(synchronize_session=False)
+            )
+        for lote in lotes(filas):
+            self.session.execute(insert(CirculacionDiaria), lote)
+
+    def get_serie(self, dimension: str, desde: date, hasta: date) -> List[CirculacionDiaria]:
+        stmt = (
+            select(CirculacionDiaria)
+            .where(
+                CirculacionDiaria.dimension == dimension,
+                CirculacionDiaria.dia >= desde,
+                CirculacionDiaria.dia <= hasta,
+            )
+            .order_by(CirculacionDiaria.dia)
+        )
+        return list(self.session.exec(stmt))
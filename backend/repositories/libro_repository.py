@@ -1,10 +1,13 @@
 """Repositorio de acceso a datos para la entidad Libro."""
-from typing import Dict, List
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from sqlalchemy import and_, case, func
+from sqlalchemy import and_, case, func, true, update
 from sqlmodel import Session, select
 
 from models.libro import Libro
+from models.libro_slot import LibroSlot
+from models.prestamo import Prestamo
 from repositories.base import BaseRepository
 
 
@@ -12,6 +15,21 @@ class LibroRepository(BaseRepository[Libro]):
     def __init__(self, session: Session):
         super().__init__(session, Libro)
 
+    @staticmethod
+    def _copias_disponibles(incluir_slots: bool):
+        """Expresión de copias disponibles y subconsulta de slots a unir (o None)."""
+        if not incluir_slots:
+            return Libro.copias_disponibles, None
+        slots = (
+            select(
+                LibroSlot.id_libro,
+                func.sum(LibroSlot.copias_disponibles).label("copias"),
+            )
+            .group_by(LibroSlot.id_libro)
+            .subquery()
+        )
+        return Libro.copias_disponibles + func.coalesce(slots.c.copias, 0), slots
+
     def count(self) -> int:
         stmt = select(func.count(Libro.id_libro))
         return self.session.execute(stmt).scalar_one()
@@ -66,28 +84,186 @@ class LibroRepository(BaseRepository[Libro]):
         )
         return [row[0] for row in self.session.execute(stmt).all()]
 
-    def get_bajo_stock(self) -> List[Libro]:
-        stmt = (
-            select(Libro)
-            .where(Libro.copias_disponibles < 2)
-            .order_by(Libro.copias_disponibles)
-        )
+    def get_bajo_stock(self, incluir_slots: bool = False) -> List[Libro]:
+        disponibles, slots = self._copias_disponibles(incluir_slots)
+        stmt = select(Libro)
+        if slots is not None:
+            stmt = stmt.outerjoin(slots, slots.c.id_libro == Libro.id_libro)
+        stmt = stmt.where(disponibles < 2).order_by(disponibles)
         return list(self.session.exec(stmt))
 
-    def get_estadisticas(self) -> Dict:
+    def get_estadisticas(self, incluir_slots: bool = False) -> Dict:
+        disponibles, slots = self._copias_disponibles(incluir_slots)
         stmt = select(
             func.count(Libro.id_libro).label("total_libros"),
-            func.coalesce(func.sum(Libro.copias_disponibles), 0).label("total_disponibles"),
+            func.coalesce(func.sum(disponibles), 0).label("total_disponibles"),
             func.coalesce(func.sum(Libro.numero_copias), 0).label("total_copias"),
             func.coalesce(
                 func.sum(
                     case(
-                        (and_(Libro.copias_disponibles <= 2, Libro.numero_copias > 0), 1),
+                        (and_(disponibles <= 2, Libro.numero_copias > 0), 1),
                         else_=0,
                     )
                 ),
                 0,
             ).label("bajo_stock"),
+        ).select_from(Libro)
+        if slots is not None:
+            stmt = stmt.outerjoin(slots, slots.c.id_libro == Libro.id_libro)
+        row = self.session.execute(stmt).one()
+        return dict(row._mapping)
+
+    def get_disponibles(self, limit: int, incluir_slots: bool = False) -> List[Libro]:
+        disponibles, slots = self._copias_disponibles(incluir_slots)
+        stmt = select(Libro)
+        if slots is not None:
+            stmt = stmt.outerjoin(slots, slots.c.id_libro == Libro.id_libro)
+        stmt = stmt.where(disponibles > 0).order_by(Libro.titulo).limit(limit)
+        return list(self.session.exec(stmt))
+
+    def get_by_ids(self, ids_libro: List[int]) -> List[Libro]:
+        stmt = select(Libro).where(Libro.id_libro.in_(ids_libro))
+        return list(self.session.exec(stmt))
+
+    def get_copias_disponibles_de(self, ids_libro: List[int], incluir_slots: bool = False) -> Dict[int, int]:
+        """Copias disponibles de varios libros en una consulta (los que no existen no aparecen)."""
+        disponibles, slots = self._copias_disponibles(incluir_slots)
+        stmt = select(Libro.id_libro, disponibles).where(Libro.id_libro.in_(ids_libro))
+        if slots is not None:
+            stmt = stmt.outerjoin(slots, slots.c.id_libro == Libro.id_libro)
+        return dict(self.session.execute(stmt).all())
+
+    def get_resumen_dashboard(self, ahora: datetime, incluir_slots: bool = False) -> Dict:
+        """Totales del catálogo y de préstamos en curso en una sola consulta."""
+        disponibles, slots = self._copias_disponibles(incluir_slots)
+        catalogo = select(
+            func.count(Libro.id_libro).label("total_libros"),
+            func.coalesce(func.sum(disponibles), 0).label("total_disponibles"),
+            func.coalesce(func.sum(Libro.numero_copias), 0).label("total_copias"),
+        ).select_from(Libro)
+        if slots is not None:
+            catalogo = catalogo.outerjoin(slots, slots.c.id_libro == Libro.id_libro)
+        catalogo = catalogo.subquery()
+        # En curso incluye los que el job de 08_mejoras_recomendadas.sql ya pasó a VENCIDO
+        prestamos = (
+            select(
+                func.count(Prestamo.id_prestamo).label("prestamos_activos"),
+                func.coalesce(
+                    func.sum(case((Prestamo.fecha_devolucion_esperada < ahora, 1), else_=0)), 0
+                ).label("prestamos_vencidos"),
+            )
+            .where(Prestamo.estado.in_(("ACTIVO", "VENCIDO")))
+            .subquery()
         )
+        # Dos filas únicas: el join sin condición las combina en una
+        stmt = select(catalogo, prestamos).select_from(catalogo.join(prestamos, true()))
         row = self.session.execute(stmt).one()
         return dict(row._mapping)
+
+    def get_copias_disponibles(self, id_libro: int) -> Optional[int]:
+        """Lee la columna directamente, sin pasar por el identity map."""
+        stmt = select(Libro.copias_disponibles).where(Libro.id_libro == id_libro)
+        return self.session.execute(stmt).scalar_one_or_none()
+
+    def set_copias_disponibles(self, id_libro: int, copias: int, nueva_version: bool = True) -> int:
+        # VERSION siempre en el SET: trg_libros_version solo suma si la sentencia no la nombra
+        valores = {
+            "copias_disponibles": copias,
+            "version": Libro.version + 1 if nueva_version else Libro.version,
+        }
+        stmt = (
+            update(Libro)
+            .where(Libro.id_libro == id_libro)
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.execute(stmt).rowcount
+
+    def retirar_copias(self, conteos: Dict[int, int]) -> int:
+        """Descuenta copias de varios libros en un único UPDATE.
+
+        Solo afecta a los libros con copias suficientes; devuelve las filas
+        actualizadas para que el llamador detecte los que no alcanzaron.
+        """
+        if not conteos:
+            return 0
+        cantidad = case(conteos, value=Libro.id_libro)
+        stmt = (
+            update(Libro)
+            .where(
+                Libro.id_libro.in_(list(conteos)),
+                Libro.copias_disponibles >= cantidad,
+            )
+            .values(
+                copias_disponibles=Libro.copias_disponibles - cantidad,
+                version=Libro.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.execute(stmt).rowcount
+
+    def reponer_copias(self, conteos: Dict[int, int], nueva_version: bool = True) -> int:
+        """Suma copias devueltas a varios libros en un único UPDATE.
+
+        Con ``nueva_version=False`` (copias que vuelven de los slots, sin
+        cambio visible para el cliente) no invalida la VERSION que este leyó.
+        """
+        if not conteos:
+            return 0
+        cantidad = case(conteos, value=Libro.id_libro)
+        valores = {
+            "copias_disponibles": Libro.copias_disponibles + cantidad,
+            "version": Libro.version + 1 if nueva_version else Libro.version,
+        }
+        stmt = (
+            update(Libro)
+            .where(Libro.id_libro.in_(list(conteos)))
+            .values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.execute(stmt).rowcount
+
+    def ajustar_copias(self, id_libro: int, delta: int) -> int:
+        """Suma delta a las copias disponibles sin salir de [0, numero_copias]."""
+        nuevas = Libro.copias_disponibles + delta
+        stmt = (
+            update(Libro)
+            .where(
+                Libro.id_libro == id_libro,
+                nuevas >= 0,
+                nuevas <= Libro.numero_copias,
+            )
+            .values(copias_disponibles=nuevas, version=Libro.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.execute(stmt).rowcount
+
+    def get_descuadres_inventario(self, incluir_slots: bool = False) -> List[Dict]:
+        """Libros donde numero_copias - préstamos activos != copias_disponibles."""
+        disponibles, slots = self._copias_disponibles(incluir_slots)
+        activos = (
+            select(
+                Prestamo.id_libro,
+                func.count(Prestamo.id_prestamo).label("prestados"),
+            )
+            .where(Prestamo.estado.in_(("ACTIVO", "VENCIDO")))
+            .group_by(Prestamo.id_libro)
+            .subquery()
+        )
+        prestados = func.coalesce(activos.c.prestados, 0)
+        esperadas = Libro.numero_copias - prestados
+        stmt = (
+            select(
+                Libro.id_libro,
+                Libro.titulo,
+                Libro.numero_copias,
+                disponibles.label("copias_disponibles"),
+                prestados.label("prestados"),
+                esperadas.label("copias_esperadas"),
+            )
+            .outerjoin(activos, activos.c.id_libro == Libro.id_libro)
+        )
+        if slots is not None:
+            stmt = stmt.outerjoin(slots, slots.c.id_libro == Libro.id_libro)
+        stmt = stmt.where(disponibles != esperadas).order_by(Libro.id_libro)
+        return [dict(row._mapping) for row in self.session.execute(stmt).all()]
@@ -0,0 +1,92 @@
+"""Repositorio del contador fragmentado de copias (tabla LIBROS_SLOTS)."""
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import delete, func, insert, update
+from sqlmodel import Session, select
+
+from models.libro_slot import LibroSlot
+from repositories.base import BaseRepository
+
+
+class LibroSlotRepository(BaseRepository[LibroSlot]):
+    def __init__(self, session: Session):
+        super().__init__(session, LibroSlot)
+
+    def get_totales(self) -> Dict[int, int]:
+        """Copias guardadas en slots por libro (solo libros fragmentados)."""
+        stmt = select(
+            LibroSlot.id_libro, func.sum(LibroSlot.copias_disponibles)
+        ).group_by(LibroSlot.id_libro)
+        return {id_libro: int(total or 0) for id_libro, total in self.session.execute(stmt).all()}
+
+    def get_total(self, id_libro: int) -> int:
+        stmt = select(func.coalesce(func.sum(LibroSlot.copias_disponibles), 0)).where(
+            LibroSlot.id_libro == id_libro
+        )
+        return int(self.session.execute(stmt).scalar_one())
+
+    def get_fragmentados(self, ids_libro: Iterable[int]) -> Set[int]:
+        stmt = (
+            select(LibroSlot.id_libro)
+            .where(LibroSlot.id_libro.in_(list(ids_libro)))
+            .distinct()
+        )
+        return {row[0] for row in self.session.execute(stmt).all()}
+
+    def get_slots_con_copias(self, id_libro: int) -> List[int]:
+        """Lectura sin bloqueo de los slots que tenían copias al iniciar la consulta."""
+        stmt = select(LibroSlot.slot).where(
+            LibroSlot.id_libro == id_libro, LibroSlot.copias_disponibles > 0
+        )
+        return [row[0] for row in self.session.execute(stmt).all()]
+
+    def reservar_slot(self, id_libro: int, slot: int) -> bool:
+        """Bloquea un slot con copias saltándolo si otra transacción lo tiene."""
+        stmt = (
+            select(LibroSlot.slot)
+            .where(
+                LibroSlot.id_libro == id_libro,
+                LibroSlot.slot == slot,
+                LibroSlot.copias_disponibles > 0,
+            )
+            .with_for_update(skip_locked=True)
+        )
+        return self.session.execute(stmt).first() is not None
+
+    def ajustar(self, id_libro: int, slot: int, delta: int) -> int:
+        """Suma delta al slot sin dejarlo negativo; devuelve filas afectadas."""
+        stmt = (
+            update(LibroSlot)
+            .where(
+                LibroSlot.id_libro == id_libro,
+                LibroSlot.slot == slot,
+                LibroSlot.copias_disponibles + delta >= 0,
+            )
+            .values(copias_disponibles=LibroSlot.copias_disponibles + delta)
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.execute(stmt).rowcount
+
+    def crear_slots(self, id_libro: int, reparto: List[int]) -> None:
+        self.session.execute(
+            insert(LibroSlot),
+            [
+                {"id_libro": id_libro, "slot": slot, "copias_disponibles": copias}
+                for slot, copias in enumerate(reparto)
+            ],
+        )
+
+    def vaciar(self, id_libro: int) -> int:
+        """Bloquea, suma y elimina los slots del libro; devuelve las copias liberadas."""
+        stmt = (
+            select(LibroSlot.copias_disponibles)
+            .where(LibroSlot.id_libro == id_libro)
+            .with_for_update()
+        )
+        total = sum(row[0] for row in self.session.execute(stmt).all())
+        self.session.execute(
+            delete(LibroSlot)
+            .where(LibroSlot.id_libro == id_libro)
+            .execution_options(synchronize_session=False)
+        )
+        return total
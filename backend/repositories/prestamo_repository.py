@@ -1,12 +1,14 @@
 """Repositorio de acceso a datos para la entidad Prestamo."""
 from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
+from sqlalchemy import and_, case, func, update
 from sqlmodel import Session, select
 
 from models.libro import Libro
 from models.prestamo import Prestamo
 from models.usuario import Usuario
-from repositories.base import BaseRepository
+from repositories.base import LOTE, BaseRepository, lotes
 
 
 class PrestamoRepository(BaseRepository[Prestamo]):
@@ -24,14 +26,48 @@ class PrestamoRepository(BaseRepository[Prestamo]):
         stmt = self._query_with_details().order_by(Prestamo.fecha_prestamo.desc())
         return list(self.session.execute(stmt).all())
 
-    def get_activos_with_details(self) -> list:
+    def get_by_ids_with_details(self, ids_prestamo: List[int]) -> list:
+        stmt = self._query_with_details().where(Prestamo.id_prestamo.in_(ids_prestamo))
+        return list(self.session.execute(stmt).all())
+
+    def get_activos_with_details(self, limit: Optional[int] = None) -> list:
         stmt = (
             self._query_with_details()
             .where(Prestamo.estado == "ACTIVO")
             .order_by(Prestamo.fecha_devolucion_esperada)
+            .limit(limit)
         )
         return list(self.session.execute(stmt).all())
 
+    def get_en_curso_usuario_with_details(self, id_usuario: int) -> list:
+        stmt = (
+            self._query_with_details()
+            .where(
+                Prestamo.id_usuario == id_usuario,
+                Prestamo.estado.in_(("ACTIVO", "VENCIDO")),
+            )
+            .order_by(Prestamo.fecha_devolucion_esperada)
+        )
+        return list(self.session.execute(stmt).all())
+
+    def get_resumen_usuario(self, id_usuario: int, ahora: datetime, por_vencer_hasta: datetime) -> Dict:
+        """Conteos del dashboard de un lector en una sola consulta."""
+        en_curso = Prestamo.estado.in_(("ACTIVO", "VENCIDO"))
+        vencido = and_(en_curso, Prestamo.fecha_devolucion_esperada < ahora)
+        por_vencer = and_(
+            Prestamo.estado == "ACTIVO",
+            Prestamo.fecha_devolucion_esperada >= ahora,
+            Prestamo.fecha_devolucion_esperada <= por_vencer_hasta,
+        )
+        stmt = select(
+            func.coalesce(func.sum(case((en_curso, 1), else_=0)), 0).label("activos"),
+            func.coalesce(func.sum(case((por_vencer, 1), else_=0)), 0).label("por_vencer"),
+            func.coalesce(func.sum(case((vencido, 1), else_=0)), 0).label("vencidos"),
+            func.count(Prestamo.id_prestamo).label("total_historico"),
+        ).where(Prestamo.id_usuario == id_usuario)
+        row = self.session.execute(stmt).one()
+        return dict(row._mapping)
+
     def get_by_usuario_with_details(self, id_usuario: int) -> list:
         stmt = (
             self._query_with_details()
@@ -50,3 +86,50 @@ class PrestamoRepository(BaseRepository[Prestamo]):
             .order_by(Prestamo.fecha_devolucion_esperada)
         )
         return list(self.session.execute(stmt).all())
+
+    def lock_pendientes_devolucion(self, ids_prestamo: List[int]) -> List[Tuple[int, int]]:
+        """Bloquea los préstamos no devueltos del lote y devuelve (id_prestamo, id_libro)."""
+        stmt = (
+            select(Prestamo.id_prestamo, Prestamo.id_libro)
+            .where(
+                Prestamo.id_prestamo.in_(ids_prestamo),
+                Prestamo.estado != "DEVUELTO",
+            )
+            .with_for_update()
+        )
+        return [tuple(row) for row in self.session.execute(stmt).all()]
+
+    def marcar_devueltos(self, ids_prestamo: List[int], fecha: datetime) -> int:
+        stmt = (
+            update(Prestamo)
+            .where(Prestamo.id_prestamo.in_(ids_prestamo))
+            .values(estado="DEVUELTO", fecha_devolucion_real=fecha)
+            .execution_options(synchronize_session=False)
+        )
+        return self.session.execute(stmt).rowcount
+
+    def get_ultimo_id(self) -> int:
+        stmt = select(func.coalesce(func.max(Prestamo.id_prestamo), 0))
+        return int(self.session.execute(stmt).scalar_one())
+
+    def iter_pares_usuario_libro(self, despues_de: int, hasta: int, lote: int = LOTE) -> Iterator[Sequence[Tuple[int, int]]]:
+        """Lotes de (id_usuario, id_libro) de los préstamos con id en (despues_de, hasta], leídos en streaming."""
+        stmt = (
+            select(Prestamo.id_usuario, Prestamo.id_libro)
+            .where(Prestamo.id_prestamo > despues_de, Prestamo.id_prestamo <= hasta)
+            .execution_options(yield_per=lote)
+        )
+        for filas in self.session.execute(stmt).partitions():
+            yield [tuple(fila) for fila in filas]
+
+    def get_pares_de_usuarios(self, ids_usuario: List[int], hasta: int) -> List[Tuple[int, int]]:
+        """(id_usuario, id_libro) distintos de esos usuarios con id_prestamo <= hasta."""
+        pares = []
+        for lote in lotes(sorted(set(ids_usuario))):
+            stmt = (
+                select(Prestamo.id_usuario, Prestamo.id_libro)
+                .where(Prestamo.id_usuario.in_(lote), Prestamo.id_prestamo <= hasta)
+                .distinct()
+            )
+            pares.extend(tuple(fila) for fila in self.session.execute(stmt).all())
+        return pares
@@ -1,12 +1,27 @@
 """Repositorio de acceso a datos para la entidad Usuario."""
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import and_, func, insert, or_, text, update
 from sqlmodel import Session, select
 
 from models.prestamo import Prestamo
 from models.usuario import Usuario
-from repositories.base import BaseRepository
+from repositories.base import BaseRepository, lotes
+
+
+# Claves de orden del directorio; cada una tiene su índice de función
+CLAVES_ORDEN = {
+    "nombre": func.upper(Usuario.nombre),
+    "email": func.lower(Usuario.email),
+}
+
+
+# "!" y no "\\": los dialectos derivados de PostgreSQL (DuckDB) duplican la barra del ESCAPE
+_ESCAPE_LIKE = "!"
+
+
+def _escapar_like(valor: str) -> str:
+    return valor.replace("!", "!!").replace("%", "!%").replace("_", "!_")
 
 
 class UsuarioRepository(BaseRepository[Usuario]):
@@ -17,9 +32,87 @@ class UsuarioRepository(BaseRepository[Usuario]):
         stmt = select(Usuario).where(Usuario.email == email)
         return self.session.exec(stmt).first()
 
-    def get_all(self) -> List[Usuario]:
-        stmt = select(Usuario).order_by(Usuario.nombre)
-        return list(self.session.exec(stmt))
+    def get_emails_existentes(self, emails: Iterable[str]) -> Set[str]:
+        """Emails (en minúsculas) de ``emails`` ya registrados, sin distinguir mayúsculas."""
+        emails = sorted(set(emails))
+        existentes: Set[str] = set()
+        for lote in lotes(emails):
+            stmt = select(func.lower(Usuario.email)).where(func.lower(Usuario.email).in_(lote))
+            existentes.update(self.session.execute(stmt).scalars())
+        return existentes
+
+    def insertar_lote(self, filas: List[Dict]) -> int:
+        """INSERT con array DML (un executemany por lote); devuelve filas insertadas."""
+        for lote in lotes(filas):
+            self.session.execute(insert(Usuario), lote)
+        return len(filas)
+
+    def get_estados(self, ids: List[int]) -> Dict[int, str]:
+        """{id_usuario: activo} de los ids que existen."""
+        estados: Dict[int, str] = {}
+        for lote in lotes(sorted(set(ids))):
+            stmt = select(Usuario.id_usuario, Usuario.activo).where(Usuario.id_usuario.in_(lote))
+            estados.update(self.session.execute(stmt).tuples().all())
+        return estados
+
+    def set_activo(self, ids: List[int], activo: str) -> int:
+        """Cambia el estado de los ids que no lo tienen ya; devuelve filas afectadas."""
+        total = 0
+        for lote in lotes(sorted(set(ids))):
+            stmt = (
+                update(Usuario)
+                .where(Usuario.id_usuario.in_(lote), Usuario.activo != activo)
+                .values(activo=activo, version=Usuario.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            total += self.session.execute(stmt).rowcount
+        return total
+
+    @staticmethod
+    def _filtrar(stmt, orden: str, prefijo: str, rol: Optional[str], activo: Optional[str]):
+        if prefijo:
+            stmt = stmt.where(CLAVES_ORDEN[orden].like(_escapar_like(prefijo) + "%", escape=_ESCAPE_LIKE))
+        if rol:
+            stmt = stmt.where(Usuario.rol == rol)
+        if activo:
+            stmt = stmt.where(Usuario.activo == activo)
+        return stmt
+
+    def get_pagina(
+        self,
+        orden: str,
+        prefijo: str,
+        rol: Optional[str],
+        activo: Optional[str],
+        despues: Optional[Tuple[str, int]],
+        limite: int,
+    ) -> List[Tuple[Usuario, str]]:
+        """Página por keyset: (usuario, clave de orden) posteriores a ``despues``."""
+        clave = CLAVES_ORDEN[orden]
+        stmt = self._filtrar(select(Usuario, clave), orden, prefijo, rol, activo)
+        if despues is not None:
+            valor, id_usuario = despues
+            # El >= redundante le da al índice el inicio del rango
+            stmt = stmt.where(
+                clave >= valor,
+                or_(clave > valor, and_(clave == valor, Usuario.id_usuario > id_usuario)),
+            )
+        stmt = stmt.order_by(clave, Usuario.id_usuario).limit(limite)
+        return [tuple(row) for row in self.session.execute(stmt).all()]
+
+    def count_hasta(
+        self, orden: str, prefijo: str, rol: Optional[str], activo: Optional[str], tope: int
+    ) -> int:
+        """COUNT que deja de contar en ``tope`` filas."""
+        filas = self._filtrar(select(Usuario.id_usuario), orden, prefijo, rol, activo).limit(tope).subquery()
+        return self.session.execute(select(func.count()).select_from(filas)).scalar_one()
+
+    def get_total_estimado(self) -> Optional[int]:
+        """Filas según las estadísticas del optimizador; None fuera de Oracle o sin estadísticas."""
+        if self.session.get_bind().dialect.name != "oracle":
+            return None
+        stmt = text("SELECT num_rows FROM user_tables WHERE table_name = 'USUARIOS'")
+        return self.session.execute(stmt).scalar_one_or_none()
 
     def count_active_prestamos(self, id_usuario: int) -> int:
         stmt = select(func.count(Prestamo.id_prestamo)).where(
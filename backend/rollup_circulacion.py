@@ -0,0 +1,56 @@
+"""
+Job nocturno de los rollups de circulación (CIRCULACION_DIARIA).
+Ejecutar con: python rollup_circulacion.py [--desde AAAA-MM-DD --hasta AAAA-MM-DD | --reconstruir]
+
+Sin opciones aplica la bitácora pendiente y recalcula completos los últimos
+REPORTES_VENTANA_DIAS días, que corrige lo que el hilo incremental no vio.
+Después purga de la bitácora los cambios fuera de CACHE_BUS_RETENCION_H (el
+hilo de utils/bitacora.py lo hace también mientras la API está en marcha).
+--reconstruir recalcula desde el primer préstamo (primera instalación).
+"""
+import argparse
+import logging
+import sys
+from datetime import date, timedelta
+
+from config.database import SessionLocal
+from config.settings import REPORTES_VENTANA_DIAS
+from services.circulacion_service import CirculacionService
+from utils.bitacora import purgar_bitacora
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Actualiza los rollups de circulación")
+    parser.add_argument("--desde", type=date.fromisoformat)
+    parser.add_argument("--hasta", type=date.fromisoformat)
+    parser.add_argument("--reconstruir", action="store_true", help="recalcula todo el historial")
+    args = parser.parse_args(argv)
+
+    session = SessionLocal()
+    try:
+        servicio = CirculacionService(session)
+        servicio.actualizar()
+        session.commit()
+        if args.reconstruir:
+            dias = servicio.reconstruir()
+        else:
+            hasta = args.hasta or date.today()
+            desde = args.desde or hasta - timedelta(days=REPORTES_VENTANA_DIAS - 1)
+            dias = servicio.recalcular(desde, hasta)
+        purgados = purgar_bitacora(session)
+        session.commit()
+    except Exception as error:
+        session.rollback()
+        logger.error("No se pudieron actualizar los rollups de circulación: %s", error)
+        return 1
+    finally:
+        session.close()
+    logger.info("Rollups de circulación: %d días recalculados; %d cambios purgados de la bitácora", dias, purgados)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,15 @@
 from .auth_service import AuthService
+from .dashboard_service import DashboardService
 from .exceptions import (
     AuthError,
     BusinessRuleError,
+    ConflictError,
     NotFoundError,
     ServiceError,
+    UnavailableError,
     ValidationError,
 )
+from .inventario_service import InventarioService
 from .libro_service import LibroService
 from .prestamo_service import PrestamoService
 from .usuario_service import UsuarioService
@@ -14,10 +18,14 @@ __all__ = [
     "AuthError",
     "AuthService",
     "BusinessRuleError",
+    "ConflictError",
+    "DashboardService",
+    "InventarioService",
     "LibroService",
     "NotFoundError",
     "PrestamoService",
     "ServiceError",
+    "UnavailableError",
     "UsuarioService",
     "ValidationError",
 ]
@@ -0,0 +1,39 @@
+"""Consulta del registro de auditoría."""
+import json
+from datetime import datetime
+
+from repositories.auditoria_repository import AuditoriaRepository
+from services.exceptions import ValidationError
+from utils.serializers import to_list
+
+ENTIDADES = ("PRESTAMO", "LIBRO", "USUARIO")
+LIMITE_DEFAULT = 50
+LIMITE_MAX = 500
+
+
+class AuditoriaService:
+    def __init__(self, session):
+        self.session = session
+        self.auditoria_repo = AuditoriaRepository(session)
+
+    def buscar(self, entidad=None, id_registro=None, id_actor=None, antes=None, limite=None):
+        """Eventos más recientes primero; ``antes`` (FECHA del último recibido) pide los anteriores."""
+        if entidad:
+            entidad = entidad.upper()
+            if entidad not in ENTIDADES:
+                raise ValidationError(f"Entidad inválida. Debe ser una de: {', '.join(ENTIDADES)}")
+        antes_de = None
+        if antes:
+            try:
+                antes_de = datetime.fromisoformat(antes)
+            except ValueError:
+                raise ValidationError("Fecha 'antes' inválida (formato ISO 8601)")
+        limite = min(max(limite or LIMITE_DEFAULT, 1), LIMITE_MAX)
+
+        eventos = to_list(
+            self.auditoria_repo.buscar(entidad, id_registro, id_actor, antes_de, limite)
+        )
+        for evento in eventos:
+            if evento["DETALLE"]:
+                evento["DETALLE"] = json.loads(evento["DETALLE"])
+        return {"eventos": eventos, "limite": limite}
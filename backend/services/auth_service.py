@@ -4,6 +4,7 @@ import logging
 from models.usuario import Usuario
 from repositories.usuario_repository import UsuarioRepository
 from services.exceptions import AuthError, ValidationError
+from utils.auditoria import auditar
 from utils.security import generate_token, hash_password, verify_password
 
 logger = logging.getLogger(__name__)
@@ -11,6 +12,7 @@ logger = logging.getLogger(__name__)
 
 class AuthService:
     def __init__(self, session):
+        self.session = session
         self.usuario_repo = UsuarioRepository(session)
 
     def login(self, email, password):
@@ -18,16 +20,18 @@ class AuthService:
             raise ValidationError("Email y contraseña son requeridos")
 
         usuario = self.usuario_repo.get_by_email(email)
+        # Libera la conexión antes del bcrypt, que no necesita la base
+        self.session.commit()
         if (
             not usuario
             or usuario.activo != "S"
             or not verify_password(password, usuario.password)
         ):
-            logger.warning(f"Intento de login fallido para email: {email}")
+            logger.warning("Intento de login fallido para email: %s", email)
             raise AuthError("Credenciales inválidas")
 
         token = generate_token(usuario.id_usuario, usuario.email, usuario.rol)
-        logger.info(f"Login exitoso para usuario: {email}")
+        logger.info("Login exitoso para usuario: %s", email)
 
         return {
             "success": True,
@@ -47,18 +51,23 @@ class AuthService:
         if len(password) < 6:
             raise ValidationError("La contraseña debe tener al menos 6 caracteres")
 
+        # El hash se calcula antes de la primera consulta para no retener
+        # una conexión del pool durante el bcrypt
+        password_hash = hash_password(password)
+
         if self.usuario_repo.get_by_email(email):
-            logger.warning(f"Intento de registro con email duplicado: {email}")
+            logger.warning("Intento de registro con email duplicado: %s", email)
             raise ValidationError("El email ya está registrado")
 
         # SEGURIDAD: el rol siempre es LECTOR (se ignora cualquier rol enviado)
         usuario = Usuario(
             nombre=nombre,
             email=email,
-            password=hash_password(password),
+            password=password_hash,
             rol="LECTOR",
         )
         self.usuario_repo.add(usuario)
+        auditar(self.session, "REGISTRADO", "USUARIO", usuario.id_usuario, email=email)
 
-        logger.info(f"Nuevo usuario registrado: {email}")
+        logger.info("Nuevo usuario registrado: %s", email)
         return {"success": True, "message": "Usuario registrado exitosamente"}
@@ -0,0 +1,253 @@
+"""Rollups diarios de circulación y series para /api/reportes/circulacion.
+
+CIRCULACION_DIARIA guarda, por día y por valor de cada dimensión (total,
+género, editorial y cohorte de alta del usuario), cuántos préstamos y
+devoluciones hubo. Los reportes leen esas filas en lugar de agrupar
+PRESTAMOS completa en cada request.
+
+- ``actualizar()`` (hilo de utils/circulacion.py, cada REPORTES_INTERVALO_S)
+  lee los cambios de PRESTAMOS de la bitácora posteriores a la marca de
+  ROLLUP_MARCAS y recalcula solo los días de esos préstamos.
+- ``recalcular(desde, hasta)`` (job nocturno rollup_circulacion.py) rehace
+  un rango de días: corrige lo que el incremental no vio (transacciones que
+  confirmaron después del margen, préstamos eliminados, cambios de género o
+  editorial de un libro).
+
+Un día se recalcula siempre completo desde PRESTAMOS, así que aplicar dos
+veces el mismo cambio no duplica cuentas.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from config.settings import CACHE_BUS_RETENCION_H, REPORTES_MARGEN_S
+from repositories.base import LOTE
+from repositories.circulacion_repository import CirculacionRepository
+from services.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+MARCA = "circulacion"
+DIMENSIONES = ("TOTAL", "GENERO", "EDITORIAL", "COHORTE")
+INTERVALOS = ("dia", "semana", "mes")
+SIN_VALOR = {"GENERO": "(sin género)", "EDITORIAL": "(sin editorial)", "COHORTE": "(sin fecha)"}
+OTROS = "(otros)"
+DIAS_POR_TRANSACCION = 31
+CAMBIOS_MAX_LOTES = 10
+RANGO_MAX_DIAS = 5 * 366
+RANGO_DEFAULT_DIAS = {"dia": 30, "semana": 180, "mes": 365}
+TOP_DEFAULT = 10
+TOP_MAX = 50
+
+
+def _valores(genero: Optional[str], editorial: Optional[str], registro: Optional[datetime]) -> Dict[str, str]:
+    return {
+        "TOTAL": "TOTAL",
+        "GENERO": (genero or SIN_VALOR["GENERO"])[:100],
+        "EDITORIAL": (editorial or SIN_VALOR["EDITORIAL"])[:100],
+        "COHORTE": registro.strftime("%Y-%m") if registro else SIN_VALOR["COHORTE"],
+    }
+
+
+def _periodo(dia: date, intervalo: str) -> date:
+    if intervalo == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if intervalo == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def _periodos(desde: date, hasta: date, intervalo: str) -> List[date]:
+    periodos, dia = [], _periodo(desde, intervalo)
+    while dia <= hasta:
+        periodos.append(dia)
+        if intervalo == "mes":
+            dia = (dia + timedelta(days=32)).replace(day=1)
+        else:
+            dia += timedelta(days=7 if intervalo == "semana" else 1)
+    return periodos
+
+
+def _fecha(valor: Optional[str], nombre: str) -> Optional[date]:
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValidationError(f"Fecha '{nombre}' inválida (formato AAAA-MM-DD)")
+
+
+class CirculacionService:
+    def __init__(self, session):
+        self.session = session
+        self.circulacion_repo = CirculacionRepository(session)
+
+    # ------------------------------------------------------------------
+    # Mantenimiento de los rollups
+    # ------------------------------------------------------------------
+    def _calcular(self, desde: date, hasta: date) -> List[Dict]:
+        """Filas de CIRCULACION_DIARIA de los días [desde, hasta] leídas de PRESTAMOS."""
+        inicio = datetime.combine(desde, datetime.min.time())
+        fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+        cuentas = defaultdict(lambda: [0, 0, 0])
+
+        for fecha, _, genero, editorial, registro in self.circulacion_repo.get_prestados(inicio, fin):
+            for dimension, valor in _valores(genero, editorial, registro).items():
+                cuentas[(dimension, fecha.date(), valor)][0] += 1
+        for fecha, esperada, genero, editorial, registro in self.circulacion_repo.get_devueltos(inicio, fin):
+            tarde = fecha.date() > esperada.date()
+            for dimension, valor in _valores(genero, editorial, registro).items():
+                fila = cuentas[(dimension, fecha.date(), valor)]
+                fila[1] += 1
+                fila[2] += tarde
+
+        return [
+            {
+                "dimension": dimension,
+                "dia": dia,
+                "valor": valor,
+                "prestamos": prestamos,
+                "devoluciones": devoluciones,
+                "devoluciones_tardias": tardias,
+            }
+            for (dimension, dia, valor), (prestamos, devoluciones, tardias) in cuentas.items()
+        ]
+
+    def _reemplazar(self, dias: List[date]) -> None:
+        """Recalcula días sueltos con una consulta por tramo de días consecutivos."""
+        filas, inicio = [], dias[0]
+        for anterior, dia in zip(dias, dias[1:] + [None]):
+            if dia is None or (dia - anterior).days > 1:
+                filas.extend(self._calcular(inicio, anterior))
+                inicio = dia
+        self.circulacion_repo.reemplazar_dias(dias, filas)
+
+    def recalcular(self, desde: date, hasta: date) -> int:
+        """Rehace los días [desde, hasta] en transacciones de DIAS_POR_TRANSACCION días."""
+        dias = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=DIAS_POR_TRANSACCION - 1), hasta)
+            # Serializa con el incremental: ninguno pisa un día que el otro está escribiendo
+            self.circulacion_repo.bloquear_marca(MARCA)
+            rango = [inicio + timedelta(days=n) for n in range((fin - inicio).days + 1)]
+            self.circulacion_repo.reemplazar_dias(rango, self._calcular(inicio, fin))
+            self.session.commit()
+            dias += len(rango)
+            inicio = fin + timedelta(days=1)
+        return dias
+
+    def reconstruir(self) -> int:
+        """Recalcula desde el primer préstamo hasta hoy."""
+        primero = self.circulacion_repo.get_primer_prestamo()
+        if primero is None:
+            return 0
+        return self.recalcular(primero.date(), date.today())
+
+    def actualizar(self, esperar: bool = True) -> Optional[int]:
+        """Aplica la bitácora desde la marca; días recalculados, o None si
+        otro proceso ya está actualizando y ``esperar`` es False."""
+        marca = self.circulacion_repo.bloquear_marca(MARCA, esperar)
+        if marca is None:
+            return None
+        ahora = datetime.now()
+        corte = ahora - timedelta(seconds=REPORTES_MARGEN_S)
+
+        if marca.actualizado is None:
+            # Primera ejecución: el historial lo carga rollup_circulacion.py --reconstruir
+            marca.ultimo_id = self.circulacion_repo.get_ultimo_cambio_antes(corte) or 0
+            marca.actualizado = ahora
+            logger.info("Rollups de circulación inicializados en el cambio %d", marca.ultimo_id)
+            return 0
+
+        dias = set()
+        if marca.actualizado < ahora - timedelta(hours=CACHE_BUS_RETENCION_H):
+            # La bitácora pudo purgarse desde la última pasada: se rehace ese tramo
+            dias.update(
+                marca.actualizado.date() + timedelta(days=n)
+                for n in range((ahora.date() - marca.actualizado.date()).days + 1)
+            )
+            logger.warning("Rollups de circulación sin actualizar desde %s; se recalculan %d días",
+                           marca.actualizado, len(dias))
+
+        ids_prestamo = []
+        for _ in range(CAMBIOS_MAX_LOTES):
+            cambios = self.circulacion_repo.get_cambios_prestamos(marca.ultimo_id, corte, LOTE)
+            if cambios:
+                marca.ultimo_id = cambios[-1][0]
+                ids_prestamo.extend(id_prestamo for _, id_prestamo in cambios)
+            if len(cambios) < LOTE:
+                break
+        dias.update(self.circulacion_repo.get_dias_de_prestamos(ids_prestamo))
+
+        if dias:
+            self._reemplazar(sorted(dias))
+        marca.actualizado = ahora
+        return len(dias)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def get_serie(self, dimension=None, desde=None, hasta=None, intervalo=None, top=None):
+        """Serie de préstamos y devoluciones por período para cada valor de la dimensión.
+
+        Los valores fuera de los ``top`` con más préstamos se suman en "(otros)".
+        """
+        dimension = (dimension or "TOTAL").upper()
+        if dimension not in DIMENSIONES:
+            raise ValidationError(f"Dimensión inválida. Debe ser una de: {', '.join(DIMENSIONES).lower()}")
+        intervalo = (intervalo or "dia").lower()
+        if intervalo not in INTERVALOS:
+            raise ValidationError(f"Intervalo inválido. Debe ser uno de: {', '.join(INTERVALOS)}")
+        hasta = _fecha(hasta, "hasta") or date.today()
+        desde = _fecha(desde, "desde") or hasta - timedelta(days=RANGO_DEFAULT_DIAS[intervalo] - 1)
+        if desde > hasta:
+            raise ValidationError("'desde' no puede ser posterior a 'hasta'")
+        if (hasta - desde).days >= RANGO_MAX_DIAS:
+            raise ValidationError(f"El rango no puede superar {RANGO_MAX_DIAS} días")
+        top = min(max(top or TOP_DEFAULT, 1), TOP_MAX)
+
+        periodos = _periodos(desde, hasta, intervalo)
+        posicion = {periodo: n for n, periodo in enumerate(periodos)}
+        series = defaultdict(lambda: {
+            "prestamos": [0] * len(periodos),
+            "devoluciones": [0] * len(periodos),
+            "devoluciones_tardias": [0] * len(periodos),
+        })
+        for fila in self.circulacion_repo.get_serie(dimension, desde, hasta):
+            serie = series[fila.valor]
+            n = posicion[_periodo(fila.dia, intervalo)]
+            serie["prestamos"][n] += fila.prestamos
+            serie["devoluciones"][n] += fila.devoluciones
+            serie["devoluciones_tardias"][n] += fila.devoluciones_tardias
+
+        ordenadas = sorted(series.items(), key=lambda item: (-sum(item[1]["prestamos"]), item[0]))
+        resultado = [{"valor": valor, **serie} for valor, serie in ordenadas[:top]]
+        if len(ordenadas) > top:
+            otros = {campo: [0] * len(periodos) for campo in ("prestamos", "devoluciones", "devoluciones_tardias")}
+            for _, serie in ordenadas[top:]:
+                for campo, valores in otros.items():
+                    for n, valor in enumerate(serie[campo]):
+                        valores[n] += valor
+            resultado.append({"valor": OTROS, **otros})
+        for serie in resultado:
+            serie["total_prestamos"] = sum(serie["prestamos"])
+
+        return {
+            "dimension": dimension.lower(),
+            "intervalo": intervalo,
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "periodos": [periodo.isoformat() for periodo in periodos],
+            "series": resultado,
+            **self.get_estado(),
+        }
+
+    def get_estado(self) -> Dict:
+        marca = self.circulacion_repo.get_marca(MARCA)
+        actualizado = marca.actualizado if marca else None
+        return {
+            "actualizado": actualizado.isoformat(timespec="seconds") if actualizado else None,
+            "ultimo_cambio": marca.ultimo_id if marca else None,
+        }
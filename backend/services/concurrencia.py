@@ -0,0 +1,22 @@
+"""Utilidades de control de concurrencia optimista para los servicios."""
+from services.exceptions import ConflictError, ValidationError
+
+
+def verificar_version(entidad, version_esperada, descripcion: str) -> None:
+    """Rechaza la escritura si el cliente editó una versión anterior de la fila.
+
+    ``version_esperada`` es la VERSION que el cliente leyó; si no la envía se
+    mantiene el comportamiento anterior (última escritura gana dentro de la
+    verificación que hace el ORM en el propio UPDATE).
+    """
+    if version_esperada is None:
+        return
+    try:
+        version_esperada = int(version_esperada)
+    except (TypeError, ValueError):
+        raise ValidationError("version debe ser numérica")
+    if version_esperada != entidad.version:
+        raise ConflictError(
+            f"{descripcion} fue modificado por otro usuario. "
+            "Recargue los datos e intente nuevamente."
+        )
@@ -0,0 +1,62 @@
+"""Datos del dashboard agregados en una sola respuesta por rol."""
+from datetime import datetime, timedelta
+
+from cache import clave, get_cache
+from repositories.libro_repository import LibroRepository
+from repositories.prestamo_repository import PrestamoRepository
+from services.inventario_service import InventarioService
+from services.libro_service import LibroService
+from services.prestamo_service import PrestamoService
+
+MAX_PRESTAMOS_RECIENTES = 10
+DIAS_POR_VENCER = 3
+
+
+class DashboardService:
+    def __init__(self, session):
+        self.session = session
+        self.libro_repo = LibroRepository(session)
+        self.prestamo_repo = PrestamoRepository(session)
+        self.inventario = InventarioService(session)
+        self.libros = LibroService(session)
+        self.prestamos = PrestamoService(session)
+        self.cache = get_cache()
+
+    def get_dashboard(self, user):
+        if user["rol"] == "BIBLIOTECARIO":
+            return self.get_bibliotecario()
+        return self.get_lector(user["user_id"])
+
+    def get_bibliotecario(self):
+        return self.cache.obtener("dashboard", self._cargar_bibliotecario)
+
+    def _cargar_bibliotecario(self):
+        estadisticas = self.libro_repo.get_resumen_dashboard(
+            datetime.now(), incluir_slots=self.inventario.fragmentado
+        )
+        bajo_stock = self.libros.get_bajo_stock()
+        estadisticas["bajo_stock"] = len(bajo_stock)
+        return {
+            "rol": "BIBLIOTECARIO",
+            "estadisticas": estadisticas,
+            "bajo_stock": bajo_stock,
+            "prestamos_activos": self.prestamos.get_activos(MAX_PRESTAMOS_RECIENTES),
+        }
+
+    def get_lector(self, id_usuario):
+        datos = self.cache.obtener(
+            clave("dashboard_lector", id_usuario), lambda: self._cargar_lector(id_usuario)
+        )
+        # El catálogo disponible es el mismo para todos los lectores
+        return {**datos, "libros_disponibles": self.libros.get_disponibles()}
+
+    def _cargar_lector(self, id_usuario):
+        ahora = datetime.now()
+        estadisticas = self.prestamo_repo.get_resumen_usuario(
+            id_usuario, ahora, ahora + timedelta(days=DIAS_POR_VENCER)
+        )
+        return {
+            "rol": "LECTOR",
+            "estadisticas": estadisticas,
+            "prestamos_activos": self.prestamos.get_en_curso_usuario(id_usuario),
+        }
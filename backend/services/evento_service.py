@@ -0,0 +1,65 @@
+"""Traducción de la bitácora CAMBIOS_ENTIDADES a los eventos de /api/events."""
+from typing import Dict, List
+
+from models.cambio_entidad import CambioEntidad
+from services.libro_service import LibroService
+from services.prestamo_service import PrestamoService
+
+TIPOS_POR_ESTADO = {"DEVUELTO": "prestamo_devuelto", "VENCIDO": "prestamo_vencido"}
+
+
+class EventoService:
+    def __init__(self, session):
+        self.session = session
+        self.prestamos = PrestamoService(session)
+        self.libros = LibroService(session)
+
+    def desde_cambios(self, cambios: List[CambioEntidad]) -> List[Dict]:
+        """Eventos [{"id", "tipo", "datos"}] de un lote de cambios, en orden.
+
+        Cada evento de préstamo lleva el usuario (para filtrar por lector) y
+        las copias disponibles de su libro, así que un préstamo no genera
+        además un ``stock_cambiado``. Varios cambios del mismo libro en el
+        lote se reducen al último.
+        """
+        ids_prestamo = {
+            cambio.id_registro
+            for cambio in cambios
+            if cambio.tabla == "PRESTAMOS" and cambio.operacion != "D"
+        }
+        ids_libro = {
+            cambio.id_libro
+            for cambio in cambios
+            if cambio.tabla in ("LIBROS", "PRESTAMOS") and cambio.id_libro is not None
+        }
+        prestamos = self.prestamos.get_by_ids(ids_prestamo)
+        copias = self.libros.get_copias_disponibles(ids_libro)
+        ultimo_por_libro = {
+            cambio.id_libro: cambio.id_cambio for cambio in cambios if cambio.tabla == "LIBROS"
+        }
+
+        eventos = []
+        for cambio in cambios:
+            if cambio.tabla == "PRESTAMOS":
+                prestamo = prestamos.get(cambio.id_registro)
+                tipo = "prestamo_creado" if cambio.operacion == "I" else TIPOS_POR_ESTADO.get(cambio.estado)
+                if prestamo is None or tipo is None:
+                    continue
+                if tipo == "prestamo_creado":
+                    datos = {"prestamo": prestamo}
+                else:
+                    datos = {"id_prestamo": cambio.id_registro, "estado": cambio.estado}
+                datos.update(
+                    id_libro=cambio.id_libro,
+                    id_usuario=prestamo["ID_USUARIO"],
+                    copias_disponibles=copias.get(cambio.id_libro),
+                )
+            elif cambio.tabla == "LIBROS":
+                if cambio.operacion == "D" or ultimo_por_libro[cambio.id_libro] != cambio.id_cambio:
+                    continue
+                tipo = "stock_cambiado"
+                datos = {"id_libro": cambio.id_libro, "copias_disponibles": copias.get(cambio.id_libro)}
+            else:
+                continue
+            eventos.append({"id": cambio.id_cambio, "tipo": tipo, "datos": datos})
+        return eventos
@@ -27,3 +27,11 @@ class BusinessRuleError(ServiceError):
 
 class AuthError(ServiceError):
     status_code = 401
+
+
+class ConflictError(ServiceError):
+    status_code = 409
+
+
+class UnavailableError(ServiceError):
+    status_code = 503
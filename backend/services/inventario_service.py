@@ -0,0 +1,214 @@
+"""Contabilidad de copias disponibles cuando la aplicación reemplaza a los triggers."""
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Iterable
+
+from config.settings import (
+    INVENTARIO_CONTENCION_EVENTOS,
+    INVENTARIO_CONTENCION_MS,
+    INVENTARIO_CONTENCION_VENTANA_S,
+    INVENTARIO_FRAGMENTADO,
+    INVENTARIO_MODO,
+    INVENTARIO_SLOTS,
+)
+from repositories.libro_repository import LibroRepository
+from repositories.libro_slot_repository import LibroSlotRepository
+from services.exceptions import BusinessRuleError
+
+logger = logging.getLogger(__name__)
+
+
+class MonitorContencion:
+    """Cuenta, por libro, las esperas largas sobre su fila en una ventana deslizante."""
+
+    MAX_LIBROS_OBSERVADOS = 1000
+
+    def __init__(self, umbral_ms: float, eventos: int, ventana_s: float):
+        self.umbral_s = umbral_ms / 1000
+        self.eventos = eventos
+        self.ventana_s = ventana_s
+        self._esperas: Dict[int, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, id_libro: int, espera_s: float) -> bool:
+        """Anota una espera y devuelve True cuando el libro debe fragmentarse."""
+        if espera_s < self.umbral_s:
+            return False
+        ahora = time.monotonic()
+        with self._lock:
+            if len(self._esperas) >= self.MAX_LIBROS_OBSERVADOS:
+                self._purgar(ahora)
+            esperas = self._esperas.setdefault(id_libro, deque())
+            esperas.append(ahora)
+            while esperas and ahora - esperas[0] > self.ventana_s:
+                esperas.popleft()
+            if len(esperas) >= self.eventos:
+                del self._esperas[id_libro]
+                return True
+        return False
+
+    def _purgar(self, ahora: float) -> None:
+        for id_libro in [
+            id_libro
+            for id_libro, esperas in self._esperas.items()
+            if not esperas or ahora - esperas[-1] > self.ventana_s
+        ]:
+            del self._esperas[id_libro]
+
+
+monitor_contencion = MonitorContencion(
+    INVENTARIO_CONTENCION_MS, INVENTARIO_CONTENCION_EVENTOS, INVENTARIO_CONTENCION_VENTANA_S
+)
+
+
+class InventarioService:
+    """Mantiene LIBROS.COPIAS_DISPONIBLES dentro de la transacción del préstamo.
+
+    En modo TRIGGER no hace nada: los triggers de 03_triggers.sql ya ajustan
+    las copias fila a fila. En modo APLICACION agrupa los movimientos por libro
+    y los aplica con un UPDATE por lote.
+
+    Con INVENTARIO_FRAGMENTADO, los libros con contención se reparten en
+    LIBROS_SLOTS: las copias disponibles son LIBROS.COPIAS_DISPONIBLES más la
+    suma de sus slots, y cada préstamo reserva un slot con SKIP LOCKED.
+    """
+
+    def __init__(
+        self,
+        session,
+        modo: str = INVENTARIO_MODO,
+        fragmentado: bool = INVENTARIO_FRAGMENTADO,
+        slots: int = INVENTARIO_SLOTS,
+    ):
+        self.libro_repo = LibroRepository(session)
+        self.slot_repo = LibroSlotRepository(session)
+        self.modo = modo
+        self.fragmentado = fragmentado and modo == "APLICACION"
+        self.slots = max(slots, 1)
+
+    @property
+    def gestionado_por_aplicacion(self) -> bool:
+        return self.modo == "APLICACION"
+
+    @staticmethod
+    def _agrupar(ids_libro: Iterable[int]) -> Dict[int, int]:
+        return dict(Counter(int(id_libro) for id_libro in ids_libro))
+
+    def _separar_fragmentados(self, conteos: Dict[int, int]) -> Dict[int, int]:
+        """Quita de conteos los libros fragmentados y los devuelve aparte."""
+        if not self.fragmentado or not conteos:
+            return {}
+        return {
+            id_libro: conteos.pop(id_libro)
+            for id_libro in self.slot_repo.get_fragmentados(conteos)
+        }
+
+    def retirar(self, ids_libro: Iterable[int]) -> None:
+        """Descuenta una copia por cada id recibido (puede repetirse)."""
+        if not self.gestionado_por_aplicacion:
+            return
+        conteos = self._agrupar(ids_libro)
+        for id_libro, cantidad in self._separar_fragmentados(conteos).items():
+            for _ in range(cantidad):
+                self._retirar_de_slot(id_libro)
+        if not conteos:
+            return
+
+        inicio = time.perf_counter()
+        actualizados = self.libro_repo.retirar_copias(conteos)
+        espera = time.perf_counter() - inicio
+        if actualizados != len(conteos):
+            raise BusinessRuleError("No hay copias disponibles")
+
+        # Solo el préstamo individual mide la espera de una fila concreta
+        if self.fragmentado and len(conteos) == 1:
+            (id_libro,) = conteos
+            if monitor_contencion.registrar(id_libro, espera):
+                self.fragmentar(id_libro)
+
+    def _retirar_de_slot(self, id_libro: int) -> None:
+        candidatos = self.slot_repo.get_slots_con_copias(id_libro)
+        random.shuffle(candidatos)
+        for slot in candidatos:
+            if self.slot_repo.reservar_slot(id_libro, slot):
+                self.slot_repo.ajustar(id_libro, slot, -1)
+                return
+
+        # Todos los slots agotados o tomados: fila base y, por último, esperar un slot
+        if self.libro_repo.retirar_copias({id_libro: 1}) == 1:
+            return
+        for slot in candidatos:
+            if self.slot_repo.ajustar(id_libro, slot, -1) == 1:
+                return
+        raise BusinessRuleError("No hay copias disponibles")
+
+    def reponer(self, ids_libro: Iterable[int]) -> None:
+        """Devuelve una copia por cada id recibido (puede repetirse)."""
+        if not self.gestionado_por_aplicacion:
+            return
+        conteos = self._agrupar(ids_libro)
+        for id_libro, cantidad in self._separar_fragmentados(conteos).items():
+            for _ in range(cantidad):
+                if not self.slot_repo.ajustar(id_libro, random.randrange(self.slots), 1):
+                    self.slot_repo.ajustar(id_libro, 0, 1)
+        self.libro_repo.reponer_copias(conteos)
+
+    def fragmentar(self, id_libro: int) -> None:
+        """Reparte las copias de la fila base del libro entre sus slots.
+
+        Se invoca con la fila de LIBROS ya bloqueada por el UPDATE del préstamo,
+        lo que serializa promociones concurrentes del mismo libro.
+        """
+        if self.slot_repo.get_fragmentados([id_libro]):
+            return
+        copias = self.libro_repo.get_copias_disponibles(id_libro) or 0
+        reparto = [
+            copias // self.slots + (1 if slot < copias % self.slots else 0)
+            for slot in range(self.slots)
+        ]
+        self.slot_repo.crear_slots(id_libro, reparto)
+        # Las copias visibles (fila base + slots) no cambian: la VERSION tampoco
+        self.libro_repo.set_copias_disponibles(id_libro, 0, nueva_version=False)
+        logger.info("Libro %s fragmentado en %d slots por contención", id_libro, self.slots)
+
+    def consolidar(self, id_libro: int) -> int:
+        """Devuelve a la fila base las copias de los slots del libro y los elimina.
+
+        Devuelve las copias movidas: el UPDATE no sincroniza la sesión, así que
+        un Libro ya cargado debe sumarlas a su copias_disponibles.
+        """
+        if not self.fragmentado:
+            return 0
+        if not self.slot_repo.get_fragmentados([id_libro]):
+            return 0
+        copias = self.slot_repo.vaciar(id_libro)
+        if copias:
+            self.libro_repo.reponer_copias({id_libro: copias}, nueva_version=False)
+        return copias
+
+    def copias_fragmentadas(self) -> Dict[int, int]:
+        """Copias en slots por libro, para sumarlas a la columna de LIBROS."""
+        if not self.fragmentado:
+            return {}
+        return self.slot_repo.get_totales()
+
+    def copias_fragmentadas_de(self, id_libro: int) -> int:
+        if not self.fragmentado:
+            return 0
+        return self.slot_repo.get_total(id_libro)
+
+    def conciliar(self):
+        descuadres = self.libro_repo.get_descuadres_inventario(
+            incluir_slots=self.fragmentado
+        )
+        return {
+            "modo": self.modo,
+            "consistente": not descuadres,
+            "descuadres": [
+                {key.upper(): value for key, value in fila.items()}
+                for fila in descuadres
+            ],
+        }
@@ -1,24 +1,65 @@
 """Servicios de gestión de libros."""
 import logging
 
+from cache import clave, get_cache
+from config.settings import SIMILARES_K
 from models.libro import Libro
 from repositories.libro_repository import LibroRepository
+from services.concurrencia import verificar_version
 from services.exceptions import (
     BusinessRuleError,
     NotFoundError,
     ValidationError,
 )
+from services.inventario_service import InventarioService
+from utils.auditoria import auditar, diferencias
 from utils.serializers import to_dict, to_list
+from utils.similares import lector as similares
 
 logger = logging.getLogger(__name__)
 
 MAX_RESULTADOS = 2000
 PER_PAGE_DEFAULT = 100
+MAX_DISPONIBLES = 100
+SIMILARES_DEFAULT = 10
+CAMPOS_AUDITADOS = (
+    "titulo", "autor", "isbn", "anio_publicacion", "genero",
+    "numero_copias", "copias_disponibles", "editorial",
+)
+
+
+def _entero(valor, campo):
+    if isinstance(valor, bool):
+        raise ValidationError(f"{campo} debe ser un número entero")
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{campo} debe ser un número entero")
 
 
 class LibroService:
     def __init__(self, session):
+        self.session = session
         self.libro_repo = LibroRepository(session)
+        self.inventario = InventarioService(session)
+        self.cache = get_cache()
+
+    def _invalidar(self, id_libro=None, generos=False):
+        claves = ["estadisticas", "dashboard", "libros_disponibles"]
+        if id_libro is not None:
+            claves.append(clave("libro", id_libro))
+        if generos:
+            claves.append("generos")
+        self.cache.invalidar_al_confirmar(self.session, *claves)
+
+    def _serializar(self, libros):
+        """Serializa sumando las copias de los libros fragmentados en slots."""
+        datos = to_list(libros)
+        fragmentadas = self.inventario.copias_fragmentadas()
+        if fragmentadas:
+            for dato in datos:
+                dato["COPIAS_DISPONIBLES"] += fragmentadas.get(dato["ID_LIBRO"], 0)
+        return datos
 
     def get_all(self, page, per_page, limit):
         page = max(page or 1, 1)
@@ -33,7 +74,7 @@ class LibroService:
 
         total = self.libro_repo.count()
         return {
-            "libros": to_list(libros),
+            "libros": self._serializar(libros),
             "page": page,
             "per_page": per_page,
             "total": total,
@@ -41,24 +82,51 @@ class LibroService:
         }
 
     def get_all_for_export(self):
-        return to_list(self.libro_repo.get_ordered_by_titulo())
+        return self._serializar(self.libro_repo.get_ordered_by_titulo())
 
     def get_by_id(self, id_libro):
+        return self.cache.obtener(clave("libro", id_libro), lambda: self._cargar(id_libro))
+
+    def _cargar(self, id_libro):
         libro = self.libro_repo.get_by_id(id_libro)
         if not libro:
             raise NotFoundError("Libro no encontrado")
-        return to_dict(libro)
+        data = to_dict(libro)
+        data["COPIAS_DISPONIBLES"] += self.inventario.copias_fragmentadas_de(id_libro)
+        return data
+
+    def get_similares(self, id_libro, limite=None):
+        """Libros que más pidieron los mismos usuarios, de la tabla de construir_similares.py."""
+        limite = min(max(limite or SIMILARES_DEFAULT, 1), SIMILARES_K)
+        self.get_by_id(id_libro)
+        vecinos = similares.vecinos(id_libro, SIMILARES_K)
+        resultado = {
+            "id_libro": id_libro,
+            "similares": [],
+            "generado": similares.generado.isoformat(timespec="seconds") if similares.generado else None,
+        }
+        if not vecinos:
+            return resultado
+
+        # Los libros eliminados después de construir la tabla se omiten
+        libros = {libro["ID_LIBRO"]: libro for libro in self._serializar(
+            self.libro_repo.get_by_ids([vecino for vecino, _, _ in vecinos])
+        )}
+        for vecino, puntaje, comunes in vecinos:
+            if vecino in libros and len(resultado["similares"]) < limite:
+                resultado["similares"].append({**libros[vecino], "PUNTAJE": round(puntaje, 4), "COMUNES": comunes})
+        return resultado
 
     def get_generos(self):
-        return self.libro_repo.get_generos()
+        return self.cache.obtener("generos", self.libro_repo.get_generos)
 
     def search(self, titulo="", autor="", isbn="", genero="", limit=200):
         limit = min(max(limit or 200, 1), MAX_RESULTADOS)
         libros = self.libro_repo.search(
             titulo=titulo, autor=autor, isbn=isbn, genero=genero, limit=limit
         )
-        logger.info(f"Búsqueda de libros: {len(libros)} resultados encontrados")
-        return to_list(libros)
+        logger.info("Búsqueda de libros: %d resultados encontrados", len(libros))
+        return self._serializar(libros)
 
     def create(self, data):
         titulo = data.get("titulo")
@@ -78,54 +146,95 @@ class LibroService:
             editorial=data.get("editorial"),
         )
         self.libro_repo.add(libro)
+        self._invalidar(generos=True)
+        auditar(self.session, "CREADO", "LIBRO", libro.id_libro, titulo=titulo, numero_copias=numero_copias)
 
         return {"success": True, "message": "Libro creado exitosamente"}
 
-    def update(self, id_libro, data):
-        libro = self.libro_repo.get_by_id(id_libro)
-        if not libro:
-            raise NotFoundError("Libro no encontrado")
+    @staticmethod
+    def _validar_reduccion(libro, nuevas_copias, disponibles):
+        if disponibles + nuevas_copias - libro.numero_copias < 0:
+            raise BusinessRuleError(
+                f"No se puede reducir a {nuevas_copias} copias. "
+                f"Hay {libro.numero_copias - disponibles} copias prestadas."
+            )
 
+    def update(self, id_libro, data):
         titulo = data.get("titulo")
         autor = data.get("autor")
         if not titulo or not autor:
             raise ValidationError("Los campos titulo y autor son requeridos")
 
-        nuevas_copias = int(data.get("numero_copias", libro.numero_copias) or libro.numero_copias)
-        diferencia = nuevas_copias - libro.numero_copias
-        nuevas_disponibles = libro.copias_disponibles + diferencia
+        libro = self.libro_repo.get_by_id(id_libro)
+        if not libro:
+            raise NotFoundError("Libro no encontrado")
+        verificar_version(libro, data.get("version"), "El libro")
 
-        if nuevas_disponibles < 0:
-            raise BusinessRuleError(
-                f"No se puede reducir a {nuevas_copias} copias. "
-                f"Hay {libro.numero_copias - libro.copias_disponibles} copias prestadas."
-            )
+        nuevas_copias = _entero(data.get("numero_copias") or libro.numero_copias, "numero_copias")
+        diferencia = nuevas_copias - libro.numero_copias
+        # Copias visibles (fila base más slots), leídas sin moverlas
+        disponibles = libro.copias_disponibles + self.inventario.copias_fragmentadas_de(id_libro)
+        self._validar_reduccion(libro, nuevas_copias, disponibles)
 
+        antes = {campo: getattr(libro, campo) for campo in CAMPOS_AUDITADOS}
+        if diferencia:
+            # Solo un cambio de copias desarma el reparto en slots: la fila base pasa
+            # a tener el total, con lo que consolidar movió bajo bloqueo
+            antes["copias_disponibles"] = disponibles
+            disponibles = libro.copias_disponibles + self.inventario.consolidar(id_libro)
+            self._validar_reduccion(libro, nuevas_copias, disponibles)
+            libro.copias_disponibles = disponibles + diferencia
+        nuevas_disponibles = disponibles + diferencia
         libro.titulo = titulo
         libro.autor = autor
         libro.isbn = data.get("isbn")
         libro.anio_publicacion = data.get("anio_publicacion")
         libro.genero = data.get("genero")
         libro.numero_copias = nuevas_copias
-        libro.copias_disponibles = nuevas_disponibles
         libro.editorial = data.get("editorial")
         self.libro_repo.flush()
+        self._invalidar(id_libro, generos=True)
+        auditar(self.session, "ACTUALIZADO", "LIBRO", id_libro, cambios=diferencias(antes, libro))
 
         return {
             "success": True,
             "message": f"Libro actualizado exitosamente. Copias disponibles: {nuevas_disponibles}",
         }
 
-    def update_copias(self, id_libro, copias):
-        if copias is None:
-            raise ValidationError("copias_disponibles es requerido")
+    def update_copias(self, id_libro, copias=None, delta=None, version=None):
+        if copias is None and delta is None:
+            raise ValidationError("delta o copias_disponibles es requerido")
+        if delta is not None:
+            delta = _entero(delta, "delta")
+        else:
+            copias = _entero(copias, "copias_disponibles")
+
+        if delta is not None:
+            self.inventario.consolidar(id_libro)
+            # Incremento relativo en un solo UPDATE: no pisa préstamos concurrentes
+            if not self.libro_repo.ajustar_copias(id_libro, delta):
+                if not self.libro_repo.get_by_id(id_libro):
+                    raise NotFoundError("Libro no encontrado")
+                raise BusinessRuleError(
+                    "Las copias disponibles deben quedar entre 0 y el número de copias"
+                )
+            self._invalidar(id_libro)
+            auditar(self.session, "COPIAS_AJUSTADAS", "LIBRO", id_libro, delta=delta)
+            return {"success": True, "message": "Copias actualizadas exitosamente"}
 
         libro = self.libro_repo.get_by_id(id_libro)
         if not libro:
             raise NotFoundError("Libro no encontrado")
+        verificar_version(libro, version, "El libro")
 
-        libro.copias_disponibles = int(copias)
+        anteriores = libro.copias_disponibles + self.inventario.consolidar(id_libro)
+        libro.copias_disponibles = copias
         self.libro_repo.flush()
+        self._invalidar(id_libro)
+        auditar(
+            self.session, "COPIAS_AJUSTADAS", "LIBRO", id_libro,
+            cambios={"copias_disponibles": [anteriores, libro.copias_disponibles]},
+        )
 
         return {"success": True, "message": "Copias actualizadas exitosamente"}
 
@@ -135,10 +244,34 @@ class LibroService:
             raise NotFoundError("Libro no encontrado")
 
         self.libro_repo.delete(libro)
+        self._invalidar(id_libro, generos=True)
+        auditar(self.session, "ELIMINADO", "LIBRO", id_libro, titulo=libro.titulo, isbn=libro.isbn)
         return {"success": True, "message": "Libro eliminado exitosamente"}
 
     def get_bajo_stock(self):
-        return to_list(self.libro_repo.get_bajo_stock())
+        return self._serializar(
+            self.libro_repo.get_bajo_stock(incluir_slots=self.inventario.fragmentado)
+        )
+
+    def get_copias_disponibles(self, ids_libro):
+        """{id_libro: copias disponibles} incluyendo las de los slots."""
+        if not ids_libro:
+            return {}
+        return self.libro_repo.get_copias_disponibles_de(
+            list(ids_libro), incluir_slots=self.inventario.fragmentado
+        )
+
+    def get_disponibles(self):
+        """Primeros libros con copias, por título (dashboard del lector)."""
+        return self.cache.obtener(
+            "libros_disponibles",
+            lambda: self._serializar(
+                self.libro_repo.get_disponibles(MAX_DISPONIBLES, incluir_slots=self.inventario.fragmentado)
+            ),
+        )
 
     def get_estadisticas(self):
-        return self.libro_repo.get_estadisticas()
+        return self.cache.obtener(
+            "estadisticas",
+            lambda: self.libro_repo.get_estadisticas(incluir_slots=self.inventario.fragmentado),
+        )
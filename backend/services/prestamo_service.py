@@ -2,6 +2,7 @@
 from datetime import datetime, timedelta
 from typing import Optional
 
+from cache import clave, get_cache
 from models.prestamo import Prestamo
 from repositories.libro_repository import LibroRepository
 from repositories.prestamo_repository import PrestamoRepository
@@ -10,8 +11,11 @@ from services.exceptions import (
     NotFoundError,
     ValidationError,
 )
+from services.inventario_service import InventarioService
+from utils.auditoria import auditar
 
 DIAS_PRESTAMO_DEFAULT = 14
+MAX_DEVOLUCIONES_LOTE = 500
 
 
 def _iso(value: Optional[datetime]):
@@ -20,8 +24,23 @@ def _iso(value: Optional[datetime]):
 
 class PrestamoService:
     def __init__(self, session):
+        self.session = session
         self.prestamo_repo = PrestamoRepository(session)
         self.libro_repo = LibroRepository(session)
+        self.inventario = InventarioService(session)
+        self.cache = get_cache()
+
+    def _invalidar_libros(self, ids_libro, id_usuario=None):
+        """Los préstamos cambian copias disponibles del libro, las estadísticas
+        y los dashboards (el del lector, si se conoce)."""
+        claves = ["estadisticas", "dashboard", "libros_disponibles"]
+        if id_usuario is not None:
+            claves.append(clave("dashboard_lector", id_usuario))
+        self.cache.invalidar_al_confirmar(
+            self.session,
+            *claves,
+            *(clave("libro", id_libro) for id_libro in set(ids_libro)),
+        )
 
     def _calcular_estado(self, prestamo):
         if (
@@ -51,8 +70,8 @@ class PrestamoService:
     def get_all(self):
         return [self._serializar(row) for row in self.prestamo_repo.get_all_with_details()]
 
-    def get_activos(self):
-        return [self._serializar(row) for row in self.prestamo_repo.get_activos_with_details()]
+    def get_activos(self, limite=None):
+        return [self._serializar(row) for row in self.prestamo_repo.get_activos_with_details(limite)]
 
     def get_by_usuario(self, id_usuario):
         return [
@@ -60,6 +79,21 @@ class PrestamoService:
             for row in self.prestamo_repo.get_by_usuario_with_details(id_usuario)
         ]
 
+    def get_en_curso_usuario(self, id_usuario):
+        return [
+            self._serializar(row)
+            for row in self.prestamo_repo.get_en_curso_usuario_with_details(id_usuario)
+        ]
+
+    def get_by_ids(self, ids_prestamo):
+        """Préstamos serializados por id (los que no existen no aparecen)."""
+        if not ids_prestamo:
+            return {}
+        return {
+            row[0].id_prestamo: self._serializar(row)
+            for row in self.prestamo_repo.get_by_ids_with_details(list(ids_prestamo))
+        }
+
     def get_vencidos(self):
         return [
             self._serializar(row)
@@ -72,9 +106,13 @@ class PrestamoService:
 
         dias = int(dias_prestamo or DIAS_PRESTAMO_DEFAULT)
 
-        libro = self.libro_repo.get_by_id(id_libro)
-        if not libro or libro.copias_disponibles <= 0:
-            raise BusinessRuleError("No hay copias disponibles")
+        if self.inventario.gestionado_por_aplicacion:
+            # El UPDATE condicionado valida y descuenta la copia en un solo paso
+            self.inventario.retirar([id_libro])
+        else:
+            libro = self.libro_repo.get_by_id(id_libro)
+            if not libro or libro.copias_disponibles <= 0:
+                raise BusinessRuleError("No hay copias disponibles")
 
         prestamo = Prestamo(
             id_libro=id_libro,
@@ -82,16 +120,57 @@ class PrestamoService:
             fecha_devolucion_esperada=datetime.now() + timedelta(days=dias),
         )
         self.prestamo_repo.add(prestamo)
+        self._invalidar_libros([id_libro], id_usuario)
+        auditar(
+            self.session, "CREADO", "PRESTAMO", prestamo.id_prestamo,
+            id_libro=id_libro, id_usuario=id_usuario, dias=dias,
+        )
 
         return {"success": True, "message": "Préstamo creado exitosamente"}
 
     def devolver(self, id_prestamo):
-        prestamo = self.prestamo_repo.get_by_id(id_prestamo)
-        if not prestamo or prestamo.estado == "DEVUELTO":
+        # Con la fila bloqueada, una devolución concurrente del mismo préstamo
+        # espera y luego lo ve DEVUELTO: la copia se repone una sola vez
+        pendientes = self.prestamo_repo.lock_pendientes_devolucion([id_prestamo])
+        if not pendientes:
             raise NotFoundError("Préstamo no encontrado o ya devuelto")
+        prestamo = self.prestamo_repo.get_by_id(id_prestamo)
 
-        prestamo.estado = "DEVUELTO"
-        prestamo.fecha_devolucion_real = datetime.now()
-        self.prestamo_repo.flush()
+        self.prestamo_repo.marcar_devueltos([id_prestamo], datetime.now())
+        self.inventario.reponer([prestamo.id_libro])
+        self._invalidar_libros([prestamo.id_libro], prestamo.id_usuario)
+        auditar(
+            self.session, "DEVUELTO", "PRESTAMO", id_prestamo,
+            id_libro=prestamo.id_libro, id_usuario=prestamo.id_usuario,
+        )
 
         return {"success": True, "message": "Devolución registrada exitosamente"}
+
+    def devolver_lote(self, ids_prestamo):
+        if not isinstance(ids_prestamo, list) or not ids_prestamo:
+            raise ValidationError("Se requiere una lista de ids de préstamo")
+        if len(ids_prestamo) > MAX_DEVOLUCIONES_LOTE:
+            raise ValidationError(
+                f"Máximo {MAX_DEVOLUCIONES_LOTE} devoluciones por solicitud"
+            )
+        try:
+            ids = sorted({int(id_prestamo) for id_prestamo in ids_prestamo})
+        except (TypeError, ValueError):
+            raise ValidationError("Los ids de préstamo deben ser numéricos")
+
+        pendientes = self.prestamo_repo.lock_pendientes_devolucion(ids)
+        if pendientes:
+            self.prestamo_repo.marcar_devueltos(
+                [id_prestamo for id_prestamo, _ in pendientes], datetime.now()
+            )
+            self.inventario.reponer(id_libro for _, id_libro in pendientes)
+            self._invalidar_libros(id_libro for _, id_libro in pendientes)
+            for id_prestamo, id_libro in pendientes:
+                auditar(self.session, "DEVUELTO", "PRESTAMO", id_prestamo, id_libro=id_libro, lote=True)
+
+        return {
+            "success": True,
+            "devueltos": len(pendientes),
+            "ignorados": len(ids) - len(pendientes),
+            "message": f"{len(pendientes)} devoluciones registradas exitosamente",
+        }
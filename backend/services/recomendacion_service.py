@@ -0,0 +1,63 @@
+"""Construcción de las recomendaciones de libros (ver utils/similares.py)."""
+import logging
+from typing import Dict
+
+from config.settings import SIMILARES_DIR
+from repositories.prestamo_repository import PrestamoRepository
+from utils.similares import Coocurrencias, publicar
+
+logger = logging.getLogger(__name__)
+
+LOTE_LECTURA = 50000
+
+
+class RecomendacionService:
+    def __init__(self, session, directorio: str = SIMILARES_DIR):
+        self.session = session
+        self.directorio = directorio
+        self.prestamo_repo = PrestamoRepository(session)
+
+    def _publicar(self, estado: Coocurrencias, prestamos: int) -> Dict:
+        estado.guardar(self.directorio)
+        publicar(estado.vecinos(), self.directorio)
+        return {
+            "libros": len(estado.libros),
+            "prestamos": prestamos,
+            "ultimo_prestamo": estado.ultimo_prestamo,
+        }
+
+    def construir(self) -> Dict:
+        """Recorre todo el historial de préstamos y reemplaza el estado."""
+        ultimo = self.prestamo_repo.get_ultimo_id()
+        contados = 0
+
+        def pares():
+            nonlocal contados
+            for lote in self.prestamo_repo.iter_pares_usuario_libro(0, ultimo, LOTE_LECTURA):
+                contados += len(lote)
+                yield lote
+
+        estado = Coocurrencias.construir(pares(), ultimo)
+        return self._publicar(estado, contados)
+
+    def actualizar(self) -> Dict:
+        """Suma los préstamos posteriores al estado guardado; sin estado, construye."""
+        estado = Coocurrencias.cargar(self.directorio)
+        if estado is None:
+            logger.info("No hay recomendaciones previas en %s: se construyen desde cero", self.directorio)
+            return self.construir()
+
+        ultimo = self.prestamo_repo.get_ultimo_id()
+        nuevos = [
+            par
+            for lote in self.prestamo_repo.iter_pares_usuario_libro(estado.ultimo_prestamo, ultimo, LOTE_LECTURA)
+            for par in lote
+        ]
+        if not nuevos:
+            return {"libros": len(estado.libros), "prestamos": 0, "ultimo_prestamo": estado.ultimo_prestamo}
+
+        previos = self.prestamo_repo.get_pares_de_usuarios(
+            [id_usuario for id_usuario, _ in nuevos], estado.ultimo_prestamo
+        )
+        estado.aplicar(previos, nuevos, ultimo)
+        return self._publicar(estado, len(nuevos))
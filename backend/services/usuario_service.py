@@ -1,30 +1,111 @@
 """Servicios de gestión de usuarios."""
+import base64
+import binascii
+import json
 import logging
 
+from sqlalchemy.exc import IntegrityError
+
+from cache import clave, get_cache
+from config.settings import BCRYPT_HILOS
 from models.usuario import Usuario
 from repositories.usuario_repository import UsuarioRepository
+from services.concurrencia import verificar_version
 from services.exceptions import (
     BusinessRuleError,
+    ConflictError,
     NotFoundError,
     ValidationError,
 )
-from utils.security import hash_password
+from utils.auditoria import auditar, diferencias
+from utils.security import hash_password, hash_passwords
 from utils.serializers import to_dict, to_list
 
 logger = logging.getLogger(__name__)
 
 ROLES_VALIDOS = ("LECTOR", "BIBLIOTECARIO")
 CAMPOS_SENSIBLES = {"password"}
+PAGINA_DEFAULT = 50
+PAGINA_MAX = 200
+# Con filtros se cuenta hasta este tope; más allá el total se informa como estimado
+CONTEO_MAX = 10000
+# Detalle de errores y duplicados que se devuelve en una importación
+DETALLE_MAX = 100
+ESTADO_LOTE_MAX = 5000
+
+
+def _codificar_cursor(orden, valor, id_usuario):
+    datos = json.dumps([orden, valor, id_usuario], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(datos).decode("ascii").rstrip("=")
+
+
+def _decodificar_cursor(cursor, orden):
+    try:
+        datos = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        orden_cursor, valor, id_usuario = json.loads(datos)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValidationError("Cursor inválido")
+    if orden_cursor != orden or not isinstance(valor, str) or not isinstance(id_usuario, int):
+        raise ValidationError("El cursor no corresponde a esta búsqueda")
+    return valor, id_usuario
 
 
 class UsuarioService:
     def __init__(self, session):
+        self.session = session
         self.usuario_repo = UsuarioRepository(session)
+        self.cache = get_cache()
 
-    def get_all(self):
-        return to_list(self.usuario_repo.get_all(), exclude=CAMPOS_SENSIBLES)
+    def _invalidar(self, id_usuario):
+        self.cache.invalidar_al_confirmar(self.session, clave("usuario", id_usuario))
+
+    def get_pagina(self, q="", rol=None, activo=None, cursor=None, limite=None, campo=None):
+        """Directorio paginado por cursor, con búsqueda por prefijo de nombre o
+        de email (``campo``; por defecto email si ``q`` contiene '@').
+
+        El total solo se calcula en la primera página: sin filtros sale de las
+        estadísticas de la tabla y con filtros se cuenta hasta CONTEO_MAX.
+        """
+        limite = min(max(limite or PAGINA_DEFAULT, 1), PAGINA_MAX)
+        if rol and rol not in ROLES_VALIDOS:
+            raise ValidationError("Rol inválido. Debe ser LECTOR o BIBLIOTECARIO")
+        if activo and activo not in ("S", "N"):
+            raise ValidationError("Estado inválido. Debe ser 'S' o 'N'")
+        if campo and campo not in ("nombre", "email"):
+            raise ValidationError("Campo de búsqueda inválido. Debe ser nombre o email")
+        q = (q or "").strip()
+        orden = campo or ("email" if "@" in q else "nombre")
+        prefijo = q.lower() if orden == "email" else q.upper()
+        despues = _decodificar_cursor(cursor, orden) if cursor else None
+
+        filas = self.usuario_repo.get_pagina(orden, prefijo, rol, activo, despues, limite + 1)
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            ultimo, valor = filas[-1]
+            siguiente = _codificar_cursor(orden, valor, ultimo.id_usuario)
+
+        resultado = {
+            "usuarios": to_list([usuario for usuario, _ in filas], exclude=CAMPOS_SENSIBLES),
+            "siguiente": siguiente,
+            "limite": limite,
+        }
+        if despues is None:
+            resultado.update(self._total(orden, prefijo, rol, activo))
+        return resultado
+
+    def _total(self, orden, prefijo, rol, activo):
+        if not (prefijo or rol or activo):
+            estimado = self.usuario_repo.get_total_estimado()
+            if estimado is not None:
+                return {"total_estimado": estimado, "total_exacto": False}
+        total = self.usuario_repo.count_hasta(orden, prefijo, rol, activo, CONTEO_MAX + 1)
+        return {"total_estimado": min(total, CONTEO_MAX), "total_exacto": total <= CONTEO_MAX}
 
     def get_by_id(self, id_usuario):
+        return self.cache.obtener(clave("usuario", id_usuario), lambda: self._cargar(id_usuario))
+
+    def _cargar(self, id_usuario):
         usuario = self.usuario_repo.get_by_id(id_usuario)
         if not usuario:
             raise NotFoundError("Usuario no encontrado")
@@ -34,6 +115,7 @@ class UsuarioService:
         usuario = self.usuario_repo.get_by_id(id_usuario)
         if not usuario:
             raise NotFoundError("Usuario no encontrado")
+        verificar_version(usuario, data.get("version"), "El usuario")
 
         nombre = data.get("nombre")
         email = data.get("email")
@@ -41,10 +123,13 @@ class UsuarioService:
         if not nombre or not email or not rol:
             raise ValidationError("Nombre, email y rol son requeridos")
 
+        antes = {"nombre": usuario.nombre, "email": usuario.email, "rol": usuario.rol}
         usuario.nombre = nombre
         usuario.email = email
         usuario.rol = rol
         self.usuario_repo.flush()
+        self._invalidar(id_usuario)
+        auditar(self.session, "ACTUALIZADO", "USUARIO", id_usuario, cambios=diferencias(antes, usuario))
 
         return {"success": True, "message": "Usuario actualizado exitosamente"}
 
@@ -59,7 +144,9 @@ class UsuarioService:
             raise NotFoundError("Usuario no encontrado")
 
         self.usuario_repo.delete(usuario)
-        logger.info(f"Usuario {id_usuario} eliminado permanentemente")
+        self._invalidar(id_usuario)
+        auditar(self.session, "ELIMINADO", "USUARIO", id_usuario, email=usuario.email)
+        logger.info("Usuario %s eliminado permanentemente", id_usuario)
         return {"success": True, "message": "Usuario eliminado permanentemente"}
 
     def create_admin(self, data):
@@ -77,32 +164,155 @@ class UsuarioService:
         if len(password) < 6:
             raise ValidationError("La contraseña debe tener al menos 6 caracteres")
 
+        # Hash antes de la primera consulta: el bcrypt no retiene conexión
+        password_hash = hash_password(password)
+
         if self.usuario_repo.get_by_email(email):
-            logger.warning(f"Intento de crear usuario con email duplicado: {email}")
+            logger.warning("Intento de crear usuario con email duplicado: %s", email)
             raise ValidationError("El email ya está registrado")
 
         usuario = Usuario(
             nombre=nombre,
             email=email,
-            password=hash_password(password),
+            password=password_hash,
             rol=rol,
         )
         self.usuario_repo.add(usuario)
+        auditar(self.session, "CREADO", "USUARIO", usuario.id_usuario, email=email, rol=rol)
 
-        logger.info(f"Nuevo usuario creado por admin: {email} con rol {rol}")
+        logger.info("Nuevo usuario creado por admin: %s con rol %s", email, rol)
         return {"success": True, "message": f"Usuario creado exitosamente como {rol}"}
 
-    def toggle_estado(self, id_usuario, activo):
+    def _validar_registro(self, datos):
+        nombre = str(datos.get("nombre") or "").strip()
+        email = str(datos.get("email") or "").strip()
+        password = str(datos.get("password") or "")
+        rol = str(datos.get("rol") or "").strip().upper() or "LECTOR"
+        if not nombre or not email or not password:
+            raise ValidationError("Nombre, email y contraseña son requeridos")
+        if "@" not in email:
+            raise ValidationError("Email inválido")
+        if len(nombre) > 100 or len(email) > 100:
+            raise ValidationError("Nombre y email admiten hasta 100 caracteres")
+        if rol not in ROLES_VALIDOS:
+            raise ValidationError("Rol inválido. Debe ser LECTOR o BIBLIOTECARIO")
+        if len(password) < 6:
+            raise ValidationError("La contraseña debe tener al menos 6 caracteres")
+        return {"nombre": nombre, "email": email, "password": password, "rol": rol}
+
+    def importar(self, registros):
+        """Alta masiva de [(línea, datos)] (ver utils/importacion.py).
+
+        Las filas inválidas y los emails repetidos (en el archivo o ya
+        registrados, sin distinguir mayúsculas) se informan y se omiten; el
+        resto se inserta en una sola transacción.
+        """
+        errores, duplicados, validos, vistos = [], [], [], set()
+        for linea, datos in registros:
+            try:
+                fila = self._validar_registro(datos)
+            except ValidationError as error:
+                errores.append({"linea": linea, "error": str(error)})
+                continue
+            email = fila["email"].lower()
+            if email in vistos:
+                duplicados.append({"linea": linea, "email": fila["email"], "motivo": "repetido en el archivo"})
+                continue
+            vistos.add(email)
+            validos.append((linea, fila))
+
+        existentes = self.usuario_repo.get_emails_existentes(vistos)
+        nuevos = []
+        for linea, fila in validos:
+            if fila["email"].lower() in existentes:
+                duplicados.append({"linea": linea, "email": fila["email"], "motivo": "ya registrado"})
+            else:
+                nuevos.append(fila)
+
+        # Libera la conexión mientras se calculan los hashes, que no necesitan la base
+        self.session.commit()
+        hashes = hash_passwords([fila["password"] for fila in nuevos], BCRYPT_HILOS)
+        filas = [
+            {**fila, "password": password_hash, "activo": "S"}
+            for fila, password_hash in zip(nuevos, hashes)
+        ]
+        try:
+            creados = self.usuario_repo.insertar_lote(filas) if filas else 0
+        except IntegrityError:
+            raise ConflictError(
+                "Algún email se registró mientras se importaba el archivo. Intente nuevamente."
+            )
+
+        if creados:
+            # El INSERT de array no devuelve los ids: se audita la importación con sus emails
+            auditar(
+                self.session, "IMPORTADO", "USUARIO",
+                creados=creados, emails=[fila["email"] for fila in filas],
+            )
+        logger.info(
+            "Importación de usuarios: %d creados, %d duplicados, %d con errores",
+            creados, len(duplicados), len(errores),
+        )
+        duplicados.sort(key=lambda duplicado: duplicado["linea"])
+        return {
+            "success": True,
+            "creados": creados,
+            "total_duplicados": len(duplicados),
+            "duplicados": duplicados[:DETALLE_MAX],
+            "total_errores": len(errores),
+            "errores": errores[:DETALLE_MAX],
+            "message": f"{creados} usuarios importados",
+        }
+
+    def cambiar_estado_lote(self, ids, activo):
+        """toggle_estado para varios usuarios con un UPDATE por cada 1000 ids."""
+        if activo not in ("S", "N"):
+            raise ValidationError("Estado inválido. Debe ser 'S' o 'N'")
+        if (
+            not isinstance(ids, list)
+            or not ids
+            or not all(isinstance(id_usuario, int) and not isinstance(id_usuario, bool) for id_usuario in ids)
+        ):
+            raise ValidationError("Se requiere una lista de ids de usuario")
+        if len(ids) > ESTADO_LOTE_MAX:
+            raise ValidationError(f"Máximo {ESTADO_LOTE_MAX} usuarios por operación")
+
+        estados = self.usuario_repo.get_estados(ids)
+        no_encontrados = sorted(set(ids) - set(estados))
+        cambiar = [id_usuario for id_usuario, estado in estados.items() if estado != activo]
+        actualizados = self.usuario_repo.set_activo(cambiar, activo) if cambiar else 0
+        if cambiar:
+            self.cache.invalidar_al_confirmar(
+                self.session, *(clave("usuario", id_usuario) for id_usuario in cambiar)
+            )
+        accion = "ACTIVADO" if activo == "S" else "DESACTIVADO"
+        for id_usuario in cambiar:
+            auditar(self.session, accion, "USUARIO", id_usuario, lote=True)
+
+        estado_texto = "activados" if activo == "S" else "desactivados"
+        logger.info("%d usuarios %s en lote", actualizados, estado_texto)
+        return {
+            "success": True,
+            "actualizados": actualizados,
+            "sin_cambios": len(estados) - actualizados,
+            "no_encontrados": no_encontrados,
+            "message": f"{actualizados} usuarios {estado_texto}",
+        }
+
+    def toggle_estado(self, id_usuario, activo, version=None):
         if activo not in ("S", "N"):
             raise ValidationError("Estado inválido. Debe ser 'S' o 'N'")
 
         usuario = self.usuario_repo.get_by_id(id_usuario)
         if not usuario:
             raise NotFoundError("Usuario no encontrado")
+        verificar_version(usuario, version, "El usuario")
 
         usuario.activo = activo
         self.usuario_repo.flush()
+        self._invalidar(id_usuario)
+        auditar(self.session, "ACTIVADO" if activo == "S" else "DESACTIVADO", "USUARIO", id_usuario)
 
         estado_texto = "activado" if activo == "S" else "desactivado"
-        logger.info(f"Usuario {id_usuario} {estado_texto}")
+        logger.info("Usuario %s %s", id_usuario, estado_texto)
         return {"success": True, "message": f"Usuario {estado_texto} exitosamente"}
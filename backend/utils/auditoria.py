@@ -0,0 +1,213 @@
+"""Auditoría de préstamos, libros y usuarios: quién hizo qué, cuándo y desde dónde.
+
+Los servicios llaman ``auditar(session, accion, entidad, id_registro, **detalle)``.
+El evento lleva el usuario del JWT (``request.user``), que el trigger de
+08_mejoras_recomendadas.sql no ve, y la ruta y la IP de la request:
+
+1. Los eventos se acumulan en ``session.info`` y, en ``before_commit``, se
+   escriben en AUDITORIA_OUTBOX con un solo INSERT de array: se confirman o se
+   revierten junto con la operación auditada.
+2. Confirmados, pasan a una cola acotada (AUDITORIA_COLA_MAX) del proceso. Un
+   hilo la vacía cada AUDITORIA_INTERVALO_S o al juntar AUDITORIA_LOTE
+   eventos: reclama sus filas del outbox (SKIP LOCKED), las inserta en
+   AUDITORIA_EVENTOS con otro INSERT de array y las borra del outbox en una
+   misma transacción, fuera del camino de la request.
+3. Lo que no pasó por la cola (cola llena, error al mover, worker reiniciado o
+   un script sin el hilo) lo barre el hilo de cualquier worker cuando lleva
+   más de AUDITORIA_GRACIA_S en el outbox.
+
+La entrega es "al menos una vez": ningún evento confirmado se pierde, y mover
+y borrar en la misma transacción evita copiarlo dos veces. El costo en la
+request es un executemany al outbox por commit.
+"""
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.database import get_session
+from config.settings import (
+    AUDITORIA_COLA_MAX,
+    AUDITORIA_GRACIA_S,
+    AUDITORIA_INTERVALO_S,
+    AUDITORIA_LOTE,
+)
+from repositories.auditoria_repository import AuditoriaRepository
+from utils.metrics import AUDITORIA_DIFERIDOS, AUDITORIA_ERRORES, AUDITORIA_MOVIDOS
+
+logger = logging.getLogger(__name__)
+
+_PENDIENTES = "auditoria_pendientes"
+_ESCRITOS = "auditoria_escritos"
+BARRIDO_MAX_LOTES = 10
+
+
+def _actor() -> Dict:
+    if not has_request_context():
+        return {"id_actor": None, "rol_actor": None, "origen": os.path.basename(sys.argv[0])[:200], "ip": None}
+    usuario = getattr(request, "user", None) or {}
+    return {
+        "id_actor": usuario.get("user_id"),
+        "rol_actor": usuario.get("rol"),
+        "origen": f"{request.method} {request.path}"[:200],
+        "ip": request.remote_addr,
+    }
+
+
+def auditar(session, accion: str, entidad: str, id_registro: Optional[int] = None, **detalle) -> None:
+    """Registra un evento que se escribe si la transacción de ``session`` confirma."""
+    session.info.setdefault(_PENDIENTES, []).append({
+        "id_evento": uuid.uuid4().hex,
+        "fecha": datetime.now(),
+        "accion": accion,
+        "entidad": entidad,
+        "id_registro": id_registro,
+        **_actor(),
+        "detalle": json.dumps(detalle, ensure_ascii=False, default=str) if detalle else None,
+    })
+
+
+def diferencias(antes: Dict, objeto) -> Dict:
+    """{campo: [antes, después]} de los campos de ``antes`` que cambiaron en ``objeto``."""
+    return {
+        campo: [valor, getattr(objeto, campo)]
+        for campo, valor in antes.items()
+        if getattr(objeto, campo) != valor
+    }
+
+
+@event.listens_for(Session, "before_commit")
+def _escribir_outbox(session):
+    eventos = session.info.pop(_PENDIENTES, None)
+    if eventos:
+        AuditoriaRepository(session).insertar_outbox(eventos)
+        session.info.setdefault(_ESCRITOS, []).extend(eventos)
+
+
+@event.listens_for(Session, "after_commit")
+def _encolar_confirmados(session):
+    eventos = session.info.pop(_ESCRITOS, None)
+    if eventos:
+        escritor.encolar(eventos)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session):
+    session.info.pop(_PENDIENTES, None)
+    session.info.pop(_ESCRITOS, None)
+
+
+class EscritorAuditoria:
+    """Hilo por proceso que pasa los eventos del outbox a AUDITORIA_EVENTOS."""
+
+    def __init__(self, cola_max: int, intervalo_s: float, lote: int, gracia_s: float):
+        self.cola_max = cola_max
+        self.intervalo_s = intervalo_s
+        self.lote = lote
+        self.gracia_s = gracia_s
+        self.cola: queue.Queue = queue.Queue(cola_max)
+        self._proximo_barrido = 0.0
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _activo(self) -> bool:
+        return self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive()
+
+    def encolar(self, eventos: List[Dict]) -> None:
+        """Sin hilo en este proceso o con la cola llena, el evento espera al barrido."""
+        if not self._activo():
+            return
+        for posicion, evento in enumerate(eventos):
+            try:
+                self.cola.put_nowait(evento)
+            except queue.Full:
+                AUDITORIA_DIFERIDOS.inc(valor=len(eventos) - posicion)
+                return
+
+    def _juntar(self) -> List[Dict]:
+        try:
+            eventos = [self.cola.get(timeout=self.intervalo_s)]
+        except queue.Empty:
+            return []
+        while len(eventos) < self.lote:
+            try:
+                eventos.append(self.cola.get_nowait())
+            except queue.Empty:
+                break
+        return eventos
+
+    def mover(self, eventos: List[Dict]) -> int:
+        """Mueve los eventos cuyas filas del outbox no tomó ya otro proceso."""
+        with get_session() as session:
+            repo = AuditoriaRepository(session)
+            reclamados = repo.reclamar([evento["id_evento"] for evento in eventos])
+            filas = [evento for evento in eventos if evento["id_evento"] in reclamados]
+            repo.mover(filas)
+        AUDITORIA_MOVIDOS.inc("cola", valor=len(filas))
+        return len(filas)
+
+    def barrer(self) -> int:
+        """Mueve un lote de eventos olvidados en el outbox; devuelve cuántos."""
+        with get_session() as session:
+            repo = AuditoriaRepository(session)
+            antiguos = repo.reclamar_antiguos(datetime.now() - timedelta(seconds=self.gracia_s), self.lote)
+            filas = [
+                {campo: getattr(fila, campo) for campo in type(fila).model_fields}
+                for fila in antiguos
+            ]
+            repo.mover(filas)
+        AUDITORIA_MOVIDOS.inc("barrido", valor=len(filas))
+        return len(filas)
+
+    def _ejecutar(self) -> None:
+        while True:
+            eventos = self._juntar()
+            try:
+                if eventos:
+                    self.mover(eventos)
+                if time.monotonic() >= self._proximo_barrido:
+                    # Acotado para no dejar la cola sin atender tras una caída larga
+                    for _ in range(BARRIDO_MAX_LOTES):
+                        if self.barrer() < self.lote:
+                            break
+                    self._proximo_barrido = time.monotonic() + self.gracia_s
+            except Exception as error:
+                # Los eventos siguen en el outbox: los recupera un barrido posterior
+                AUDITORIA_ERRORES.inc()
+                logger.warning("No se pudieron mover %d eventos de auditoría: %s", len(eventos), error)
+                time.sleep(self.intervalo_s)
+
+    def iniciar(self) -> None:
+        """Arranca el hilo en este proceso (idempotente y seguro tras fork)."""
+        with self._lock:
+            if self._activo():
+                return
+            if self._pid not in (None, os.getpid()):
+                # Hijo de un fork: la cola heredada pudo quedar con locks tomados
+                self.cola = queue.Queue(self.cola_max)
+            self._pid = os.getpid()
+            self._proximo_barrido = 0.0
+            self._hilo = threading.Thread(target=self._ejecutar, name="auditoria", daemon=True)
+            self._hilo.start()
+
+    @property
+    def en_cola(self) -> int:
+        return self.cola.qsize()
+
+
+escritor = EscritorAuditoria(AUDITORIA_COLA_MAX, AUDITORIA_INTERVALO_S, AUDITORIA_LOTE, AUDITORIA_GRACIA_S)
+
+
+def iniciar_auditoria() -> None:
+    escritor.iniciar()
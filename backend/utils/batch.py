@@ -0,0 +1,181 @@
+"""Ejecución de varias requests GET dentro de una sola (POST /api/batch).
+
+Cada sub-request se despacha directamente a la vista de su ruta con el
+usuario ya autenticado de la request externa: no repite la validación del
+JWT ni los hooks de métricas y perfiles. Corre en su propio contexto de
+aplicación (su propio ``g``) para que el teardown de la sub-request no toque
+el estado de la externa.
+
+- En serie, todas comparten la sesión de base de datos de la request
+  externa (``g.lote`` evita que ``api_route`` confirme y que el teardown la
+  cierre); leen una misma transacción y usan una sola conexión.
+- En paralelo (por defecto con más de una sub-request), cada una toma su
+  propia sesión en un pool de LOTE_PARALELISMO hilos por proceso.
+
+Solo se admiten GET. Cada ruta tiene un costo (las que listan tablas
+completas cuestan más); el lote se rechaza si supera LOTE_MAX_SOLICITUDES
+o LOTE_COSTO_MAX.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from flask import current_app, g, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+from werkzeug.test import EnvironBuilder
+
+from config.settings import LOTE_COSTO_MAX, LOTE_MAX_SOLICITUDES, LOTE_PARALELISMO
+from services.exceptions import ValidationError
+from utils.replica import CABECERA_ADHERENCIA
+from utils.request_session import get_request_session
+
+logger = logging.getLogger(__name__)
+
+COSTO_DEFAULT = 1
+# Endpoints que recorren tablas completas o varias consultas
+COSTOS = {
+    "libros.get_libros": 2,
+    "libros.search_libros": 2,
+    "libros.conciliar_inventario": 5,
+    "prestamos.get_prestamos": 5,
+    "dashboard.get_dashboard": 3,
+}
+# Respuestas que no son JSON o que no tiene sentido anidar
+EXCLUIDOS = {
+    "batch.ejecutar_lote",
+    "eventos.stream_eventos",
+    "libros.export_libros_csv",
+    "perfiles.descargar_perfil",
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    """Pool de hilos del proceso; se recrea después de un fork."""
+    global _executor, _pid
+    with _lock:
+        if _executor is None or _pid != os.getpid():
+            _pid = os.getpid()
+            _executor = ThreadPoolExecutor(max_workers=LOTE_PARALELISMO, thread_name_prefix="lote")
+        return _executor
+
+
+def _entorno(ruta: str, autorizacion: str, marca: str = "") -> Dict:
+    partes = urlsplit(ruta)
+    cabeceras = {"Authorization": autorizacion}
+    if marca:
+        # Las lecturas del lote respetan la adherencia al primario de la request
+        cabeceras[CABECERA_ADHERENCIA] = marca
+    return EnvironBuilder(
+        path=partes.path,
+        query_string=partes.query,
+        method="GET",
+        headers=cabeceras,
+    ).get_environ()
+
+
+def validar(solicitudes) -> List[Dict]:
+    """Normaliza el lote a [{"id", "path", "endpoint"}] o lanza ValidationError."""
+    if not isinstance(solicitudes, list) or not solicitudes:
+        raise ValidationError("Se requiere una lista de requests")
+    if len(solicitudes) > LOTE_MAX_SOLICITUDES:
+        raise ValidationError(f"Máximo {LOTE_MAX_SOLICITUDES} requests por lote")
+
+    adaptador = current_app.url_map.bind("localhost")
+    lote, costo = [], 0
+    for posicion, solicitud in enumerate(solicitudes):
+        if not isinstance(solicitud, dict) or not isinstance(solicitud.get("path"), str):
+            raise ValidationError(f"La request {posicion} debe tener un path")
+        if str(solicitud.get("method", "GET")).upper() != "GET":
+            raise ValidationError("Solo se admiten requests GET en un lote")
+        ruta = solicitud["path"]
+        if not ruta.startswith("/api/"):
+            raise ValidationError(f"Ruta no permitida en un lote: {ruta}")
+        try:
+            endpoint, _ = adaptador.match(urlsplit(ruta).path, method="GET")
+        except RequestRedirect:
+            endpoint = None  # falta la barra final: se sigue la redirección al ejecutar
+        except HTTPException:
+            endpoint = None  # 404/405: se informa en la respuesta de esa request
+        if endpoint in EXCLUIDOS:
+            raise ValidationError(f"Ruta no permitida en un lote: {ruta}")
+        costo += COSTOS.get(endpoint, COSTO_DEFAULT)
+        lote.append({"id": solicitud.get("id", posicion), "path": ruta, "endpoint": endpoint})
+
+    if costo > LOTE_COSTO_MAX:
+        raise ValidationError(f"El lote cuesta {costo}; el máximo es {LOTE_COSTO_MAX}")
+    return lote
+
+
+def _despachar(app, usuario, entorno, redirecciones: int = 1):
+    with app.request_context(entorno):
+        request.user = usuario
+        try:
+            if request.routing_exception is not None:
+                raise request.routing_exception
+            if request.url_rule.endpoint in EXCLUIDOS:
+                return 403, {"error": "Ruta no permitida en un lote"}
+            respuesta = app.make_response(
+                app.view_functions[request.url_rule.endpoint](**request.view_args)
+            )
+        except RequestRedirect as redireccion:
+            if not redirecciones:
+                raise
+            destino = urlsplit(redireccion.new_url)
+            nuevo = _entorno(
+                f"{destino.path}?{destino.query}",
+                request.headers.get("Authorization", ""),
+                request.headers.get(CABECERA_ADHERENCIA, ""),
+            )
+            return _despachar(app, usuario, nuevo, redirecciones - 1)
+        except HTTPException as error:
+            # Con los errorhandler de la app (404 -> "Endpoint no encontrado")
+            respuesta = app.make_response(app.handle_http_exception(error))
+        cuerpo = respuesta.get_json(silent=True)
+        if cuerpo is None and not respuesta.direct_passthrough:
+            cuerpo = respuesta.get_data(as_text=True)
+        return respuesta.status_code, cuerpo
+
+
+def _ejecutar(app, usuario, entorno, sesion=None, stats=None):
+    """Despacha en un contexto de aplicación propio, con la sesión dada o una nueva."""
+    try:
+        with app.app_context():
+            if sesion is not None:
+                g.lote = True
+                g.db_session = sesion
+                g.db_stats = stats
+            return _despachar(app, usuario, entorno)
+    except Exception as error:
+        logger.exception("Error no controlado en una request del lote: %s", error)
+        return 500, {"error": "Error interno del servidor"}
+
+
+def ejecutar(lote: List[Dict], paralelo: bool = True) -> List[Dict]:
+    """Ejecuta el lote y devuelve [{"id", "status", "body"}] en el mismo orden."""
+    app = current_app._get_current_object()
+    usuario = getattr(request, "user", None)
+    autorizacion = request.headers.get("Authorization", "")
+    marca = request.headers.get(CABECERA_ADHERENCIA, "")
+    entornos = [_entorno(solicitud["path"], autorizacion, marca) for solicitud in lote]
+
+    if paralelo and len(lote) > 1 and LOTE_PARALELISMO > 1:
+        futuros = [_pool().submit(_ejecutar, app, usuario, entorno) for entorno in entornos]
+        resultados = [futuro.result() for futuro in futuros]
+    else:
+        sesion = get_request_session()
+        resultados = [
+            _ejecutar(app, usuario, entorno, sesion, g.get("db_stats")) for entorno in entornos
+        ]
+
+    return [
+        {"id": solicitud["id"], "status": status, "body": cuerpo}
+        for solicitud, (status, cuerpo) in zip(lote, resultados)
+    ]
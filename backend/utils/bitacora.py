@@ -0,0 +1,62 @@
+"""Hilo que purga la bitácora CAMBIOS_ENTIDADES.
+
+Los triggers de 12_bitacora_cambios.sql agregan una fila por cada escritura en
+LIBROS, USUARIOS y PRESTAMOS, la lean o no el bus de caché, los eventos o los
+rollups. Cada PURGA_CADA_S se borran las filas más antiguas que
+CACHE_BUS_RETENCION_H, sea cual sea CACHE_BUS. Con varios workers todos
+purgan: el DELETE es idempotente y el arranque desfasado reparte las vueltas.
+"""
+import logging
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config.database import get_session
+from config.settings import CACHE_BUS_RETENCION_H
+from repositories.cambio_repository import CambioEntidadRepository
+
+logger = logging.getLogger(__name__)
+
+PURGA_CADA_S = 600
+
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def purgar_bitacora(session) -> int:
+    """Borra los cambios fuera de la retención; devuelve las filas borradas."""
+    antes_de = datetime.now() - timedelta(hours=CACHE_BUS_RETENCION_H)
+    return CambioEntidadRepository(session).purgar(antes_de)
+
+
+def _ejecutar() -> None:
+    espera = random.uniform(0, PURGA_CADA_S)
+    while not _detener.wait(espera):
+        espera = PURGA_CADA_S
+        try:
+            with get_session() as session:
+                borrados = purgar_bitacora(session)
+            if borrados:
+                logger.debug("Bitácora de cambios: %d filas purgadas", borrados)
+        except Exception as error:
+            logger.warning("No se pudo purgar la bitácora de cambios: %s", error)
+
+
+def iniciar_purga() -> None:
+    """Arranca el hilo en este proceso (idempotente y seguro tras fork)."""
+    global _hilo, _pid
+    with _lock:
+        if _pid == os.getpid() and _hilo is not None and _hilo.is_alive():
+            return
+        _detener.clear()
+        _pid = os.getpid()
+        _hilo = threading.Thread(target=_ejecutar, name="purga-bitacora", daemon=True)
+        _hilo.start()
+
+
+def detener_purga() -> None:
+    _detener.set()
@@ -0,0 +1,52 @@
+"""Hilo que mantiene al día los rollups de circulación.
+
+Cada REPORTES_INTERVALO_S aplica la bitácora de préstamos con
+``CirculacionService.actualizar()``. La marca de ROLLUP_MARCAS se toma con
+SKIP LOCKED: con varios workers, en cada vuelta trabaja uno y el resto sigue
+de largo. Con REPORTES_INTERVALO_S=0 no arranca y los rollups quedan a cargo
+del job nocturno (rollup_circulacion.py).
+"""
+import logging
+import os
+import threading
+from typing import Optional
+
+from config.database import get_session
+from config.settings import REPORTES_INTERVALO_S
+from services.circulacion_service import CirculacionService
+
+logger = logging.getLogger(__name__)
+
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _ejecutar() -> None:
+    while not _detener.wait(REPORTES_INTERVALO_S):
+        try:
+            with get_session() as session:
+                dias = CirculacionService(session).actualizar(esperar=False)
+            if dias:
+                logger.debug("Rollups de circulación: %d días recalculados", dias)
+        except Exception as error:
+            logger.warning("No se pudieron actualizar los rollups de circulación: %s", error)
+
+
+def iniciar_rollups() -> None:
+    """Arranca el hilo en este proceso (idempotente y seguro tras fork)."""
+    global _hilo, _pid
+    if REPORTES_INTERVALO_S <= 0:
+        return
+    with _lock:
+        if _pid == os.getpid() and _hilo is not None and _hilo.is_alive():
+            return
+        _detener.clear()
+        _pid = os.getpid()
+        _hilo = threading.Thread(target=_ejecutar, name="rollups-circulacion", daemon=True)
+        _hilo.start()
+
+
+def detener_rollups() -> None:
+    _detener.set()
@@ -0,0 +1,231 @@
+"""Feed de cambios de préstamos e inventario para GET /api/events (SSE).
+
+Un hilo por proceso lee la bitácora CAMBIOS_ENTIDADES (triggers de
+12_bitacora_cambios.sql) cada EVENTOS_INTERVALO_S, solo mientras haya clientes
+conectados, y reparte eventos compactos a la cola de cada uno:
+
+- ``prestamo_creado``: el préstamo con los campos de GET /api/prestamos/
+- ``prestamo_devuelto`` / ``prestamo_vencido``: id del préstamo y nuevo estado
+- ``stock_cambiado``: copias disponibles de un libro editado
+
+Cada lote cuesta las mismas consultas con uno o con cien clientes. Los
+lectores solo reciben los eventos de sus propios préstamos.
+
+El ``id`` de cada evento es el id_cambio de la bitácora. Con Last-Event-ID el
+cliente retoma desde los últimos EVENTOS_BUFFER eventos en memoria o, si ya
+no están, desde la bitácora; si lo perdido ya fue purgado recibe ``reinicio``
+y recarga todo. La entrega es "al menos una vez": al reanudar puede repetirse
+algún evento.
+
+Cada stream ocupa un hilo del worker: se limitan a EVENTOS_MAX_CONEXIONES por
+proceso y se cierran tras EVENTOS_DURACION_MAX_S (el cliente se reconecta con
+su último id). Un cliente que no lee a tiempo llena su cola y se le corta el
+stream en lugar de retener eventos sin límite.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from cache.bus import SondeoBitacora
+from config.database import get_session
+from config.settings import (
+    EVENTOS_BUFFER,
+    EVENTOS_COLA_MAX,
+    EVENTOS_DURACION_MAX_S,
+    EVENTOS_INTERVALO_S,
+    EVENTOS_KEEPALIVE_S,
+    EVENTOS_MAX_CONEXIONES,
+)
+from repositories.cambio_repository import CambioEntidadRepository
+from services.evento_service import EventoService
+from services.exceptions import UnavailableError
+from utils.metrics import EVENTOS_DESBORDES, EVENTOS_ENVIADOS
+
+logger = logging.getLogger(__name__)
+
+RECONEXION_MS = 3000
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado."""
+
+    def __init__(self, usuario: Dict, cola_max: int):
+        self.id_usuario = usuario.get("user_id")
+        self.todos = usuario.get("rol") == "BIBLIOTECARIO"
+        self.cola: queue.Queue = queue.Queue(cola_max)
+        self.desbordada = False
+
+    def visible(self, evento: Dict) -> bool:
+        return self.todos or evento["datos"].get("id_usuario", self.id_usuario) == self.id_usuario
+
+    def entregar(self, eventos: List[Dict]) -> None:
+        if self.desbordada:
+            return
+        for evento in eventos:
+            if not self.visible(evento):
+                continue
+            try:
+                self.cola.put_nowait(evento)
+            except queue.Full:
+                self.desbordada = True
+                EVENTOS_DESBORDES.inc()
+                return
+
+
+class CanalEventos(SondeoBitacora):
+    """Sondeo de la bitácora que publica eventos en lugar de invalidar la caché."""
+
+    def __init__(self, intervalo_s: float, buffer: int, max_conexiones: int, cola_max: int):
+        super().__init__(None, intervalo_s)
+        self.max_conexiones = max_conexiones
+        self.cola_max = cola_max
+        self._recientes: deque = deque(maxlen=buffer)
+        self._suscripciones: Set[Suscripcion] = set()
+        # Orden de adquisición: _lock_sondeo y después _lock
+        self._lock_sondeo = threading.Lock()
+        self._lock = threading.Lock()
+        self._hay_clientes = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def conexiones(self) -> int:
+        return len(self._suscripciones)
+
+    def procesar(self, session, cambios) -> None:
+        eventos = EventoService(session).desde_cambios(cambios)
+        if not eventos:
+            return
+        with self._lock:
+            self._recientes.extend(eventos)
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(eventos)
+
+    def sondear(self) -> bool:
+        with self._lock_sondeo:
+            return super().sondear()
+
+    def huecos_descartados(self) -> None:
+        # Pudo perderse algún evento: se cortan los streams y sin el buffer en
+        # memoria cada cliente se reconecta y relee la bitácora desde su Last-Event-ID
+        with self._lock:
+            self._recientes.clear()
+            for suscripcion in self._suscripciones:
+                suscripcion.desbordada = True
+
+    def suscribir(self, usuario: Dict, ultimo_id: Optional[int]) -> Tuple[Suscripcion, List[Dict], int]:
+        """Registra un cliente; devuelve su suscripción, los eventos a reenviar
+        desde ultimo_id y la posición actual de la bitácora."""
+        suscripcion = Suscripcion(usuario, self.cola_max)
+        with self._lock_sondeo:
+            if self._ultimo is None:
+                with get_session() as session:
+                    self._ultimo = CambioEntidadRepository(session).get_ultimo_id()
+            with self._lock:
+                if len(self._suscripciones) >= self.max_conexiones:
+                    raise UnavailableError("Demasiados clientes conectados al feed de eventos")
+                self._suscripciones.add(suscripcion)
+                self._hay_clientes.set()
+                recientes = list(self._recientes)
+            posicion = self._ultimo
+        self._iniciar()
+        if ultimo_id is None:
+            return suscripcion, [], posicion
+        try:
+            return suscripcion, self._reanudar(ultimo_id, recientes), posicion
+        except Exception:
+            self.cancelar(suscripcion)
+            raise
+
+    def _reanudar(self, ultimo_id: int, recientes: List[Dict]) -> List[Dict]:
+        ids = [evento["id"] for evento in recientes]
+        if ultimo_id in ids:
+            posicion = len(ids) - 1 - ids[::-1].index(ultimo_id)
+            return recientes[posicion + 1:]
+        with get_session() as session:
+            repo = CambioEntidadRepository(session)
+            cambios = repo.get_posteriores(ultimo_id, limite=self.LIMITE_LOTE)
+            primero = repo.get_primer_id()
+            if len(cambios) >= self.LIMITE_LOTE or (primero is not None and ultimo_id < primero - 1):
+                return [{"id": None, "tipo": "reinicio", "datos": {}}]
+            return EventoService(session).desde_cambios(cambios)
+
+    def cancelar(self, suscripcion: Suscripcion) -> None:
+        with self._lock_sondeo:
+            with self._lock:
+                self._suscripciones.discard(suscripcion)
+                if self._suscripciones:
+                    return
+                self._hay_clientes.clear()
+                self._recientes.clear()
+            # Sin clientes no se sondea: el próximo toma la posición actual
+            self._ultimo = None
+            self._huecos.clear()
+
+    def _ejecutar_hilo(self) -> None:
+        while True:
+            self._hay_clientes.wait()
+            try:
+                completo = self.sondear()
+            except Exception as error:
+                logger.warning("Sondeo del feed de eventos falló: %s", error)
+                completo = True
+            if completo:
+                time.sleep(self.intervalo_s)
+
+    def _iniciar(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._ejecutar_hilo, name="eventos", daemon=True)
+            self._hilo.start()
+
+
+canal = CanalEventos(EVENTOS_INTERVALO_S, EVENTOS_BUFFER, EVENTOS_MAX_CONEXIONES, EVENTOS_COLA_MAX)
+
+
+def _mensaje(id_evento: Optional[int], tipo: str, datos: Dict) -> str:
+    cuerpo = json.dumps(datos, separators=(",", ":"), ensure_ascii=False)
+    return f"id: {id_evento}\nevent: {tipo}\ndata: {cuerpo}\n\n"
+
+
+def transmitir(suscripcion: Suscripcion, pendientes: List[Dict], posicion: int) -> Iterator[str]:
+    """Cuerpo del stream: reenvío, eventos en vivo y keepalive hasta EVENTOS_DURACION_MAX_S."""
+    try:
+        yield f"retry: {RECONEXION_MS}\n\n"
+        reenviados = set()
+        if not pendientes:
+            # Da al cliente un Last-Event-ID aunque no lleguen eventos
+            yield _mensaje(posicion, "conectado", {})
+        for evento in pendientes:
+            if evento["tipo"] == "reinicio":
+                yield _mensaje(posicion, "reinicio", {})
+                break
+            reenviados.add(evento["id"])
+            if suscripcion.visible(evento):
+                EVENTOS_ENVIADOS.inc(evento["tipo"])
+                yield _mensaje(evento["id"], evento["tipo"], evento["datos"])
+
+        fin = time.monotonic() + EVENTOS_DURACION_MAX_S
+        while not suscripcion.desbordada:
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                evento = suscripcion.cola.get(timeout=min(EVENTOS_KEEPALIVE_S, restante))
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if evento["id"] in reenviados:
+                continue
+            EVENTOS_ENVIADOS.inc(evento["tipo"])
+            yield _mensaje(evento["id"], evento["tipo"], evento["datos"])
+    finally:
+        canal.cancelar(suscripcion)
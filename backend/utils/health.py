@@ -0,0 +1,211 @@
+"""Estado de la base de datos medido en segundo plano y cortocircuito.
+
+Un hilo por proceso ejecuta ``check_connection()`` cada SALUD_INTERVALO_S y
+guarda el resultado (hora, latencia, último éxito); /api/health y
+/api/health/ready devuelven ese valor sin tocar el pool, de modo que los
+chequeos del balanceador no abren conexiones ni se apilan en los workers si
+Oracle se cuelga. La sonda usa su propia conexión (``sonda_engine``): con el
+pool de las requests agotado por carga no espera turno, y esa espera no se
+confunde con una base caída.
+
+Tras SALUD_FALLOS_UMBRAL sondas fallidas seguidas (o una sonda que no
+responde en SALUD_TIMEOUT_S) el circuito se abre: las requests que necesiten
+la base fallan al instante con 503 y Retry-After en lugar de esperar al pool;
+las que se sirven desde la caché siguen funcionando. Mientras está abierto la
+sonda repite cada segundo y el primer éxito lo cierra. Un error de
+desconexión en cualquier consulta adelanta la siguiente sonda.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import jsonify
+from sqlalchemy import event
+
+import config.database as database
+from config.settings import SALUD_FALLOS_UMBRAL, SALUD_INTERVALO_S, SALUD_TIMEOUT_S
+from services.exceptions import UnavailableError
+from utils.metrics import CIRCUITO_RECHAZOS
+
+logger = logging.getLogger(__name__)
+
+_INTERVALO_ABIERTO_S = 1.0
+
+
+def _ahora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class SondaBase:
+    """Último estado conocido de la base y el circuito que depende de él."""
+
+    def __init__(self, intervalo_s: float, timeout_s: float, umbral: int):
+        self.intervalo_s = intervalo_s
+        self.timeout_s = timeout_s
+        self.umbral = max(umbral, 1)
+        self.disponible: Optional[bool] = None
+        self.verificado_en: Optional[str] = None
+        self.ultimo_ok: Optional[str] = None
+        self.latencia_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.fallos_consecutivos = 0
+        self.abierto_desde: Optional[float] = None
+        self._medido = -math.inf
+        self._en_curso_desde: Optional[float] = None
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def circuito_abierto(self) -> bool:
+        if self.abierto_desde is not None:
+            return True
+        # Una sonda colgada cuenta como caída sin esperar a que termine
+        inicio = self._en_curso_desde
+        if inicio is not None and time.monotonic() - inicio > self.timeout_s:
+            self._abrir(f"sin respuesta en {self.timeout_s:g} s")
+            return True
+        return False
+
+    def _abrir(self, motivo: str) -> None:
+        if self.abierto_desde is None:
+            self.abierto_desde = time.monotonic()
+            logger.error("Circuito de base de datos abierto: %s", motivo)
+
+    def _cerrar(self) -> None:
+        if self.abierto_desde is not None:
+            logger.warning(
+                "Circuito de base de datos cerrado tras %.1f s",
+                time.monotonic() - self.abierto_desde,
+            )
+            self.abierto_desde = None
+
+    def sondear(self) -> None:
+        """Ejecuta una sonda; si otra está en curso, no hace nada."""
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._en_curso_desde = inicio = time.monotonic()
+            try:
+                database.check_connection(self.timeout_s)
+                error = None
+            except Exception as excepcion:
+                error = str(excepcion).splitlines()[0] if str(excepcion) else type(excepcion).__name__
+            self._en_curso_desde = None
+            self._medido = time.monotonic()
+            self.latencia_ms = round((self._medido - inicio) * 1000, 1)
+            self.verificado_en = _ahora()
+            self.error = error
+            if error is None:
+                self.disponible = True
+                self.ultimo_ok = self.verificado_en
+                self.fallos_consecutivos = 0
+                self._cerrar()
+            else:
+                self.disponible = False
+                self.fallos_consecutivos += 1
+                logger.warning("Sonda de base de datos falló (%d seguidas): %s", self.fallos_consecutivos, error)
+                if self.fallos_consecutivos >= self.umbral:
+                    self._abrir(error)
+        finally:
+            self._lock.release()
+
+    def estado(self) -> Dict:
+        """Estado cacheado; sin hilo de sonda en este proceso, lo mide en línea."""
+        if not self._activa() and time.monotonic() - self._medido >= self.intervalo_s:
+            self.sondear()
+        return {
+            "database": "connected" if self.disponible else "disconnected",
+            "verificado_en": self.verificado_en,
+            "latencia_ms": self.latencia_ms,
+            "ultimo_ok": self.ultimo_ok,
+            "fallos_consecutivos": self.fallos_consecutivos,
+            "circuito": "abierto" if self.circuito_abierto else "cerrado",
+            "error": self.error,
+        }
+
+    def lista(self) -> bool:
+        """True si la última sonda fue exitosa y reciente."""
+        self.estado()
+        vigente = time.monotonic() - self._medido <= max(3 * self.intervalo_s, self.timeout_s)
+        return bool(self.disponible) and vigente and not self.circuito_abierto
+
+    def verificar(self) -> None:
+        """Falla rápido si el circuito está abierto (antes de tomar una conexión)."""
+        if self.circuito_abierto:
+            CIRCUITO_RECHAZOS.inc()
+            raise UnavailableError("Base de datos no disponible. Intente nuevamente en unos segundos.")
+
+    def despertar(self) -> None:
+        self._despertar.set()
+
+    def _activa(self) -> bool:
+        return self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive()
+
+    def _ejecutar(self) -> None:
+        while True:
+            self.sondear()
+            espera = _INTERVALO_ABIERTO_S if self.abierto_desde is not None else self.intervalo_s
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+    def iniciar(self) -> None:
+        """Arranca el hilo de la sonda en este proceso (idempotente y seguro tras fork)."""
+        if self._activa():
+            return
+        if self._pid not in (None, os.getpid()):
+            # Hijo de un fork: el lock heredado pudo quedar tomado por la sonda del padre
+            self._lock = threading.Lock()
+            self._en_curso_desde = None
+        self._pid = os.getpid()
+        self._hilo = threading.Thread(target=self._ejecutar, name="sonda-db", daemon=True)
+        self._hilo.start()
+
+
+sonda = SondaBase(SALUD_INTERVALO_S, SALUD_TIMEOUT_S, SALUD_FALLOS_UMBRAL)
+
+
+def iniciar_sonda() -> None:
+    sonda.iniciar()
+
+
+@event.listens_for(database.engine, "handle_error")
+def _error_de_conexion(context):
+    if context.is_disconnect:
+        sonda.despertar()
+
+
+def _retry_after(response):
+    if response.status_code == 503 and sonda.abierto_desde is not None:
+        response.headers["Retry-After"] = str(math.ceil(_INTERVALO_ABIERTO_S))
+    return response
+
+
+def salud():
+    """Estado cacheado de la API y la base (no abre conexiones)."""
+    estado = sonda.estado()
+    sana = estado["database"] == "connected" and estado["circuito"] == "cerrado"
+    return jsonify({"status": "healthy" if sana else "unhealthy", **estado}), 200 if sana else 503
+
+
+def vivo():
+    """Liveness: el proceso atiende requests; no depende de la base."""
+    return jsonify({"status": "alive", "pid": os.getpid()})
+
+
+def listo():
+    """Readiness: la última sonda fue exitosa, es reciente y el circuito está cerrado."""
+    preparado = sonda.lista()
+    return jsonify({"status": "ready" if preparado else "not_ready", **sonda.estado()}), 200 if preparado else 503
+
+
+def init_app(app) -> None:
+    app.add_url_rule("/api/health", "health", salud, methods=["GET"])
+    app.add_url_rule("/api/health/live", "health_live", vivo, methods=["GET"])
+    app.add_url_rule("/api/health/ready", "health_ready", listo, methods=["GET"])
+    app.after_request(_retry_after)
@@ -2,23 +2,66 @@
 import logging
 from functools import wraps
 
-from flask import jsonify
+from flask import g, jsonify, make_response, request
+from sqlalchemy.orm.exc import StaleDataError
 
 from services.exceptions import ServiceError
+from utils.request_session import commit_request_session, rollback_request_session
+
+
+def etag_condicional(response):
+    """after_request: ETag en las respuestas JSON exitosas de GET y 304 si el
+    cliente ya tiene esa versión (If-None-Match).
+
+    La respuesta se genera igual; lo que se ahorra es la transferencia y el
+    parseo en el cliente. ``private, no-cache`` obliga a revalidar siempre y
+    evita que un proxy comparta respuestas entre usuarios.
+    """
+    if (
+        request.method == "GET"
+        and response.status_code == 200
+        and response.is_json
+        and not response.direct_passthrough
+    ):
+        response.headers.setdefault("Cache-Control", "private, no-cache")
+        response.add_etag()
+        response.make_conditional(request)
+    return response
 
 
 def api_route(fn):
-    """Envuelve un endpoint capturando errores de servicio y del servidor."""
+    """Envuelve un endpoint capturando errores de servicio y del servidor.
+
+    Confirma la sesión de la request si la respuesta es exitosa y la revierte
+    en cualquier otro caso; así los errores del commit también se traducen.
+    Dentro de un lote (``g.lote``, ver utils/batch.py) la sesión es la de la
+    request externa y la confirma ella.
+    """
 
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            return fn(*args, **kwargs)
+            response = make_response(fn(*args, **kwargs))
+            if g.get("lote"):
+                return response
+            if response.status_code < 400:
+                commit_request_session()
+            else:
+                rollback_request_session()
+            return response
         except ServiceError as error:
+            rollback_request_session()
             return jsonify({"error": str(error)}), error.status_code
+        except StaleDataError:
+            rollback_request_session()
+            return jsonify({
+                "error": "El registro fue modificado por otra operación. "
+                         "Recargue los datos e intente nuevamente."
+            }), 409
         except Exception as error:
+            rollback_request_session()
             logging.getLogger(fn.__module__).exception(
-                f"Error no controlado en {fn.__name__}: {error}"
+                "Error no controlado en %s: %s", fn.__name__, error
             )
             return jsonify({"error": "Error interno del servidor"}), 500
 
@@ -0,0 +1,87 @@
+"""Lectura de archivos de alta masiva de usuarios (CSV o JSON Lines).
+
+CSV: primera fila de encabezados con ``nombre``, ``email``, ``password`` y,
+opcionalmente, ``rol``; separador coma o punto y coma. JSONL: un objeto por
+línea con las mismas claves. Cada registro conserva su número de línea para
+informar los errores.
+"""
+import csv
+import io
+import json
+from typing import Dict, List, Optional, Tuple
+
+from services.exceptions import ValidationError
+
+FORMATOS = ("csv", "jsonl")
+_ALIAS = {"ndjson": "jsonl", "json": "jsonl", "text/csv": "csv", "application/x-ndjson": "jsonl",
+          "application/jsonl": "jsonl"}
+CAMPOS = ("nombre", "email", "password", "rol")
+
+
+def _normalizar(formato: str) -> str:
+    formato = formato.strip().lower()
+    return _ALIAS.get(formato, formato)
+
+
+def detectar_formato(formato: Optional[str], nombre_archivo: str = "", content_type: str = "") -> str:
+    """Formato explícito (``?formato=``), o por extensión del archivo o Content-Type."""
+    if formato:
+        candidatos = [_normalizar(formato)]
+    else:
+        extension = nombre_archivo.rsplit(".", 1)[-1] if "." in nombre_archivo else ""
+        candidatos = [_normalizar(extension), _normalizar(content_type.split(";")[0])]
+    for candidato in candidatos:
+        if candidato in FORMATOS:
+            return candidato
+    raise ValidationError("Formato de importación inválido. Debe ser csv o jsonl")
+
+
+def _decodificar(contenido: bytes) -> str:
+    try:
+        return contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValidationError("El archivo debe estar codificado en UTF-8")
+
+
+def _leer_csv(texto: str) -> List[Tuple[int, Dict]]:
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=",;")
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.DictReader(io.StringIO(texto), dialect=dialecto)
+    encabezados = {(campo or "").strip().lower() for campo in lector.fieldnames or ()}
+    faltantes = [campo for campo in ("nombre", "email", "password") if campo not in encabezados]
+    if faltantes:
+        raise ValidationError(f"Faltan columnas en el CSV: {', '.join(faltantes)}")
+    registros = []
+    for fila in lector:
+        datos = {(campo or "").strip().lower(): valor for campo, valor in fila.items()}
+        if any(datos.get(campo) for campo in CAMPOS):
+            registros.append((lector.line_num, datos))
+    return registros
+
+
+def _leer_jsonl(texto: str) -> List[Tuple[int, Dict]]:
+    registros = []
+    for linea, contenido in enumerate(texto.splitlines(), start=1):
+        if not contenido.strip():
+            continue
+        try:
+            datos = json.loads(contenido)
+        except ValueError:
+            raise ValidationError(f"JSON inválido en la línea {linea}")
+        if not isinstance(datos, dict):
+            raise ValidationError(f"La línea {linea} debe ser un objeto JSON")
+        registros.append((linea, datos))
+    return registros
+
+
+def leer_registros(contenido: bytes, formato: str, max_filas: int) -> List[Tuple[int, Dict]]:
+    """[(línea, datos)] del archivo; ValidationError si no se puede leer o supera max_filas."""
+    texto = _decodificar(contenido)
+    registros = _leer_csv(texto) if formato == "csv" else _leer_jsonl(texto)
+    if not registros:
+        raise ValidationError("El archivo no contiene usuarios")
+    if len(registros) > max_filas:
+        raise ValidationError(f"Máximo {max_filas} usuarios por importación")
+    return registros
@@ -0,0 +1,207 @@
+"""Logging no bloqueante: los hilos de las requests solo encolan registros.
+
+``configurar_logging`` pone un ``QueueHandler`` en el logger raíz y un
+``QueueListener`` en su propio hilo escribe en ``logs/biblioteca.log`` y
+``logs/sql_lento.log`` (JSON, un objeto por línea) y, con LOG_CONSOLA, en
+stderr. Si la cola se llena (disco lento), los registros se descartan y se
+cuentan en /metrics en lugar de frenar la request.
+
+Los mensajes usan formato perezoso (``logger.info("... %s", valor)``): solo
+se interpolan si el registro pasa el nivel y el muestreo. Los INFO de una
+misma plantilla que superan LOG_INFO_MAX_POR_S por segundo se muestrean uno
+de cada LOG_INFO_MUESTREO_N; el registro que pasa lleva en ``suprimidos``
+cuántos se omitieron desde el anterior.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from flask import has_request_context, request
+
+from config.settings import (
+    LOG_COLA_MAX,
+    LOG_CONSOLA,
+    LOG_DIR,
+    LOG_INFO_MAX_POR_S,
+    LOG_INFO_MUESTREO_N,
+    LOG_NIVEL,
+)
+from utils.metrics import LOG_DESCARTADOS, LOG_SUPRIMIDOS
+
+_ATRIBUTOS_ESTANDAR = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_MAX_PLANTILLAS = 10000
+_formato_traza = logging.Formatter()
+
+
+class FormatoJson(logging.Formatter):
+    """Un objeto JSON por registro, con los campos de ``extra`` incluidos."""
+
+    def format(self, record):
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+            "origen": f"{record.module}:{record.lineno}",
+            "pid": record.process,
+            "hilo": record.threadName,
+        }
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_ESTANDAR and not clave.startswith("_"):
+                datos[clave] = valor
+        if record.exc_text:
+            datos["traza"] = record.exc_text
+        if record.stack_info:
+            datos["pila"] = record.stack_info
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class MuestreoInfo(logging.Filter):
+    """Muestrea los INFO de una plantilla cuando superan max_por_s por segundo.
+
+    Sin locks: una carrera entre hilos solo desvía el conteo en uno o dos.
+    """
+
+    def __init__(self, max_por_s: int, uno_de_cada: int):
+        super().__init__()
+        self.max_por_s = max_por_s
+        self.uno_de_cada = max(uno_de_cada, 1)
+        # (logger, plantilla) -> [segundo, vistos en ese segundo, suprimidos sin informar]
+        self._ventanas = {}
+
+    def filter(self, record):
+        if record.levelno != logging.INFO or not isinstance(record.msg, str):
+            return True
+        clave = (record.name, record.msg)
+        segundo = int(record.created)
+        ventana = self._ventanas.get(clave)
+        if ventana is None:
+            if len(self._ventanas) >= _MAX_PLANTILLAS:
+                self._ventanas.clear()
+            ventana = self._ventanas[clave] = [segundo, 0, 0]
+        elif ventana[0] != segundo:
+            ventana[0], ventana[1] = segundo, 0
+
+        ventana[1] += 1
+        exceso = ventana[1] - self.max_por_s
+        if exceso > 0 and exceso % self.uno_de_cada:
+            ventana[2] += 1
+            LOG_SUPRIMIDOS.inc()
+            return False
+        if ventana[2]:
+            record.suprimidos = ventana[2]
+            ventana[2] = 0
+        return True
+
+
+class ColaNoBloqueante(QueueHandler):
+    """QueueHandler que descarta en lugar de esperar si la cola está llena."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DESCARTADOS.inc()
+
+    def prepare(self, record):
+        # El mensaje y la traza se resuelven en el hilo que loguea (los args
+        # pueden cambiar después); el JSON y la escritura, en el listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = _formato_traza.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        if has_request_context() and not hasattr(record, "ruta"):
+            record.metodo = request.method
+            record.ruta = request.path
+            user = getattr(request, "user", None)
+            if user:
+                record.usuario = user.get("user_id")
+        return record
+
+
+class _SinSqlLento(logging.Filter):
+    def filter(self, record):
+        return record.name != "sql_lento"
+
+
+_handler: Optional[ColaNoBloqueante] = None
+_listener: Optional[QueueListener] = None
+_destinos = ()
+_pid = None
+_lock = threading.Lock()
+
+
+def _archivo(nombre: str, respaldos: int) -> RotatingFileHandler:
+    handler = RotatingFileHandler(
+        os.path.join(LOG_DIR, nombre), maxBytes=10240000, backupCount=respaldos, encoding="utf-8"
+    )
+    handler.setFormatter(FormatoJson())
+    return handler
+
+
+def configurar_logging() -> None:
+    """Instala la cola en el logger raíz y arranca el listener (idempotente)."""
+    global _handler, _destinos
+    with _lock:
+        if _handler is not None:
+            return
+        os.makedirs(LOG_DIR, exist_ok=True)
+        principal = _archivo("biblioteca.log", 10)
+        principal.addFilter(_SinSqlLento())
+        lento = _archivo("sql_lento.log", 5)
+        lento.addFilter(logging.Filter("sql_lento"))
+        destinos = [principal, lento]
+        if LOG_CONSOLA:
+            consola = logging.StreamHandler()
+            consola.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            destinos.append(consola)
+        _destinos = tuple(destinos)
+
+        _handler = ColaNoBloqueante(queue.Queue(LOG_COLA_MAX))
+        _handler.addFilter(MuestreoInfo(LOG_INFO_MAX_POR_S, LOG_INFO_MUESTREO_N))
+        raiz = logging.getLogger()
+        raiz.addHandler(_handler)
+        raiz.setLevel(LOG_NIVEL)
+    iniciar_listener()
+
+
+def iniciar_listener() -> None:
+    """Arranca el hilo escritor del proceso actual (no sobrevive a un fork)."""
+    global _listener, _pid
+    with _lock:
+        if _handler is None or _pid == os.getpid():
+            return
+        if _pid is not None:
+            # Hijo de un fork: la cola heredada pudo quedar con locks tomados
+            _handler.queue = queue.Queue(LOG_COLA_MAX)
+        _pid = os.getpid()
+        _listener = QueueListener(_handler.queue, *_destinos, respect_handler_level=True)
+        _listener.start()
+
+
+def detener_listener() -> None:
+    """Vacía la cola y detiene el hilo escritor (al salir del proceso)."""
+    global _pid
+    with _lock:
+        if _listener is not None and _pid == os.getpid():
+            _listener.stop()
+            _pid = None
+
+
+def _despues_del_fork() -> None:
+    global _lock
+    # Otro hilo del padre pudo tener el lock tomado al momento del fork
+    _lock = threading.Lock()
+    iniciar_listener()
+
+
+os.register_at_fork(after_in_child=_despues_del_fork)
+atexit.register(detener_listener)
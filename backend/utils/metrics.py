@@ -0,0 +1,661 @@
+"""Métricas de la API en formato de exposición de Prometheus (GET /metrics).
+
+Cada hilo acumula en su propio fragmento, un dict que solo escribe ese hilo,
+así que registrar una observación no toma locks; el scrape suma los
+fragmentos (y conserva lo acumulado por hilos que ya terminaron).
+
+Con PROMETHEUS_MULTIPROC_DIR cada proceso (worker de gunicorn) vuelca su
+agregado a ``<dir>/metricas_<pid>.json`` cada METRICAS_VOLCADO_S segundos y
+al salir; el scrape, atendido por cualquier worker, combina los archivos:
+contadores e histogramas de todos los procesos, gauges solo de los vivos.
+Cuando un worker termina, el master suma su volcado a
+``metricas_terminados.json`` y lo borra (``archivar_proceso``, desde
+``child_exit``): el directorio no crece con cada reciclado y un pid reutilizado
+no pisa los totales del worker anterior. El directorio debe vaciarse al
+arrancar el servidor (``limpiar_directorio``).
+"""
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from flask import Response, g, request
+
+from config.settings import (
+    METRICAS_HABILITADAS,
+    METRICAS_MULTIPROC_DIR,
+    METRICAS_VOLCADO_S,
+)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+BUCKETS_BCRYPT = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BUCKETS_SQL = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+# (nombre de la métrica, valores de etiquetas) -> número, o lista para histogramas
+Serie = Tuple[str, Tuple[str, ...]]
+
+TERMINADOS = "metricas_terminados.json"
+
+
+def _sumar(destino: Dict, origen: Dict) -> None:
+    for clave, valor in origen.items():
+        if isinstance(valor, list):
+            actual = destino.get(clave)
+            if actual is None:
+                destino[clave] = list(valor)
+            else:
+                for indice, cantidad in enumerate(valor):
+                    actual[indice] += cantidad
+        else:
+            destino[clave] = destino.get(clave, 0) + valor
+
+
+def _ruta_volcado(pid: int) -> str:
+    return os.path.join(METRICAS_MULTIPROC_DIR, f"metricas_{pid}.json")
+
+
+def _leer_volcado(ruta: str) -> List:
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def _escribir_volcado(ruta: str, total: Dict[Serie, object]) -> None:
+    series = [[nombre, list(etiquetas), valor] for (nombre, etiquetas), valor in total.items()]
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(series, archivo)
+    os.replace(temporal, ruta)
+
+
+@contextmanager
+def _bloqueo_directorio(exclusivo: bool):
+    """flock sobre <dir>/metricas.lock: los scrapes leen compartido, el master archiva exclusivo."""
+    import fcntl
+
+    with open(os.path.join(METRICAS_MULTIPROC_DIR, "metricas.lock"), "a") as archivo:
+        fcntl.flock(archivo, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _numero(valor) -> str:
+    if isinstance(valor, int):
+        return str(valor)
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor))
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra: str = "") -> str:
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class _Fragmento:
+    __slots__ = ("valores", "hilo")
+
+    def __init__(self, hilo: threading.Thread):
+        self.valores: Dict[Serie, object] = {}
+        self.hilo = hilo
+
+
+class Registro:
+    """Definiciones de métricas y fragmentos por hilo del proceso actual."""
+
+    def __init__(self):
+        self.metricas: Dict[str, "_Metrica"] = {}
+        # Funciones que devuelven (métrica, etiquetas, valor) leídos al momento del scrape
+        self.colectores: List[Callable[[], Iterable]] = []
+        # Igual, pero calculadas sobre el agregado de todos los procesos
+        self.derivadas: List[Callable[[Dict], Iterable]] = []
+        self._reiniciar()
+
+    def _reiniciar(self) -> None:
+        """Estado por proceso; se llama de nuevo en el hijo después de un fork."""
+        self._local = threading.local()
+        self._fragmentos: List[_Fragmento] = []
+        self._retirados: Dict[Serie, object] = {}
+        self._lock = threading.Lock()
+        self._volcador = None
+
+    def valores(self) -> Dict[Serie, object]:
+        """Dict del hilo actual; solo lo escribe este hilo."""
+        try:
+            return self._local.fragmento.valores
+        except AttributeError:
+            return self._nuevo_fragmento().valores
+
+    def _nuevo_fragmento(self) -> _Fragmento:
+        fragmento = _Fragmento(threading.current_thread())
+        self._local.fragmento = fragmento
+        with self._lock:
+            self._fragmentos.append(fragmento)
+            if METRICAS_MULTIPROC_DIR and self._volcador is None:
+                self._volcador = threading.Thread(
+                    target=self._volcar_periodicamente, name="metricas-volcado", daemon=True
+                )
+                self._volcador.start()
+        return fragmento
+
+    def instantanea(self) -> Dict[Serie, object]:
+        """Suma de los fragmentos de este proceso más los colectores."""
+        total: Dict[Serie, object] = {}
+        with self._lock:
+            vivos = []
+            for fragmento in self._fragmentos:
+                if fragmento.hilo.is_alive():
+                    vivos.append(fragmento)
+                else:
+                    _sumar(self._retirados, fragmento.valores)
+            self._fragmentos = vivos
+            _sumar(total, self._retirados)
+            for fragmento in vivos:
+                # dict() copia en una sola operación bajo el GIL
+                _sumar(total, dict(fragmento.valores))
+
+        for colector in self.colectores:
+            try:
+                for metrica, etiquetas, valor in colector():
+                    total[(metrica.nombre, etiquetas)] = valor
+            except Exception as error:
+                logger.warning("Colector de métricas %s falló: %s", colector.__name__, error)
+        return total
+
+    def volcar(self) -> None:
+        """Escribe el agregado del proceso en el directorio compartido."""
+        _escribir_volcado(_ruta_volcado(os.getpid()), self.instantanea())
+
+    def _volcar_periodicamente(self) -> None:
+        while True:
+            time.sleep(METRICAS_VOLCADO_S)
+            try:
+                self.volcar()
+            except Exception as error:
+                logger.warning("No se pudieron volcar las métricas: %s", error)
+
+    def agregado(self) -> Dict[Serie, object]:
+        """Agregado del proceso o, en modo multiproceso, de todos los workers."""
+        if not METRICAS_MULTIPROC_DIR:
+            return self.instantanea()
+
+        self.volcar()
+        total: Dict[Serie, object] = {}
+        # Con el master archivando a la vez se leería un worker dos veces o ninguna
+        with _bloqueo_directorio(exclusivo=False):
+            for ruta in glob.glob(os.path.join(METRICAS_MULTIPROC_DIR, "metricas_*.json")):
+                nombre_archivo = os.path.basename(ruta)
+                try:
+                    if nombre_archivo == TERMINADOS:
+                        vivo = False
+                    else:
+                        pid = int(nombre_archivo[len("metricas_"):-len(".json")])
+                        vivo = pid == os.getpid() or _proceso_vivo(pid)
+                    series = _leer_volcado(ruta)
+                except (OSError, ValueError):
+                    continue
+                for nombre, etiquetas, valor in series:
+                    metrica = self.metricas.get(nombre)
+                    if metrica is None or (metrica.tipo == "gauge" and not vivo):
+                        continue
+                    _sumar(total, {(nombre, tuple(etiquetas)): valor})
+        return total
+
+    def exponer(self) -> str:
+        total = self.agregado()
+        for derivada in self.derivadas:
+            for metrica, etiquetas, valor in derivada(total):
+                total[(metrica.nombre, etiquetas)] = valor
+
+        por_metrica = defaultdict(list)
+        for (nombre, etiquetas), valor in total.items():
+            por_metrica[nombre].append((etiquetas, valor))
+
+        lineas = []
+        for nombre, metrica in self.metricas.items():
+            lineas.append(f"# HELP {nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {nombre} {metrica.tipo}")
+            for etiquetas, valor in sorted(por_metrica.get(nombre, [])):
+                lineas.extend(metrica.lineas(etiquetas, valor))
+        return "\n".join(lineas) + "\n"
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, registro: Registro, nombre: str, ayuda: str, etiquetas=()):
+        self.registro = registro
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        registro.metricas[nombre] = self
+
+    def lineas(self, etiquetas, valor) -> List[str]:
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, etiquetas)} {_numero(valor)}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, *etiquetas: str, valor: float = 1) -> None:
+        valores = self.registro.valores()
+        clave = (self.nombre, etiquetas)
+        valores[clave] = valores.get(clave, 0) + valor
+
+
+class Gauge(_Metrica):
+    """Gauge sumable: cada hilo debe decrementar lo que incrementó."""
+
+    tipo = "gauge"
+
+    def inc(self, *etiquetas: str, valor: float = 1) -> None:
+        valores = self.registro.valores()
+        clave = (self.nombre, etiquetas)
+        valores[clave] = valores.get(clave, 0) + valor
+
+    def dec(self, *etiquetas: str, valor: float = 1) -> None:
+        self.inc(*etiquetas, valor=-valor)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, registro, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(registro, nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor: float, *etiquetas: str) -> None:
+        valores = self.registro.valores()
+        clave = (self.nombre, etiquetas)
+        serie = valores.get(clave)
+        if serie is None:
+            # Cuentas por bucket (sin acumular), la de +Inf y al final la suma
+            serie = valores[clave] = [0] * (len(self.buckets) + 2)
+        serie[bisect_left(self.buckets, valor)] += 1
+        serie[-1] += valor
+
+    def lineas(self, etiquetas, valor) -> List[str]:
+        lineas = []
+        acumulado = 0
+        for limite, cantidad in zip(self.buckets + (math.inf,), valor[:-1]):
+            acumulado += cantidad
+            le = f'le="{_numero(float(limite))}"'
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, etiquetas, le)} {acumulado}")
+        sufijo = _etiquetas(self.etiquetas, etiquetas)
+        lineas.append(f"{self.nombre}_sum{sufijo} {_numero(valor[-1])}")
+        lineas.append(f"{self.nombre}_count{sufijo} {acumulado}")
+        return lineas
+
+
+registro = Registro()
+
+HTTP_DURACION = Histograma(
+    registro,
+    "biblioteca_http_request_duration_seconds",
+    "Duración de las requests por ruta, método y status",
+    ("ruta", "metodo", "status"),
+)
+HTTP_TAMANO = Histograma(
+    registro,
+    "biblioteca_http_response_size_bytes",
+    "Tamaño del cuerpo de las respuestas por ruta",
+    ("ruta",),
+    BUCKETS_BYTES,
+)
+HTTP_EN_CURSO = Gauge(
+    registro,
+    "biblioteca_http_requests_in_flight",
+    "Requests que se están atendiendo",
+)
+BCRYPT_EN_CURSO = Gauge(
+    registro,
+    "biblioteca_bcrypt_en_curso",
+    "Operaciones bcrypt en ejecución o esperando CPU",
+)
+BCRYPT_DURACION = Histograma(
+    registro,
+    "biblioteca_bcrypt_duration_seconds",
+    "Duración de hash_password y verify_password",
+    ("operacion",),
+    BUCKETS_BCRYPT,
+)
+POOL_EN_USO = Gauge(
+    registro,
+    "biblioteca_db_pool_en_uso",
+    "Conexiones prestadas por el pool",
+    ("engine",),
+)
+POOL_LIBRES = Gauge(
+    registro,
+    "biblioteca_db_pool_libres",
+    "Conexiones abiertas disponibles en el pool",
+    ("engine",),
+)
+POOL_TAMANO = Gauge(
+    registro,
+    "biblioteca_db_pool_tamano",
+    "Tamaño configurado del pool",
+    ("engine",),
+)
+POOL_DESBORDE = Gauge(
+    registro,
+    "biblioteca_db_pool_desborde",
+    "Conexiones por encima de pool_size (negativo mientras el pool no se llenó)",
+    ("engine",),
+)
+SQL_DURACION = Histograma(
+    registro,
+    "biblioteca_db_query_duration_seconds",
+    "Duración de cada sentencia SQL por tipo",
+    ("operacion",),
+    BUCKETS_SQL,
+)
+SQL_FILAS = Contador(
+    registro,
+    "biblioteca_db_filas_total",
+    "Filas leídas (SELECT del ORM) o afectadas (DML)",
+    ("operacion",),
+)
+SQL_LENTAS = Contador(
+    registro,
+    "biblioteca_db_consultas_lentas_total",
+    "Sentencias por encima de SQL_LENTA_MS",
+    ("operacion",),
+)
+SQL_POR_REQUEST = Histograma(
+    registro,
+    "biblioteca_db_consultas_por_request",
+    "Sentencias SQL ejecutadas por request",
+    ("ruta",),
+    BUCKETS_CONSULTAS,
+)
+SQL_N_MAS_1 = Contador(
+    registro,
+    "biblioteca_db_n_mas_1_total",
+    "Requests que repitieron una misma sentencia más de SQL_N_MAS_1_UMBRAL veces",
+    ("ruta",),
+)
+LOG_DESCARTADOS = Contador(
+    registro,
+    "biblioteca_log_descartados_total",
+    "Registros de log descartados por cola llena",
+)
+LOG_SUPRIMIDOS = Contador(
+    registro,
+    "biblioteca_log_suprimidos_total",
+    "Registros INFO omitidos por el muestreo",
+)
+DB_DISPONIBLE = Gauge(
+    registro,
+    "biblioteca_db_disponible",
+    "1 si la última sonda de la base fue exitosa",
+)
+DB_SONDA_LATENCIA = Gauge(
+    registro,
+    "biblioteca_db_sonda_latencia_seconds",
+    "Latencia de la última sonda de la base",
+)
+CIRCUITO_ABIERTO = Gauge(
+    registro,
+    "biblioteca_db_circuito_abierto",
+    "1 mientras las requests que usan la base se rechazan con 503",
+)
+CIRCUITO_RECHAZOS = Contador(
+    registro,
+    "biblioteca_db_circuito_rechazos_total",
+    "Requests rechazadas con 503 por el circuito abierto",
+)
+EVENTOS_CONEXIONES = Gauge(
+    registro,
+    "biblioteca_eventos_conexiones",
+    "Streams de /api/events abiertos",
+)
+EVENTOS_ENVIADOS = Contador(
+    registro,
+    "biblioteca_eventos_enviados_total",
+    "Eventos escritos en los streams de /api/events",
+    ("tipo",),
+)
+EVENTOS_DESBORDES = Contador(
+    registro,
+    "biblioteca_eventos_desbordes_total",
+    "Streams cortados porque el cliente no leía a tiempo",
+)
+AUDITORIA_COLA = Gauge(
+    registro,
+    "biblioteca_auditoria_cola",
+    "Eventos de auditoría confirmados esperando al hilo escritor",
+)
+AUDITORIA_MOVIDOS = Contador(
+    registro,
+    "biblioteca_auditoria_movidos_total",
+    "Eventos pasados del outbox a AUDITORIA_EVENTOS, por la cola o por el barrido",
+    ("via",),
+)
+AUDITORIA_DIFERIDOS = Contador(
+    registro,
+    "biblioteca_auditoria_diferidos_total",
+    "Eventos que no entraron en la cola llena y esperan al barrido del outbox",
+)
+AUDITORIA_ERRORES = Contador(
+    registro,
+    "biblioteca_auditoria_errores_total",
+    "Lotes de auditoría que no se pudieron mover (se reintentan con el barrido)",
+)
+CACHE_ACIERTOS = Contador(
+    registro,
+    "biblioteca_cache_aciertos_total",
+    "Lecturas servidas por la caché de entidades",
+    ("familia",),
+)
+CACHE_FALLOS = Contador(
+    registro,
+    "biblioteca_cache_fallos_total",
+    "Lecturas que tuvieron que ir a la base",
+    ("familia",),
+)
+CACHE_INVALIDACIONES = Contador(
+    registro,
+    "biblioteca_cache_invalidaciones_total",
+    "Claves o familias invalidadas",
+    ("familia",),
+)
+CACHE_TASA_ACIERTOS = Gauge(
+    registro,
+    "biblioteca_cache_tasa_aciertos",
+    "Aciertos / lecturas desde el arranque",
+    ("familia",),
+)
+
+
+def _colector_pool():
+    import config.database as database
+
+    for nombre, engine in (("primario", database.engine), ("replica", database.replica_engine)):
+        if engine is None:
+            continue
+        pool = engine.pool
+        for metrica, metodo in (
+            (POOL_EN_USO, "checkedout"),
+            (POOL_LIBRES, "checkedin"),
+            (POOL_TAMANO, "size"),
+            (POOL_DESBORDE, "overflow"),
+        ):
+            # StaticPool y NullPool no exponen estos contadores
+            funcion = getattr(pool, metodo, None)
+            if funcion is not None:
+                yield metrica, (nombre,), funcion()
+
+
+def _colector_cache():
+    from cache import get_cache
+
+    for familia, contador in get_cache().contadores().items():
+        yield CACHE_ACIERTOS, (familia,), contador["aciertos"]
+        yield CACHE_FALLOS, (familia,), contador["fallos"]
+        yield CACHE_INVALIDACIONES, (familia,), contador["invalidaciones"]
+
+
+def _colector_salud():
+    from utils.health import sonda
+
+    if sonda.disponible is not None:
+        yield DB_DISPONIBLE, (), int(sonda.disponible)
+        yield DB_SONDA_LATENCIA, (), sonda.latencia_ms / 1000
+    yield CIRCUITO_ABIERTO, (), int(sonda.circuito_abierto)
+
+
+def _colector_eventos():
+    from utils.events import canal
+
+    yield EVENTOS_CONEXIONES, (), canal.conexiones
+
+
+def _colector_auditoria():
+    from utils.auditoria import escritor
+
+    yield AUDITORIA_COLA, (), escritor.en_cola
+
+
+def _tasa_aciertos(total):
+    for (nombre, etiquetas), aciertos in list(total.items()):
+        if nombre != CACHE_ACIERTOS.nombre:
+            continue
+        lecturas = aciertos + total.get((CACHE_FALLOS.nombre, etiquetas), 0)
+        if lecturas:
+            yield CACHE_TASA_ACIERTOS, etiquetas, aciertos / lecturas
+
+
+registro.colectores.extend([_colector_pool, _colector_cache, _colector_salud, _colector_eventos, _colector_auditoria])
+registro.derivadas.append(_tasa_aciertos)
+
+
+@contextmanager
+def medir_bcrypt(operacion: str):
+    BCRYPT_EN_CURSO.inc()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        BCRYPT_EN_CURSO.dec()
+        BCRYPT_DURACION.observar(time.perf_counter() - inicio, operacion)
+
+
+def limpiar_directorio() -> None:
+    """Borra los volcados de una ejecución anterior (llamar antes de crear los workers)."""
+    if METRICAS_MULTIPROC_DIR:
+        for ruta in glob.glob(os.path.join(METRICAS_MULTIPROC_DIR, "metricas_*.json*")):
+            os.remove(ruta)
+
+
+def archivar_proceso(pid: int) -> None:
+    """Suma el volcado de un worker terminado a TERMINADOS y lo borra (master, child_exit).
+
+    Los gauges del proceso muerto se descartan al leer, como los de cualquier
+    worker que ya no existe.
+    """
+    if not METRICAS_MULTIPROC_DIR:
+        return
+    ruta = _ruta_volcado(pid)
+    terminados = os.path.join(METRICAS_MULTIPROC_DIR, TERMINADOS)
+    with _bloqueo_directorio(exclusivo=True):
+        try:
+            series = _leer_volcado(ruta)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            logger.warning("Volcado de métricas ilegible del worker %s: %s", pid, error)
+            os.remove(ruta)
+            return
+        try:
+            series += _leer_volcado(terminados)
+        except FileNotFoundError:
+            pass
+        total: Dict[Serie, object] = {}
+        for nombre, etiquetas, valor in series:
+            _sumar(total, {(nombre, tuple(etiquetas)): valor})
+        _escribir_volcado(terminados, total)
+        os.remove(ruta)
+
+
+def _volcar_al_salir() -> None:
+    if METRICAS_MULTIPROC_DIR and registro._fragmentos:
+        try:
+            registro.volcar()
+        except Exception as error:
+            logger.warning("No se pudieron volcar las métricas al salir: %s", error)
+
+
+os.register_at_fork(after_in_child=registro._reiniciar)
+atexit.register(_volcar_al_salir)
+
+
+def _inicio_request():
+    g.metricas_inicio = time.perf_counter()
+    HTTP_EN_CURSO.inc()
+
+
+def _registrar_respuesta(response):
+    inicio = g.get("metricas_inicio")
+    if inicio is None:
+        return response
+    regla = request.url_rule
+    ruta = regla.rule if regla is not None else "<sin_ruta>"
+    HTTP_DURACION.observar(time.perf_counter() - inicio, ruta, request.method, str(response.status_code))
+    tamano = response.content_length
+    if tamano is not None:
+        HTTP_TAMANO.observar(tamano, ruta)
+    return response
+
+
+def _fin_request(error=None):
+    if g.pop("metricas_inicio", None) is not None:
+        HTTP_EN_CURSO.dec()
+
+
+def exponer_metricas():
+    return Response(registro.exponer(), content_type=CONTENT_TYPE)
+
+
+def init_app(app) -> None:
+    """Instrumenta todas las rutas de app y publica GET /metrics."""
+    if not METRICAS_HABILITADAS:
+        return
+    if METRICAS_MULTIPROC_DIR:
+        os.makedirs(METRICAS_MULTIPROC_DIR, exist_ok=True)
+    # Primero que los demás before_request para incluir la autenticación JWT
+    app.before_request_funcs.setdefault(None, []).insert(0, _inicio_request)
+    app.after_request(_registrar_respuesta)
+    app.teardown_request(_fin_request)
+    app.add_url_rule("/metrics", "metrics", exponer_metricas, methods=["GET"])
@@ -7,6 +7,8 @@ PUBLIC_PATHS = {
     "/api/auth/login",
     "/api/auth/register",
     "/api/health",
+    "/api/health/live",
+    "/api/health/ready",
 }
 
 
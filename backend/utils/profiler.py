@@ -0,0 +1,222 @@
+"""Profiler por muestreo de requests individuales.
+
+Se perfila una request cuando un bibliotecario envía la cabecera
+``X-Profile: 1`` o cuando cae dentro del porcentaje de muestreo que se
+configura en PUT /api/perfiles/muestreo. Mientras haya requests perfiladas,
+un único hilo toma cada PERFILES_INTERVALO_MS la pila de cada una con
+``sys._current_frames()``; el hilo de la request no ejecuta nada extra.
+
+Al terminar se escribe ``PERFILES_DIR/<fecha>-<pid>-<método>-<ruta>-<ms>ms-<id>.folded``
+en formato de pilas colapsadas (``modulo:funcion;...;modulo:funcion N``),
+listo para flamegraph.pl, speedscope o inferno. La respuesta lleva el
+nombre del archivo en X-Profile-Id.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+from cache import get_cache
+from cache.backends import MemoriaBackend
+from config.settings import (
+    PERFILES_DIR,
+    PERFILES_INTERVALO_MS,
+    PERFILES_MAX_ARCHIVOS,
+    PERFILES_MUESTREO_PCT,
+)
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_VALIDO = re.compile(r"^[\w.-]+\.folded$")
+_NO_ALFANUMERICO = re.compile(r"[^A-Za-z0-9]+")
+_CLAVE_MUESTREO = "perfiles:muestreo"
+_REFRESCO_MUESTREO_S = 5
+
+
+def _colapsar(frame) -> str:
+    partes = []
+    while frame is not None:
+        partes.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    partes.reverse()
+    return ";".join(partes)
+
+
+class Muestreador:
+    """Hilo que muestrea las pilas de los hilos registrados."""
+
+    def __init__(self, intervalo_s: float):
+        self.intervalo_s = intervalo_s
+        self._activos: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._hay_activos = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._pid = None
+
+    def iniciar(self, id_hilo: int) -> None:
+        with self._lock:
+            self._activos[id_hilo] = Counter()
+            self._hay_activos.set()
+            # pid: el hilo no sobrevive al fork de los workers de gunicorn
+            if self._hilo is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._hilo = threading.Thread(target=self._ejecutar, name="profiler", daemon=True)
+                self._hilo.start()
+
+    def detener(self, id_hilo: int) -> Optional[Counter]:
+        """Quita el hilo del muestreo; el muestreador ya no toca las pilas devueltas."""
+        with self._lock:
+            pilas = self._activos.pop(id_hilo, None)
+            if not self._activos:
+                self._hay_activos.clear()
+        return pilas
+
+    def _ejecutar(self) -> None:
+        propio = threading.get_ident()
+        while True:
+            self._hay_activos.wait()
+            time.sleep(self.intervalo_s)
+            marcos = sys._current_frames()
+            # Se suma bajo el lock: detener() entrega pilas que ya nadie modifica
+            # y _guardar puede recorrerlas sin copiarlas
+            with self._lock:
+                for id_hilo, pilas in self._activos.items():
+                    frame = marcos.get(id_hilo)
+                    if frame is not None and id_hilo != propio:
+                        pilas[_colapsar(frame)] += 1
+            del marcos
+
+
+muestreador = Muestreador(PERFILES_INTERVALO_MS / 1000)
+
+
+class ConfiguracionMuestreo:
+    """Porcentaje de requests perfiladas al azar.
+
+    Se guarda en el backend de la caché para que, con CACHE_BACKEND=redis,
+    lo vean todos los workers; cada proceso lo relee cada pocos segundos.
+    """
+
+    def __init__(self, porcentaje_inicial: float):
+        self._inicial = porcentaje_inicial
+        self._local = MemoriaBackend(64 * 1024)
+        self._valor = porcentaje_inicial
+        self._leido = -float("inf")
+
+    def _almacen(self):
+        backend = get_cache().backend
+        return backend if backend is not None else self._local
+
+    def porcentaje(self) -> float:
+        if time.monotonic() - self._leido >= _REFRESCO_MUESTREO_S:
+            self._leido = time.monotonic()
+            try:
+                guardado = self._almacen().get(_CLAVE_MUESTREO)
+                self._valor = float(guardado) if guardado is not None else self._inicial
+            except Exception as error:
+                logger.warning("No se pudo leer el muestreo de perfiles: %s", error)
+        return self._valor
+
+    def configurar(self, porcentaje: float, duracion_s: int) -> None:
+        self._almacen().set(_CLAVE_MUESTREO, str(porcentaje).encode("utf-8"), duracion_s)
+        self._valor = porcentaje
+        self._leido = time.monotonic()
+
+
+muestreo = ConfiguracionMuestreo(PERFILES_MUESTREO_PCT)
+
+
+def directorio() -> Path:
+    return Path(PERFILES_DIR).resolve()
+
+
+def _debe_perfilar() -> bool:
+    if not request.path.startswith("/api/") or request.path.startswith("/api/perfiles"):
+        return False
+    if request.headers.get("X-Profile"):
+        user = getattr(request, "user", None)
+        if user and user.get("rol") == "BIBLIOTECARIO":
+            return True
+    porcentaje = muestreo.porcentaje()
+    return porcentaje > 0 and random.random() * 100 < porcentaje
+
+
+def _iniciar_perfil():
+    if _debe_perfilar():
+        g.perfil_inicio = time.perf_counter()
+        muestreador.iniciar(threading.get_ident())
+
+
+def _nombre_archivo(duracion_ms: float) -> str:
+    ruta = _NO_ALFANUMERICO.sub("_", request.path).strip("_")[:60]
+    return (
+        f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{request.method}-{ruta}"
+        f"-{duracion_ms:.0f}ms-{uuid.uuid4().hex[:6]}.folded"
+    )
+
+
+def _guardar(pilas: Counter, nombre: str) -> None:
+    destino = directorio()
+    destino.mkdir(parents=True, exist_ok=True)
+    (destino / nombre).write_text(
+        "".join(f"{pila} {cantidad}\n" for pila, cantidad in pilas.most_common()),
+        encoding="utf-8",
+    )
+    archivos = sorted(destino.glob("*.folded"), key=lambda ruta: ruta.stat().st_mtime)
+    for viejo in archivos[:-PERFILES_MAX_ARCHIVOS]:
+        viejo.unlink(missing_ok=True)
+
+
+def _terminar_perfil(response):
+    inicio = g.pop("perfil_inicio", None)
+    if inicio is None:
+        return response
+    pilas = muestreador.detener(threading.get_ident())
+    if not pilas:
+        response.headers["X-Profile-Id"] = "sin-muestras"
+        return response
+    nombre = _nombre_archivo((time.perf_counter() - inicio) * 1000)
+    try:
+        _guardar(pilas, nombre)
+        response.headers["X-Profile-Id"] = nombre
+    except OSError as error:
+        logger.warning("No se pudo guardar el perfil %s: %s", nombre, error)
+    return response
+
+
+def _cancelar_perfil(error=None):
+    if g.pop("perfil_inicio", None) is not None:
+        muestreador.detener(threading.get_ident())
+
+
+def listar() -> List[Dict]:
+    """Perfiles guardados, del más reciente al más antiguo."""
+    destino = directorio()
+    if not destino.is_dir():
+        return []
+    perfiles = []
+    for ruta in destino.glob("*.folded"):
+        estado = ruta.stat()
+        perfiles.append({
+            "nombre": ruta.name,
+            "bytes": estado.st_size,
+            "fecha": datetime.fromtimestamp(estado.st_mtime).isoformat(timespec="seconds"),
+        })
+    return sorted(perfiles, key=lambda perfil: perfil["fecha"], reverse=True)
+
+
+def init_app(app) -> None:
+    """Registrar después del middleware JWT: la cabecera se valida con request.user."""
+    app.before_request(_iniciar_perfil)
+    app.after_request(_terminar_perfil)
+    app.teardown_request(_cancelar_perfil)
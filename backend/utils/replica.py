@@ -0,0 +1,118 @@
+"""Estado de la réplica de lectura: retraso medido y adherencia al primario.
+
+El retraso es la antigüedad, según el reloj del primario, del latido que un
+job del primario escribe cada segundo y que se lee en la réplica (ver
+16_latido_replica.sql): no depende de que haya escrituras ni de los relojes
+de los nodos. Se mide como mucho una vez cada DB_REPLICA_CHECK_S por
+proceso, dentro de la request que lo necesite.
+
+Después de escribir, un usuario lee del primario durante DB_REPLICA_STICKY_S
+(o el retraso actual, si es mayor). La marca viaja firmada en la cabecera
+X-Leer-Primario: la respuesta de la escritura la trae y el cliente la
+reenvía, así vale en cualquier worker o nodo y no se pierde si se vacía la
+caché.
+"""
+import logging
+import math
+import threading
+import time
+from typing import Optional
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import func, select, text
+
+import config.database as database
+from config.database import DB_REPLICA_CHECK_S, DB_REPLICA_MAX_LAG_S, DB_REPLICA_STICKY_S
+from models.latido_replica import LatidoReplica
+
+logger = logging.getLogger(__name__)
+
+CABECERA_ADHERENCIA = "X-Leer-Primario"
+
+
+def _ultimo_latido(motor):
+    with motor.connect() as connection:
+        return connection.execute(select(LatidoReplica.fecha).where(LatidoReplica.id == 1)).scalar()
+
+
+def _hora_utc(motor):
+    """Hora UTC actual de la base, en el mismo formato que escribe el job del latido."""
+    with motor.connect() as connection:
+        if connection.dialect.name == "oracle":
+            return connection.execute(text("SELECT SYS_EXTRACT_UTC(SYSTIMESTAMP) FROM DUAL")).scalar()
+        return connection.execute(select(func.current_timestamp())).scalar()
+
+
+class MonitorReplica:
+    def __init__(self, max_lag_s: float, check_s: float):
+        self.max_lag_s = max_lag_s
+        self.check_s = check_s
+        self.retraso_s: Optional[float] = None
+        self._medido = -math.inf
+        self._lock = threading.Lock()
+
+    @property
+    def configurada(self) -> bool:
+        return database.replica_engine is not None
+
+    def disponible(self) -> bool:
+        """True si la réplica responde y su retraso está dentro del límite."""
+        if not self.configurada:
+            return False
+        vencido = time.monotonic() - self._medido >= self.check_s
+        # Una sola request mide; las demás usan el último valor
+        if vencido and self._lock.acquire(blocking=False):
+            try:
+                self._medir()
+            finally:
+                self._lock.release()
+        return self.retraso_s is not None and self.retraso_s <= self.max_lag_s
+
+    def marcar_caida(self) -> None:
+        self.retraso_s = None
+        self._medido = time.monotonic()
+
+    def _medir(self) -> None:
+        try:
+            # Primero la réplica: la hora del primario leída después solo puede sobrestimar el retraso
+            latido = _ultimo_latido(database.replica_engine)
+            ahora = _hora_utc(database.engine)
+            if latido is None:
+                self.retraso_s = math.inf
+            else:
+                self.retraso_s = max((ahora - latido).total_seconds(), 0.0)
+            if self.retraso_s > self.max_lag_s:
+                logger.warning("Réplica con %.1fs de retraso; lecturas al primario", self.retraso_s)
+        except Exception as error:
+            logger.warning("Réplica no disponible: %s", error)
+            self.retraso_s = None
+        self._medido = time.monotonic()
+
+
+monitor_replica = MonitorReplica(DB_REPLICA_MAX_LAG_S, DB_REPLICA_CHECK_S)
+
+
+def _firmante() -> URLSafeSerializer:
+    # Salt propio: un JWT de sesión u otra firma de la app no sirven como marca
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt="leer-primario")
+
+
+def marca_de_escritura(id_usuario) -> Optional[str]:
+    """Marca para X-Leer-Primario: el usuario leerá del primario hasta que la
+    réplica tenga su escritura. None si no hay réplica."""
+    if not monitor_replica.configurada or id_usuario is None:
+        return None
+    ventana = max(DB_REPLICA_STICKY_S, (monitor_replica.retraso_s or 0.0) + 1)
+    return _firmante().dumps({"u": id_usuario, "hasta": time.time() + ventana})
+
+
+def leer_del_primario(id_usuario, marca: Optional[str]) -> bool:
+    """True si la marca es válida, del mismo usuario y no venció."""
+    if id_usuario is None or not marca:
+        return False
+    try:
+        datos = _firmante().loads(marca)
+    except BadSignature:
+        return False
+    return isinstance(datos, dict) and datos.get("u") == id_usuario and time.time() < datos.get("hasta", 0)
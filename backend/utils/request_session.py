@@ -0,0 +1,212 @@
+"""Sesión de base de datos compartida por toda la request.
+
+Los controllers usan ``db_session``, un proxy que crea la sesión de la
+request (guardada en ``flask.g``) la primera vez que un repositorio la usa;
+la conexión del pool se toma recién con la primera consulta. ``api_route``
+confirma o revierte al terminar el endpoint y ``teardown_request`` cierra lo
+que quede abierto, de modo que una request que falla en la validación nunca
+toca el pool.
+
+Los GET marcados con ``replica_read`` usan la réplica de lectura si está
+configurada, al día y la request no trae una marca X-Leer-Primario vigente de
+una escritura reciente del usuario (ver utils/replica.py);
+si la réplica falla a mitad de la request se repite una vez en el primario.
+Con el circuito de utils/health.py abierto, la sesión del primario no se
+crea y la request responde 503 sin esperar al pool.
+
+Por request se cuentan las consultas ejecutadas, su duración, las filas y
+el tiempo que la sesión retuvo una conexión (ver utils/sql_instrumentation.py);
+se devuelven en las cabeceras X-DB-Queries, X-DB-Query-Ms, X-DB-Rows,
+X-DB-Hold-Ms y X-DB-Route, más X-DB-N-Mas-1 si alguna sentencia se repitió
+demasiado y X-DB-Detalle (huellas con tiempos) en modo debug.
+"""
+import json
+import logging
+import math
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+import config.database as database
+from cache import ttl_maximo
+from config.database import CONFLICT_RETRIES, DB_REPLICA_MAX_LAG_S
+from config.settings import SQL_CABECERA_DETALLE
+from utils.health import sonda
+from utils.metrics import SQL_N_MAS_1, SQL_POR_REQUEST
+from utils.replica import CABECERA_ADHERENCIA, leer_del_primario, marca_de_escritura, monitor_replica
+from utils.sql_instrumentation import ESTADISTICAS, detalle, nuevas_estadisticas, revisar_request
+
+logger = logging.getLogger(__name__)
+
+_METODOS_SEGUROS = {"GET", "HEAD", "OPTIONS"}
+
+
+class _RequestSessionProxy:
+    """Delegación perezosa a la sesión de la request actual."""
+
+    def __getattr__(self, name):
+        return getattr(get_request_session(), name)
+
+    def __repr__(self):
+        return "<db_session de la request actual>"
+
+
+db_session = _RequestSessionProxy()
+
+
+def get_request_session() -> Session:
+    """Devuelve la sesión de la request, creándola en el primer uso."""
+    if not has_request_context():
+        raise RuntimeError("db_session solo está disponible dentro de una request")
+    session = g.get("db_session")
+    if session is None:
+        if not g.get("db_replica"):
+            sonda.verificar()
+        fabrica = database.ReplicaSessionLocal if g.get("db_replica") else database.SessionLocal
+        session = fabrica()
+        session.info[ESTADISTICAS] = g.db_stats = nuevas_estadisticas()
+        g.db_session = session
+    return session
+
+
+def _id_usuario():
+    user = getattr(request, "user", None)
+    return user.get("user_id") if user else None
+
+
+def commit_request_session() -> None:
+    session = g.get("db_session")
+    if session is None:
+        return
+    session.commit()
+    if request.method not in _METODOS_SEGUROS:
+        g.marca_primario = marca_de_escritura(_id_usuario())
+
+
+def rollback_request_session() -> None:
+    session = g.get("db_session")
+    if session is not None:
+        session.rollback()
+
+
+def close_request_session(error=None) -> None:
+    """teardown_request: revierte lo no confirmado y devuelve la conexión.
+
+    Las sub-requests de un lote no cierran la sesión compartida.
+    """
+    if g.get("lote"):
+        return
+    session = g.pop("db_session", None)
+    if session is not None:
+        session.close()
+
+
+def replica_read(fn):
+    """Permite que un GET lea de la réplica cuando es seguro hacerlo."""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if (
+            request.method not in _METODOS_SEGUROS
+            or not monitor_replica.configurada
+            or leer_del_primario(_id_usuario(), request.headers.get(CABECERA_ADHERENCIA))
+            or not monitor_replica.disponible()
+        ):
+            return fn(*args, **kwargs)
+
+        g.db_replica = True
+        try:
+            with ttl_maximo(max(1, math.ceil(DB_REPLICA_MAX_LAG_S))):
+                return fn(*args, **kwargs)
+        except DBAPIError as error:
+            logger.warning("Réplica falló en %s, se repite en el primario: %s", request.path, error)
+            monitor_replica.marcar_caida()
+            close_request_session()
+            g.db_replica = False
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def run_in_request_session(operation, retries: int = CONFLICT_RETRIES):
+    """Como run_in_session, pero sobre la sesión de la request.
+
+    Cada intento confirma su propia transacción; ante un conflicto de
+    versión se revierte y operation(session) vuelve a leer y recalcular.
+    """
+    for attempt in range(1, max(retries, 1) + 1):
+        session = get_request_session()
+        try:
+            result = operation(session)
+            session.commit()
+            return result
+        except StaleDataError:
+            session.rollback()
+            if attempt >= retries:
+                raise
+
+
+def _detalle_pedido() -> bool:
+    if SQL_CABECERA_DETALLE:
+        return True
+    user = getattr(request, "user", None)
+    return bool(request.headers.get("X-Debug-SQL")) and bool(user) and user.get("rol") == "BIBLIOTECARIO"
+
+
+def db_stats_headers(response):
+    """after_request: publica las métricas de base de datos de la request."""
+    stats = g.get("db_stats") or nuevas_estadisticas()
+    response.headers["X-DB-Queries"] = str(stats["consultas"])
+    response.headers["X-DB-Query-Ms"] = f"{stats['duracion_s'] * 1000:.1f}"
+    response.headers["X-DB-Rows"] = str(stats["filas"])
+    response.headers["X-DB-Hold-Ms"] = f"{stats['retencion_s'] * 1000:.1f}"
+    response.headers["X-DB-Route"] = "replica" if g.get("db_replica") else "primario"
+    if g.get("marca_primario"):
+        response.headers[CABECERA_ADHERENCIA] = g.marca_primario
+
+    regla = request.url_rule
+    if regla is not None:
+        SQL_POR_REQUEST.observar(stats["consultas"], regla.rule)
+    if stats["huellas"]:
+        sospechosas = revisar_request(stats)
+        if sospechosas:
+            SQL_N_MAS_1.inc(regla.rule if regla is not None else "<sin_ruta>")
+            response.headers["X-DB-N-Mas-1"] = str(len(sospechosas))
+        if _detalle_pedido():
+            response.headers["X-DB-Detalle"] = json.dumps(detalle(stats))
+    return response
+
+
+def init_app(app) -> None:
+    app.after_request(db_stats_headers)
+    app.teardown_request(close_request_session)
+
+
+@event.listens_for(Session, "after_begin")
+def _conexion_tomada(session, transaction, connection):
+    stats = session.info.get(ESTADISTICAS)
+    if stats is None or stats["desde"] is not None:
+        return
+    stats["desde"] = time.perf_counter()
+    # Se guarda el dict info (sobrevive al cierre del Connection) para
+    # desvincular las estadísticas cuando la conexión vuelva al pool
+    stats["info_conexion"] = connection.info
+    connection.info[ESTADISTICAS] = stats
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _conexion_liberada(session, transaction):
+    if transaction.parent is not None:
+        return
+    stats = session.info.get(ESTADISTICAS)
+    if stats is None or stats["desde"] is None:
+        return
+    stats["retencion_s"] += time.perf_counter() - stats["desde"]
+    stats["desde"] = None
+    stats["info_conexion"].pop(ESTADISTICAS, None)
+    stats["info_conexion"] = None
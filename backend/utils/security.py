@@ -1,26 +1,45 @@
 import bcrypt
 import jwt
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from functools import wraps
+from typing import List
 from flask import request, jsonify
 
+from utils.metrics import medir_bcrypt
+
 SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
 JWT_EXPIRATION_HOURS = 24
 
 def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
     salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    with medir_bcrypt('hash'):
+        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+# Un solo lote de hashes a la vez por proceso: cada uno ya usa todos los núcleos
+_lote_lock = threading.Lock()
+
+def hash_passwords(passwords: List[str], hilos: int) -> List[str]:
+    """Hash many passwords in parallel threads (bcrypt releases the GIL)"""
+    if hilos <= 1 or len(passwords) < 2:
+        return [hash_password(password) for password in passwords]
+    with _lote_lock, ThreadPoolExecutor(
+        max_workers=min(hilos, len(passwords)), thread_name_prefix="bcrypt"
+    ) as pool:
+        return list(pool.map(hash_password, passwords))
+
 def verify_password(password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
     try:
-        return bcrypt.checkpw(
-            password.encode('utf-8'),
-            hashed_password.encode('utf-8')
-        )
+        with medir_bcrypt('verificar'):
+            return bcrypt.checkpw(
+                password.encode('utf-8'),
+                hashed_password.encode('utf-8')
+            )
     except Exception:
         return False
 
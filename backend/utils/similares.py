@@ -0,0 +1,262 @@
+"""Libros parecidos por préstamos en común ("quienes pidieron este libro también pidieron").
+
+construir_similares.py lee PRESTAMOS por lotes y arma la matriz binaria
+usuario×libro X (un usuario que pidió dos veces el mismo libro cuenta una).
+De ella guarda en SIMILARES_DIR:
+
+- ``coocurrencias.npz``: C = XᵀX (libro×libro, dispersa): C[i, j] es cuántos
+  usuarios pidieron los dos libros y la diagonal cuántos pidieron cada uno;
+  con el id de libro de cada fila y el último id_prestamo contado. Es el
+  estado de la actualización incremental: los préstamos nuevos solo tocan
+  las filas de X de sus usuarios, y C se corrige con la diferencia de XᵀX
+  de esas filas antes y después, sin releer el historial.
+- ``similares.npy``: por cada libro (ordenado por id) sus SIMILARES_K vecinos
+  con más coseno C[i, j] / sqrt(C[i, i]·C[j, j]) y al menos
+  SIMILARES_MIN_COMUNES usuarios en común. El backend lo abre con mmap: una
+  consulta es una búsqueda binaria que lee unas pocas páginas del archivo,
+  compartidas entre los workers por el page cache.
+
+Los dos se escriben en un temporal y se reemplazan con ``os.replace``: el
+backend ve el archivo anterior o el nuevo, nunca uno a medio escribir.
+NumPy llega con pandas; SciPy solo hace falta para construir.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from config.settings import SIMILARES_DIR, SIMILARES_K, SIMILARES_MIN_COMUNES
+from services.exceptions import UnavailableError
+
+logger = logging.getLogger(__name__)
+
+ESTADO = "coocurrencias.npz"
+VECINOS = "similares.npy"
+REVISION_S = 5.0
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Las recomendaciones requieren el paquete 'numpy' (pip install numpy)")
+    return numpy
+
+
+def _sparse():
+    try:
+        from scipy import sparse
+    except ImportError:
+        raise RuntimeError("Construir las recomendaciones requiere el paquete 'scipy' (pip install scipy)")
+    return sparse
+
+
+def _reemplazar(ruta: str, escribir) -> None:
+    """Escribe con ``escribir(archivo)`` en un temporal y lo mueve a ``ruta``."""
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with open(temporal, "wb") as archivo:
+            escribir(archivo)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def _pares(lotes_pares: Iterable[Sequence[Tuple[int, int]]]):
+    """(usuarios, libros) como arreglos a partir de lotes de pares (id_usuario, id_libro)."""
+    np = _numpy()
+    usuarios, libros = [], []
+    for lote in lotes_pares:
+        if len(lote):
+            arreglo = np.asarray(lote, dtype=np.int64).reshape(-1, 2)
+            usuarios.append(arreglo[:, 0])
+            libros.append(arreglo[:, 1])
+    if not usuarios:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(usuarios), np.concatenate(libros)
+
+
+def _matriz_usuarios(filas, columnas, forma):
+    """Matriz binaria usuario×libro (los pares repetidos valen 1)."""
+    np, sparse = _numpy(), _sparse()
+    matriz = sparse.csr_matrix((np.ones(len(filas), dtype=np.int32), (filas, columnas)), shape=forma)
+    matriz.data[:] = 1
+    return matriz
+
+
+class Coocurrencias:
+    """C = XᵀX con el id de libro de cada fila y el último préstamo contado."""
+
+    def __init__(self, matriz, libros, ultimo_prestamo: int):
+        self.matriz = matriz
+        self.libros = libros
+        self.ultimo_prestamo = ultimo_prestamo
+
+    @classmethod
+    def construir(cls, lotes_pares: Iterable[Sequence[Tuple[int, int]]], ultimo_prestamo: int) -> "Coocurrencias":
+        """Desde cero, con todos los pares (id_usuario, id_libro) del historial."""
+        np = _numpy()
+        usuarios, libros = _pares(lotes_pares)
+        _, filas = np.unique(usuarios, return_inverse=True)
+        ids_libro, columnas = np.unique(libros, return_inverse=True)
+        x = _matriz_usuarios(filas, columnas, (filas.max(initial=-1) + 1, len(ids_libro)))
+        return cls((x.T @ x).tocsr(), ids_libro, ultimo_prestamo)
+
+    def _ampliar(self, ids_libro) -> None:
+        """Agrega filas y columnas vacías para los libros que aún no estaban."""
+        np, sparse = _numpy(), _sparse()
+        libros = np.union1d(self.libros, ids_libro)
+        if len(libros) == len(self.libros):
+            return
+        posicion = np.searchsorted(libros, self.libros)
+        actual = self.matriz.tocoo()
+        self.matriz = sparse.csr_matrix(
+            (actual.data, (posicion[actual.row], posicion[actual.col])), shape=(len(libros), len(libros))
+        )
+        self.libros = libros
+
+    def aplicar(self, previos, nuevos, ultimo_prestamo: int) -> None:
+        """Suma los préstamos nuevos.
+
+        ``previos`` son los pares ya contados de los usuarios con préstamos
+        nuevos (id_prestamo <= ultimo_prestamo anterior) y ``nuevos`` los pares
+        de los préstamos posteriores; C cambia en X_despuésᵀX_después −
+        X_antesᵀX_antes de esos usuarios.
+        """
+        np = _numpy()
+        usuarios_previos, libros_previos = _pares([previos])
+        usuarios_nuevos, libros_nuevos = _pares([nuevos])
+        self._ampliar(libros_nuevos)
+
+        _, filas = np.unique(np.concatenate([usuarios_previos, usuarios_nuevos]), return_inverse=True)
+        columnas = np.searchsorted(self.libros, np.concatenate([libros_previos, libros_nuevos]))
+        forma = (filas.max(initial=-1) + 1, len(self.libros))
+        antes = _matriz_usuarios(filas[:len(usuarios_previos)], columnas[:len(usuarios_previos)], forma)
+        despues = _matriz_usuarios(filas, columnas, forma)
+
+        self.matriz = (self.matriz + (despues.T @ despues) - (antes.T @ antes)).tocsr()
+        self.matriz.eliminate_zeros()
+        self.ultimo_prestamo = ultimo_prestamo
+
+    def vecinos(self, k: int = SIMILARES_K, min_comunes: int = SIMILARES_MIN_COMUNES):
+        """Tabla de similares.npy: k vecinos por libro, por coseno descendente."""
+        np = _numpy()
+        n = len(self.libros)
+        tipo = np.dtype([
+            ("id_libro", "<i8"),
+            ("vecinos", "<i8", (k,)),
+            ("puntajes", "<f4", (k,)),
+            ("comunes", "<i4", (k,)),
+        ])
+        tabla = np.zeros(n, dtype=tipo)
+        tabla["id_libro"] = self.libros
+
+        lectores = self.matriz.diagonal().astype(np.float64)
+        pares = self.matriz.tocoo()
+        validos = (pares.row != pares.col) & (pares.data >= min_comunes)
+        filas, columnas, comunes = pares.row[validos], pares.col[validos], pares.data[validos]
+        puntajes = comunes / np.sqrt(lectores[filas] * lectores[columnas])
+        orden = np.lexsort((-puntajes, filas))
+        filas, columnas, comunes, puntajes = filas[orden], columnas[orden], comunes[orden], puntajes[orden]
+
+        # Dentro de cada fila ya están por puntaje descendente: se toman los k primeros
+        inicio = np.searchsorted(filas, np.arange(n))
+        rango = np.arange(len(filas)) - inicio[filas]
+        primeros = rango < k
+        filas, rango = filas[primeros], rango[primeros]
+        tabla["vecinos"][filas, rango] = self.libros[columnas[primeros]]
+        tabla["puntajes"][filas, rango] = puntajes[primeros]
+        tabla["comunes"][filas, rango] = comunes[primeros]
+        return tabla
+
+    def guardar(self, directorio: str = SIMILARES_DIR) -> None:
+        np = _numpy()
+        matriz = self.matriz.tocsr()
+        _reemplazar(
+            os.path.join(directorio, ESTADO),
+            lambda archivo: np.savez(
+                archivo,
+                data=matriz.data,
+                indices=matriz.indices,
+                indptr=matriz.indptr,
+                libros=self.libros,
+                ultimo_prestamo=np.int64(self.ultimo_prestamo),
+            ),
+        )
+
+    @classmethod
+    def cargar(cls, directorio: str = SIMILARES_DIR) -> Optional["Coocurrencias"]:
+        np, sparse = _numpy(), _sparse()
+        try:
+            with np.load(os.path.join(directorio, ESTADO)) as datos:
+                n = len(datos["libros"])
+                matriz = sparse.csr_matrix((datos["data"], datos["indices"], datos["indptr"]), shape=(n, n))
+                return cls(matriz, datos["libros"], int(datos["ultimo_prestamo"]))
+        except FileNotFoundError:
+            return None
+
+
+def publicar(tabla, directorio: str = SIMILARES_DIR) -> None:
+    np = _numpy()
+    _reemplazar(os.path.join(directorio, VECINOS), lambda archivo: np.save(archivo, tabla))
+
+
+class LectorSimilares:
+    """similares.npy abierto con mmap; se reabre cuando el constructor lo reemplaza."""
+
+    def __init__(self, ruta: str, revision_s: float = REVISION_S):
+        self.ruta = ruta
+        self.revision_s = revision_s
+        self.generado: Optional[datetime] = None
+        self._tabla = None
+        self._firma = None
+        self._proxima_revision = 0.0
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        if time.monotonic() < self._proxima_revision:
+            return self._tabla
+        try:
+            np = _numpy()
+        except RuntimeError as error:
+            raise UnavailableError(f"Recomendaciones no disponibles: {error}")
+        with self._lock:
+            if time.monotonic() < self._proxima_revision:
+                return self._tabla
+            self._proxima_revision = time.monotonic() + self.revision_s
+            try:
+                estado = os.stat(self.ruta)
+            except FileNotFoundError:
+                self._tabla, self._firma, self.generado = None, None, None
+                return None
+            firma = (estado.st_ino, estado.st_mtime_ns)
+            if firma != self._firma:
+                # El mmap anterior sigue válido para quien lo esté leyendo: os.replace no lo trunca
+                self._tabla = np.load(self.ruta, mmap_mode="r")
+                self._firma = firma
+                self.generado = datetime.fromtimestamp(estado.st_mtime)
+                logger.info("Recomendaciones cargadas: %d libros", len(self._tabla))
+            return self._tabla
+
+    def vecinos(self, id_libro: int, limite: int) -> Optional[List[Tuple[int, float, int]]]:
+        """[(id_libro, puntaje, comunes)] del libro; None si todavía no se construyó."""
+        tabla = self._abrir()
+        if tabla is None:
+            return None
+        ids = tabla["id_libro"]
+        posicion = int(ids.searchsorted(id_libro))
+        if posicion == len(ids) or ids[posicion] != id_libro:
+            return []
+        fila = tabla[posicion]
+        return [
+            (int(vecino), float(puntaje), int(comunes))
+            for vecino, puntaje, comunes in zip(fila["vecinos"][:limite], fila["puntajes"], fila["comunes"])
+            if vecino
+        ]
+
+
+lector = LectorSimilares(os.path.join(SIMILARES_DIR, VECINOS))
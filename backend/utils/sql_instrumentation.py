@@ -0,0 +1,222 @@
+"""Instrumentación de las sentencias SQL de cada engine.
+
+``instrumentar(engine)`` (lo llama ``create_db_engine``) mide cada sentencia
+con before/after_cursor_execute y la agrupa por huella: el SQL con literales,
+binds y listas de IN reemplazados, de modo que ``WHERE id = :id_1`` con
+distintos valores cuenta como la misma consulta. Por sentencia se alimentan
+las métricas de /metrics y, si supera SQL_LENTA_MS, el log de consultas
+lentas (logger ``sql_lento``) con sus binds.
+
+Mientras una conexión pertenece a la sesión de una request, además se
+acumulan en las estadísticas de esa request (ver utils/request_session.py)
+la cantidad, duración y filas por huella; al final ``revisar_request``
+marca las huellas repetidas más de SQL_N_MAS_1_UMBRAL veces (N+1).
+"""
+import logging
+import re
+import time
+from typing import Dict, List
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.settings import SQL_LENTA_MS, SQL_N_MAS_1_UMBRAL
+from utils.metrics import SQL_DURACION, SQL_FILAS, SQL_LENTAS
+
+logger = logging.getLogger(__name__)
+logger_lento = logging.getLogger("sql_lento")
+
+# Clave en connection.info / session.info de las estadísticas de la request
+ESTADISTICAS = "estadisticas_db"
+_INICIOS = "sql_inicios"
+
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_BINDS = re.compile(r":\w+|%\(\w+\)s|%s|\?")
+_NUMEROS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+_SENSIBLES = ("password", "contrasena", "token", "hash")
+
+_huellas: Dict[str, str] = {}
+_MAX_HUELLAS = 4096
+_MAX_BINDS = 1000
+
+
+def nuevas_estadisticas() -> Dict:
+    return {
+        "consultas": 0,
+        "duracion_s": 0.0,
+        "filas": 0,
+        "huellas": {},
+        "ultima": None,
+        "retencion_s": 0.0,
+        "desde": None,
+        "info_conexion": None,
+    }
+
+
+def huella(statement: str) -> str:
+    """SQL normalizado; memorizado porque el ORM repite el mismo texto."""
+    resultado = _huellas.get(statement)
+    if resultado is None:
+        texto = _CADENAS.sub("?", statement)
+        texto = _BINDS.sub("?", texto)
+        texto = _NUMEROS.sub("?", texto)
+        texto = _LISTAS.sub("(...)", texto)
+        resultado = _ESPACIOS.sub(" ", texto).strip()
+        if len(_huellas) >= _MAX_HUELLAS:
+            _huellas.clear()
+        _huellas[statement] = resultado
+    return resultado
+
+
+def _operacion(texto: str) -> str:
+    verbo = texto[:6].upper()
+    if verbo.startswith(("SELECT", "WITH")):
+        return "select"
+    if verbo in ("INSERT", "UPDATE", "DELETE"):
+        return verbo.lower()
+    if verbo.startswith("MERGE"):
+        return "merge"
+    return "otro"
+
+
+def _nombres_posicionales(context):
+    compilado = getattr(context, "compiled", None)
+    return getattr(compilado, "positiontup", None) if compilado is not None else None
+
+
+def _ocultar(parametros, nombres=None):
+    """Reemplaza los binds con nombre sensible (password, token...) por ***."""
+    if nombres and isinstance(parametros, tuple) and len(nombres) == len(parametros):
+        parametros = dict(zip(nombres, parametros))
+    if isinstance(parametros, dict):
+        return {
+            clave: "***" if any(s in clave.lower() for s in _SENSIBLES) else valor
+            for clave, valor in parametros.items()
+        }
+    if isinstance(parametros, (list, tuple)) and parametros and isinstance(parametros[0], (dict, list, tuple)):
+        return [_ocultar(fila, nombres) for fila in parametros[:20]]
+    return parametros
+
+
+def _registrar_lenta(duracion, statement, parametros, context, executemany, operacion) -> None:
+    SQL_LENTAS.inc(operacion)
+    ruta = f"{request.method} {request.path}" if has_request_context() else "-"
+    binds = repr(_ocultar(parametros, _nombres_posicionales(context)))
+    if len(binds) > _MAX_BINDS:
+        binds = binds[:_MAX_BINDS] + "..."
+    sql = _ESPACIOS.sub(" ", statement).strip()
+    logger_lento.warning(
+        "%.1f ms en %s%s: %s | binds=%s",
+        duracion * 1000,
+        ruta,
+        " (executemany)" if executemany else "",
+        sql,
+        binds,
+        extra={"duracion_ms": round(duracion * 1000, 1), "sql": sql, "binds": binds},
+    )
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_INICIOS, []).append(time.perf_counter())
+    stats = conn.info.get(ESTADISTICAS)
+    if stats is not None:
+        stats["consultas"] += 1
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get(_INICIOS)
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+    texto = huella(statement)
+    operacion = _operacion(texto)
+    # En los SELECT rowcount no cuenta las filas leídas: las suma _contar_filas
+    filas = 0
+    if operacion != "select" and cursor.rowcount and cursor.rowcount > 0:
+        filas = cursor.rowcount
+        SQL_FILAS.inc(operacion, valor=filas)
+    SQL_DURACION.observar(duracion, operacion)
+
+    stats = conn.info.get(ESTADISTICAS)
+    if stats is not None:
+        stats["duracion_s"] += duracion
+        stats["filas"] += filas
+        entrada = stats["huellas"].get(texto)
+        if entrada is None:
+            entrada = stats["huellas"][texto] = [0, 0.0, 0]
+        entrada[0] += 1
+        entrada[1] += duracion
+        entrada[2] += filas
+        stats["ultima"] = entrada
+
+    if duracion * 1000 >= SQL_LENTA_MS:
+        _registrar_lenta(duracion, statement, parameters, context, executemany, operacion)
+
+
+def _error(contexto_excepcion):
+    conexion = contexto_excepcion.connection
+    if conexion is not None and conexion.info.get(_INICIOS):
+        conexion.info[_INICIOS].pop()
+
+
+def instrumentar(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _antes)
+    event.listen(engine, "after_cursor_execute", _despues)
+    event.listen(engine, "handle_error", _error)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _contar_filas(orm_execute_state):
+    """Cuenta las filas de los SELECT de la sesión de una request.
+
+    El resultado se materializa con freeze(); los SELECT en streaming
+    (yield_per/stream_results) se dejan pasar sin contar.
+    """
+    stats = orm_execute_state.session.info.get(ESTADISTICAS)
+    opciones = orm_execute_state.execution_options
+    if (
+        stats is None
+        or not orm_execute_state.is_select
+        or opciones.get("yield_per")
+        or opciones.get("stream_results")
+    ):
+        return None
+    stats["ultima"] = None
+    congelado = orm_execute_state.invoke_statement().freeze()
+    filas = len(congelado.data)
+    stats["filas"] += filas
+    if stats["ultima"] is not None:
+        stats["ultima"][2] += filas
+    SQL_FILAS.inc("select", valor=filas)
+    return congelado()
+
+
+def revisar_request(stats: Dict) -> List[Dict]:
+    """Huellas repetidas más de SQL_N_MAS_1_UMBRAL veces en la request."""
+    sospechosas = [
+        {"sql": texto, "veces": veces, "ms": round(segundos * 1000, 1), "filas": filas}
+        for texto, (veces, segundos, filas) in stats["huellas"].items()
+        if veces > SQL_N_MAS_1_UMBRAL
+    ]
+    for sospechosa in sospechosas:
+        logger.warning(
+            "Posible N+1 en %s %s: %d ejecuciones de %s",
+            request.method,
+            request.path,
+            sospechosa["veces"],
+            sospechosa["sql"],
+            extra={"n_mas_1": sospechosa},
+        )
+    return sospechosas
+
+
+def detalle(stats: Dict, limite: int = 10) -> List[Dict]:
+    """Huellas de la request ordenadas por tiempo total (cabecera de debug)."""
+    ordenadas = sorted(stats["huellas"].items(), key=lambda item: -item[1][1])
+    return [
+        {"sql": texto[:300], "veces": veces, "ms": round(segundos * 1000, 2), "filas": filas}
+        for texto, (veces, segundos, filas) in ordenadas[:limite]
+    ]
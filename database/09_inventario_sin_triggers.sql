@@ -0,0 +1,62 @@
+-- 09_inventario_sin_triggers.sql
+-- Contabilidad de copias desde la aplicación (INVENTARIO_MODO=APLICACION)
+--
+-- Los triggers de 03_triggers.sql ejecutan un UPDATE sobre LIBROS por cada
+-- fila de PRESTAMOS, lo que impide aprovechar inserciones y devoluciones por
+-- lote. En modo APLICACION, PrestamoService descuenta y repone las copias con
+-- un único UPDATE por lote dentro de la misma transacción del préstamo.
+--
+-- ORDEN DE DESPLIEGUE:
+--   1. Ejecutar la consulta de conciliación (sección 3) y corregir descuadres.
+--   2. Ejecutar este script.
+--   3. Reiniciar el backend con INVENTARIO_MODO=APLICACION.
+-- Entre los pasos 2 y 3 no deben registrarse préstamos ni devoluciones.
+
+-- ========================================
+-- 1. DESHABILITAR TRIGGERS DE INVENTARIO
+-- ========================================
+-- trg_validar_disponibilidad también se deshabilita: el UPDATE condicionado
+-- (copias_disponibles >= n) valida la disponibilidad en el mismo paso.
+ALTER TRIGGER trg_prestamo_insert DISABLE;
+ALTER TRIGGER trg_prestamo_devolucion DISABLE;
+ALTER TRIGGER trg_validar_disponibilidad DISABLE;
+
+-- ========================================
+-- 2. VISTA DE CONCILIACIÓN
+-- ========================================
+-- Un préstamo ACTIVO o VENCIDO ocupa una copia.
+CREATE OR REPLACE VIEW v_conciliacion_inventario AS
+SELECT
+    l.id_libro,
+    l.titulo,
+    l.numero_copias,
+    l.copias_disponibles,
+    NVL(p.prestados, 0) AS prestados,
+    l.numero_copias - NVL(p.prestados, 0) AS copias_esperadas
+FROM libros l
+LEFT JOIN (
+    SELECT id_libro, COUNT(*) AS prestados
+    FROM prestamos
+    WHERE estado IN ('ACTIVO', 'VENCIDO')
+    GROUP BY id_libro
+) p ON p.id_libro = l.id_libro;
+
+-- ========================================
+-- 3. CONSULTA DE CONCILIACIÓN
+-- ========================================
+-- Debe devolver cero filas. También disponible vía
+-- GET /api/libros/inventario/conciliacion
+SELECT *
+FROM v_conciliacion_inventario
+WHERE copias_disponibles != copias_esperadas
+ORDER BY id_libro;
+
+-- ========================================
+-- 4. REVERTIR (volver a INVENTARIO_MODO=TRIGGER)
+-- ========================================
+-- ALTER TRIGGER trg_prestamo_insert ENABLE;
+-- ALTER TRIGGER trg_prestamo_devolucion ENABLE;
+-- ALTER TRIGGER trg_validar_disponibilidad ENABLE;
+
+COMMIT;
+EXIT;
@@ -0,0 +1,60 @@
+-- 10_inventario_slots.sql
+-- Contador fragmentado de copias para libros con alta contención
+-- (INVENTARIO_FRAGMENTADO=true, requiere INVENTARIO_MODO=APLICACION y 09_inventario_sin_triggers.sql)
+--
+-- Cuando muchos préstamos simultáneos actualizan la misma fila de LIBROS,
+-- todos esperan su bloqueo. PrestamoService detecta esas esperas y reparte las
+-- copias del libro entre N filas de LIBROS_SLOTS; cada préstamo reserva un slot
+-- con SELECT ... FOR UPDATE SKIP LOCKED en lugar de esperar la fila del libro.
+--
+-- Copias disponibles de un libro = libros.copias_disponibles + SUM(libros_slots.copias_disponibles)
+
+-- ========================================
+-- 1. TABLA DE SLOTS
+-- ========================================
+CREATE TABLE libros_slots (
+    id_libro NUMBER NOT NULL,
+    slot NUMBER(3) NOT NULL,
+    copias_disponibles NUMBER DEFAULT 0 NOT NULL CHECK (copias_disponibles >= 0),
+    CONSTRAINT pk_libros_slots PRIMARY KEY (id_libro, slot),
+    CONSTRAINT fk_slot_libro FOREIGN KEY (id_libro) REFERENCES libros(id_libro) ON DELETE CASCADE
+) ORGANIZATION INDEX TABLESPACE PROYECTO_BD;
+
+-- ========================================
+-- 2. CONCILIACIÓN INCLUYENDO SLOTS
+-- ========================================
+-- Reemplaza la vista creada en 09_inventario_sin_triggers.sql
+CREATE OR REPLACE VIEW v_conciliacion_inventario AS
+SELECT
+    l.id_libro,
+    l.titulo,
+    l.numero_copias,
+    l.copias_disponibles + NVL(s.copias, 0) AS copias_disponibles,
+    NVL(p.prestados, 0) AS prestados,
+    l.numero_copias - NVL(p.prestados, 0) AS copias_esperadas
+FROM libros l
+LEFT JOIN (
+    SELECT id_libro, COUNT(*) AS prestados
+    FROM prestamos
+    WHERE estado IN ('ACTIVO', 'VENCIDO')
+    GROUP BY id_libro
+) p ON p.id_libro = l.id_libro
+LEFT JOIN (
+    SELECT id_libro, SUM(copias_disponibles) AS copias
+    FROM libros_slots
+    GROUP BY id_libro
+) s ON s.id_libro = l.id_libro;
+
+-- ========================================
+-- 3. REVERTIR (antes de desactivar INVENTARIO_FRAGMENTADO)
+-- ========================================
+-- Devuelve las copias de los slots a LIBROS y vacía la tabla:
+-- UPDATE libros l
+-- SET copias_disponibles = copias_disponibles + (
+--     SELECT SUM(s.copias_disponibles) FROM libros_slots s WHERE s.id_libro = l.id_libro
+-- )
+-- WHERE id_libro IN (SELECT id_libro FROM libros_slots);
+-- DELETE FROM libros_slots;
+
+COMMIT;
+EXIT;
@@ -0,0 +1,35 @@
+-- 11_control_concurrencia.sql
+-- Columna VERSION para control de concurrencia optimista en LIBROS y USUARIOS
+--
+-- El backend (SQLAlchemy version_id_col) agrega "AND version = :leida" a cada
+-- UPDATE y la incrementa; si otra transacción cambió la fila, el UPDATE no
+-- afecta filas y la API responde 409 en lugar de sobrescribir el cambio.
+
+-- ========================================
+-- 1. COLUMNAS DE VERSIÓN
+-- ========================================
+ALTER TABLE libros ADD (version NUMBER DEFAULT 1 NOT NULL);
+ALTER TABLE usuarios ADD (version NUMBER DEFAULT 1 NOT NULL);
+
+-- ========================================
+-- 2. VERSIÓN EN CAMBIOS DE INVENTARIO HECHOS POR TRIGGERS
+-- ========================================
+-- trg_prestamo_insert / trg_prestamo_devolucion (modo TRIGGER) actualizan
+-- copias_disponibles sin tocar la versión. Este trigger BEFORE la incrementa
+-- solo cuando la sentencia no nombra la columna VERSION, para que una edición
+-- concurrente del libro detecte el préstamo. El backend siempre la nombra:
+-- VERSION + 1 en préstamos y ajustes, VERSION = VERSION al mover copias entre
+-- la fila base y LIBROS_SLOTS (las copias visibles no cambian).
+-- En una base ya migrada, basta con volver a ejecutar este bloque.
+CREATE OR REPLACE TRIGGER trg_libros_version
+BEFORE UPDATE OF copias_disponibles ON libros
+FOR EACH ROW
+BEGIN
+    IF NOT UPDATING('VERSION') THEN
+        :NEW.version := :OLD.version + 1;
+    END IF;
+END;
+/
+
+COMMIT;
+EXIT;
@@ -0,0 +1,75 @@
+-- 12_bitacora_cambios.sql
+-- Bitácora de cambios de LIBROS, USUARIOS y PRESTAMOS
+--
+-- Cada worker del backend guarda una caché local de libros y usuarios. Con
+-- CACHE_BUS=sondeo un hilo por worker lee esta tabla por id creciente y
+-- elimina de su caché solo las claves afectadas por los cambios de otros
+-- workers o nodos. Con CACHE_BUS=cqn se usa Continuous Query Notification
+-- y esta tabla queda como respaldo si la suscripción falla.
+--
+-- Para CQN el usuario de la aplicación necesita (como SYSTEM):
+--   GRANT CHANGE NOTIFICATION TO biblioteca_user;
+
+-- ========================================
+-- 1. TABLA DE CAMBIOS
+-- ========================================
+CREATE TABLE cambios_entidades (
+    id_cambio NUMBER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    tabla VARCHAR2(30) NOT NULL,
+    operacion CHAR(1) NOT NULL CHECK (operacion IN ('I', 'U', 'D')),
+    id_registro NUMBER NOT NULL,
+    id_libro NUMBER,
+    estado VARCHAR2(20),
+    fecha TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL
+);
+
+-- El backend purga las filas más antiguas que CACHE_BUS_RETENCION_H
+CREATE INDEX idx_cambios_entidades_fecha ON cambios_entidades(fecha);
+
+-- ========================================
+-- 2. TRIGGERS DE REGISTRO
+-- ========================================
+CREATE OR REPLACE TRIGGER trg_libros_cambios
+AFTER INSERT OR UPDATE OR DELETE ON libros
+FOR EACH ROW
+BEGIN
+    INSERT INTO cambios_entidades (tabla, operacion, id_registro, id_libro)
+    VALUES (
+        'LIBROS',
+        CASE WHEN INSERTING THEN 'I' WHEN UPDATING THEN 'U' ELSE 'D' END,
+        COALESCE(:NEW.id_libro, :OLD.id_libro),
+        COALESCE(:NEW.id_libro, :OLD.id_libro)
+    );
+END;
+/
+
+CREATE OR REPLACE TRIGGER trg_usuarios_cambios
+AFTER INSERT OR UPDATE OR DELETE ON usuarios
+FOR EACH ROW
+BEGIN
+    INSERT INTO cambios_entidades (tabla, operacion, id_registro)
+    VALUES (
+        'USUARIOS',
+        CASE WHEN INSERTING THEN 'I' WHEN UPDATING THEN 'U' ELSE 'D' END,
+        COALESCE(:NEW.id_usuario, :OLD.id_usuario)
+    );
+END;
+/
+
+CREATE OR REPLACE TRIGGER trg_prestamos_cambios
+AFTER INSERT OR UPDATE OR DELETE ON prestamos
+FOR EACH ROW
+BEGIN
+    INSERT INTO cambios_entidades (tabla, operacion, id_registro, id_libro, estado)
+    VALUES (
+        'PRESTAMOS',
+        CASE WHEN INSERTING THEN 'I' WHEN UPDATING THEN 'U' ELSE 'D' END,
+        COALESCE(:NEW.id_prestamo, :OLD.id_prestamo),
+        COALESCE(:NEW.id_libro, :OLD.id_libro),
+        :NEW.estado
+    );
+END;
+/
+
+COMMIT;
+EXIT;
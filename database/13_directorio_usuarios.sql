@@ -0,0 +1,26 @@
+-- 13_directorio_usuarios.sql
+-- Índices del directorio de usuarios (GET /api/usuarios/)
+--
+-- El listado se pagina por cursor ordenando por UPPER(nombre), id_usuario (o
+-- LOWER(email), id_usuario cuando la búsqueda contiene '@'). Con estos índices
+-- de función cada página es un rango del índice, sin ordenar la tabla, y la
+-- búsqueda por prefijo (LIKE 'ABC%') usa el mismo rango. id_usuario va en el
+-- índice para desempatar nombres repetidos sin leer la tabla.
+
+-- ========================================
+-- 1. ÍNDICES DE FUNCIÓN
+-- ========================================
+CREATE INDEX idx_usuarios_nombre_upper ON usuarios(UPPER(nombre), id_usuario);
+CREATE INDEX idx_usuarios_email_lower ON usuarios(LOWER(email), id_usuario);
+
+-- ========================================
+-- 2. ESTADÍSTICAS
+-- ========================================
+-- El total sin filtros se estima con USER_TABLES.NUM_ROWS en lugar de COUNT(*)
+BEGIN
+    DBMS_STATS.GATHER_TABLE_STATS(ownname => USER, tabname => 'USUARIOS', cascade => TRUE);
+END;
+/
+
+COMMIT;
+EXIT;
@@ -0,0 +1,68 @@
+-- 14_auditoria.sql
+-- Auditoría de préstamos, libros y usuarios escrita por la aplicación
+--
+-- El backend registra quién hizo cada operación (el usuario del JWT, que un
+-- trigger no ve), desde qué ruta e IP y qué cambió. Cada evento se inserta
+-- en AUDITORIA_OUTBOX en la misma transacción que la operación, con un
+-- INSERT de array por commit; un hilo de cada worker los pasa por lotes a
+-- AUDITORIA_EVENTOS y los borra del outbox (ver backend/utils/auditoria.py).
+-- El outbox no tiene más índices que su clave y la fecha: es una cola corta.
+
+-- ========================================
+-- 1. OUTBOX
+-- ========================================
+CREATE TABLE auditoria_outbox (
+    id_evento VARCHAR2(32) PRIMARY KEY,
+    fecha TIMESTAMP NOT NULL,
+    accion VARCHAR2(30) NOT NULL,
+    entidad VARCHAR2(20) NOT NULL,
+    id_registro NUMBER,
+    id_actor NUMBER,
+    rol_actor VARCHAR2(20),
+    origen VARCHAR2(200),
+    ip VARCHAR2(45),
+    detalle CLOB CHECK (detalle IS JSON)
+);
+
+-- Barrido de los eventos que no pasaron por la cola en memoria
+CREATE INDEX idx_auditoria_outbox_fecha ON auditoria_outbox(fecha);
+
+-- ========================================
+-- 2. REGISTRO DE AUDITORÍA
+-- ========================================
+-- Sin claves foráneas: el registro sobrevive a la eliminación de la entidad
+CREATE TABLE auditoria_eventos (
+    id_evento VARCHAR2(32) PRIMARY KEY,
+    fecha TIMESTAMP NOT NULL,
+    accion VARCHAR2(30) NOT NULL,
+    entidad VARCHAR2(20) NOT NULL,
+    id_registro NUMBER,
+    id_actor NUMBER,
+    rol_actor VARCHAR2(20),
+    origen VARCHAR2(200),
+    ip VARCHAR2(45),
+    detalle CLOB CHECK (detalle IS JSON)
+);
+
+CREATE INDEX idx_auditoria_eventos_registro ON auditoria_eventos(entidad, id_registro, fecha);
+CREATE INDEX idx_auditoria_eventos_actor ON auditoria_eventos(id_actor, fecha);
+CREATE INDEX idx_auditoria_eventos_fecha ON auditoria_eventos(fecha);
+
+-- ========================================
+-- 3. TRIGGER ANTERIOR
+-- ========================================
+-- trg_auditoria_prestamos (08_mejoras_recomendadas.sql) escribía una fila por
+-- préstamo dentro de la transacción del usuario y sin saber quién operaba.
+-- AUDITORIA_PRESTAMOS se conserva como histórico.
+BEGIN
+    EXECUTE IMMEDIATE 'DROP TRIGGER trg_auditoria_prestamos';
+EXCEPTION
+    WHEN OTHERS THEN
+        IF SQLCODE != -4080 THEN  -- el trigger no existe
+            RAISE;
+        END IF;
+END;
+/
+
+COMMIT;
+EXIT;
@@ -0,0 +1,51 @@
+-- 15_reportes_circulacion.sql
+-- Rollups diarios de circulación para /api/reportes/circulacion
+--
+-- CIRCULACION_DIARIA guarda préstamos y devoluciones por día y por valor de
+-- cada dimensión (TOTAL, GENERO, EDITORIAL y COHORTE = mes de alta del
+-- usuario). Un hilo del backend la mantiene leyendo los cambios de PRESTAMOS
+-- de CAMBIOS_ENTIDADES (requiere 12_bitacora_cambios.sql) y un job nocturno
+-- recalcula los últimos días (ver backend/rollup_circulacion.py).
+--
+-- Después de ejecutar este script, cargar el historial una vez con:
+--   python rollup_circulacion.py --reconstruir
+
+-- ========================================
+-- 1. ROLLUP DIARIO
+-- ========================================
+-- La clave (dimension, dia, valor) es el índice de lectura de las series
+CREATE TABLE circulacion_diaria (
+    dimension VARCHAR2(10) NOT NULL,
+    dia DATE NOT NULL,
+    valor VARCHAR2(100) NOT NULL,
+    prestamos NUMBER DEFAULT 0 NOT NULL,
+    devoluciones NUMBER DEFAULT 0 NOT NULL,
+    devoluciones_tardias NUMBER DEFAULT 0 NOT NULL,
+    CONSTRAINT pk_circulacion_diaria PRIMARY KEY (dimension, dia, valor)
+) COMPRESS;
+
+-- Recalcular un día borra sus filas de todas las dimensiones
+CREATE INDEX idx_circulacion_dia ON circulacion_diaria(dia);
+
+-- ========================================
+-- 2. MARCA DE AVANCE
+-- ========================================
+-- Último id de CAMBIOS_ENTIDADES aplicado; la fila se bloquea mientras se
+-- actualiza para que un solo proceso escriba a la vez
+CREATE TABLE rollup_marcas (
+    nombre VARCHAR2(50) PRIMARY KEY,
+    ultimo_id NUMBER DEFAULT 0 NOT NULL,
+    actualizado TIMESTAMP
+);
+
+INSERT INTO rollup_marcas (nombre, ultimo_id, actualizado) VALUES ('circulacion', 0, NULL);
+
+-- ========================================
+-- 3. ÍNDICE PARA RECALCULAR DEVOLUCIONES
+-- ========================================
+-- Las devoluciones de un día se leen por fecha_devolucion_real
+-- (idx_prestamos_fecha de 08_mejoras_recomendadas.sql cubre los préstamos)
+CREATE INDEX idx_prestamos_devolucion_real ON prestamos(fecha_devolucion_real);
+
+COMMIT;
+EXIT;
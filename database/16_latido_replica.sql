@@ -0,0 +1,43 @@
+-- 16_latido_replica.sql
+-- Latido del primario para medir el retraso de la réplica de lectura
+--
+-- Un job del primario escribe cada segundo su hora UTC en la única fila de
+-- LATIDO_REPLICA. El backend lee esa fila en la réplica y la compara con la
+-- hora actual del primario: la diferencia es el retraso de la replicación,
+-- con un solo reloj (el del primario) y aunque no haya escrituras.
+--
+-- Ejecutar solo en el primario (la réplica recibe la tabla por la
+-- replicación). El usuario de la aplicación necesita (como SYSTEM):
+--   GRANT CREATE JOB TO biblioteca_user;
+
+-- ========================================
+-- 1. TABLA DEL LATIDO
+-- ========================================
+CREATE TABLE latido_replica (
+    id NUMBER PRIMARY KEY CHECK (id = 1),
+    fecha TIMESTAMP NOT NULL
+);
+
+INSERT INTO latido_replica (id, fecha) VALUES (1, SYS_EXTRACT_UTC(SYSTIMESTAMP));
+COMMIT;
+
+-- ========================================
+-- 2. JOB QUE ESCRIBE EL LATIDO
+-- ========================================
+BEGIN
+    DBMS_SCHEDULER.CREATE_JOB (
+        job_name        => 'JOB_LATIDO_REPLICA',
+        job_type        => 'PLSQL_BLOCK',
+        job_action      => 'BEGIN UPDATE latido_replica SET fecha = SYS_EXTRACT_UTC(SYSTIMESTAMP) WHERE id = 1; COMMIT; END;',
+        start_date      => SYSTIMESTAMP,
+        repeat_interval => 'FREQ=SECONDLY; INTERVAL=1',
+        enabled         => TRUE,
+        comments        => 'Latido para medir el retraso de la réplica de lectura'
+    );
+END;
+/
+
+-- Verificación: la fecha debe avanzar cada segundo
+SELECT fecha, SYS_EXTRACT_UTC(SYSTIMESTAMP) AS ahora FROM latido_replica;
+
+EXIT;
@@ -7,6 +7,17 @@ function getToken() {
     return user?.token || null;
 }
 
+// Marca firmada que devuelve el backend tras una escritura: mientras esté
+// vigente, reenviarla hace que las lecturas vayan al primario y no a la réplica
+const MARCA_PRIMARIO = 'X-Leer-Primario';
+
+function guardarMarcaPrimario(response) {
+    const marca = response.headers.get(MARCA_PRIMARIO);
+    if (marca) {
+        sessionStorage.setItem(MARCA_PRIMARIO, marca);
+    }
+}
+
 // Utilidad para obtener headers con autenticaci�n
 function getAuthHeaders() {
     const token = getToken();
@@ -18,12 +29,19 @@ function getAuthHeaders() {
         headers['Authorization'] = `Bearer ${token}`;
     }
 
+    const marca = sessionStorage.getItem(MARCA_PRIMARIO);
+    if (marca) {
+        headers[MARCA_PRIMARIO] = marca;
+    }
+
     return headers;
 }
 
 // Utilidad para manejar respuestas
 async function handleResponse(response) {
     if (response.status === 401) {
+        apiCache.clear();
+        sessionStorage.removeItem(MARCA_PRIMARIO);
         // Token inv�lido o expirado
         localStorage.removeItem('user');
         window.location.href = '/index.html';
@@ -39,6 +57,314 @@ async function handleResponse(response) {
     return data;
 }
 
+// Capa de datos del cliente: caché stale-while-revalidate por URL, una sola
+// request en curso por URL, revalidación con ETag (If-None-Match -> 304) y
+// cancelación de búsquedas reemplazadas. fetch y storage se inyectan para
+// poder usarla fuera del navegador (Node).
+function createApiCache({
+    fetchFn,
+    parse = (response) => response.json(),
+    storage = null,
+    freshMs = 10000,
+    maxStaleMs = 300000,
+    now = () => Date.now(),
+    prefix = 'api-cache:'
+} = {}) {
+    const entries = new Map();
+    const inFlight = new Map();
+    // Las respuestas pedidas antes de un clear() no se guardan
+    let generation = 0;
+
+    function read(key) {
+        if (entries.has(key)) {
+            return entries.get(key);
+        }
+        if (!storage) {
+            return null;
+        }
+        try {
+            const entry = JSON.parse(storage.getItem(prefix + key) || 'null');
+            if (entry) {
+                entries.set(key, entry);
+            }
+            return entry;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    function write(key, entry) {
+        entries.set(key, entry);
+        if (!storage) {
+            return;
+        }
+        try {
+            storage.setItem(prefix + key, JSON.stringify(entry));
+        } catch (error) {
+            // Cuota llena: la entrada queda solo en memoria
+        }
+    }
+
+    async function load(key, url, { headers = {}, signal } = {}) {
+        const startedIn = generation;
+        const entry = read(key);
+        const requestHeaders = { ...headers };
+        if (entry && entry.etag) {
+            requestHeaders['If-None-Match'] = entry.etag;
+        }
+
+        const response = await fetchFn(url, { headers: requestHeaders, signal });
+        if (response.status === 304 && entry) {
+            if (startedIn === generation) {
+                write(key, { ...entry, time: now() });
+            }
+            return { data: entry.data, changed: false };
+        }
+
+        const data = await parse(response);
+        if (startedIn === generation) {
+            write(key, { data, etag: response.headers.get('ETag'), time: now() });
+        }
+        return { data, changed: true };
+    }
+
+    function shared(key, url, options) {
+        if (inFlight.has(key)) {
+            return inFlight.get(key);
+        }
+        const promise = load(key, url, options).finally(() => {
+            if (inFlight.get(key) === promise) {
+                inFlight.delete(key);
+            }
+        });
+        inFlight.set(key, promise);
+        return promise;
+    }
+
+    // Devuelve los datos de url: frescos desde la caché; vencidos desde la
+    // caché mientras se revalidan (onUpdate recibe los nuevos si cambiaron);
+    // o desde la red, compartiendo la request si ya hay una en curso. Con
+    // signal la request es propia, para poder cancelarla sin afectar a otros.
+    function get(url, { headers, signal, onUpdate, key = url } = {}) {
+        const entry = read(key);
+        const age = entry ? now() - entry.time : Infinity;
+
+        if (age < freshMs) {
+            return Promise.resolve(entry.data);
+        }
+        if (age < maxStaleMs) {
+            shared(key, url, { headers })
+                .then(result => {
+                    if (result.changed && onUpdate) {
+                        onUpdate(result.data);
+                    }
+                })
+                .catch(() => {});
+            return Promise.resolve(entry.data);
+        }
+        const request = signal ? load(key, url, { headers, signal }) : shared(key, url, { headers });
+        return request.then(result => result.data);
+    }
+
+    function clear() {
+        generation += 1;
+        entries.clear();
+        inFlight.clear();
+        if (!storage) {
+            return;
+        }
+        try {
+            for (let i = storage.length - 1; i >= 0; i--) {
+                const storageKey = storage.key(i);
+                if (storageKey && storageKey.startsWith(prefix)) {
+                    storage.removeItem(storageKey);
+                }
+            }
+        } catch (error) {
+            // storage no disponible
+        }
+    }
+
+    return { get, clear };
+}
+
+// Devuelve una función que entrega un AbortSignal nuevo y cancela el anterior:
+// solo la última búsqueda llega a resolverse.
+function createLatest() {
+    let controller = null;
+    return () => {
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+        return controller.signal;
+    };
+}
+
+function isAbortError(error) {
+    return error && error.name === 'AbortError';
+}
+
+// Parser incremental de text/event-stream: recibe fragmentos de texto y llama
+// a onMessage({ id, event, data, retry }) al final de cada bloque.
+function createSSEParser(onMessage) {
+    let buffer = '';
+    let message = { data: [] };
+    return (chunk) => {
+        buffer += chunk;
+        const lines = buffer.split(/\r\n|\n|\r/);
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (line === '') {
+                onMessage({ ...message, data: message.data.join('\n') });
+                message = { data: [] };
+                continue;
+            }
+            if (line.startsWith(':')) {
+                continue; // keepalive
+            }
+            const separator = line.indexOf(':');
+            const field = separator === -1 ? line : line.slice(0, separator);
+            let value = separator === -1 ? '' : line.slice(separator + 1);
+            if (value.startsWith(' ')) {
+                value = value.slice(1);
+            }
+            if (field === 'data') {
+                message.data.push(value);
+            } else if (field === 'event' || field === 'id') {
+                message[field] = value;
+            } else if (field === 'retry' && /^\d+$/.test(value)) {
+                message.retry = parseInt(value, 10);
+            }
+        }
+    };
+}
+
+// Stream SSE leído con fetch (EventSource no permite enviar el token). Se
+// reconecta solo, con Last-Event-ID para recibir lo que se perdió y con espera
+// creciente si el servidor falla. handlers: { tipo: (datos) => ... }.
+function createEventStream({
+    url,
+    fetchFn,
+    headers = () => ({}),
+    handlers = {},
+    onEvent = () => {},
+    onReset = () => {},
+    onUnauthorized = () => {},
+    retryMs = 3000,
+    maxRetryMs = 60000,
+    sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms))
+}) {
+    let lastId = null;
+    let controller = null;
+    let running = false;
+    let delay = retryMs;
+
+    function dispatch(message) {
+        if (message.retry) {
+            retryMs = message.retry;
+        }
+        if (message.id) {
+            lastId = message.id;
+        }
+        if (!message.event || message.event === 'conectado') {
+            return;
+        }
+        onEvent(message.event);
+        if (message.event === 'reinicio') {
+            onReset();
+            return;
+        }
+        const handler = handlers[message.event];
+        if (handler) {
+            handler(message.data ? JSON.parse(message.data) : {});
+        }
+    }
+
+    async function run() {
+        while (running) {
+            controller = new AbortController();
+            try {
+                const requestHeaders = headers();
+                if (lastId !== null) {
+                    requestHeaders['Last-Event-ID'] = lastId;
+                }
+                const response = await fetchFn(url, { headers: requestHeaders, signal: controller.signal });
+                if (response.status === 401) {
+                    running = false;
+                    onUnauthorized();
+                    return;
+                }
+                if (!response.ok || !response.body) {
+                    throw new Error(`Feed de eventos: HTTP ${response.status}`);
+                }
+                delay = retryMs;
+                const parse = createSSEParser(dispatch);
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                for (;;) {
+                    const { done, value } = await reader.read();
+                    if (done) {
+                        break;
+                    }
+                    parse(decoder.decode(value, { stream: true }));
+                }
+                // Cierre normal (duración máxima del stream): se respeta el retry del servidor
+                delay = retryMs;
+            } catch (error) {
+                if (!running) {
+                    return;
+                }
+                delay = Math.min(delay * 2, maxRetryMs);
+            }
+            if (running) {
+                await sleep(delay);
+            }
+        }
+    }
+
+    return {
+        start() {
+            if (!running) {
+                running = true;
+                run();
+            }
+        },
+        stop() {
+            running = false;
+            if (controller) {
+                controller.abort();
+            }
+        }
+    };
+}
+
+const apiCache = createApiCache({
+    fetchFn: (url, options) => fetch(url, options),
+    parse: (response) => handleResponse(response),
+    storage: typeof sessionStorage !== 'undefined' ? sessionStorage : null
+});
+
+const nextSearchSignal = createLatest();
+
+// GET con caché; options: { onUpdate, signal }
+function cachedGet(path, options = {}) {
+    return apiCache.get(`${API_URL}${path}`, { ...options, headers: getAuthHeaders() });
+}
+
+// Escritura: cualquier cambio puede afectar listados, conteos y el dashboard
+async function send(path, method, body) {
+    const response = await fetch(`${API_URL}${path}`, {
+        method,
+        headers: getAuthHeaders(),
+        body: body === undefined ? undefined : JSON.stringify(body)
+    });
+    const data = await handleResponse(response);
+    guardarMarcaPrimario(response);
+    apiCache.clear();
+    return data;
+}
+
 // API de Autenticaci�n
 const authAPI = {
     login: async (email, password) => {
@@ -47,7 +373,10 @@ const authAPI = {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ email, password })
         });
-        return handleResponse(response);
+        const data = await handleResponse(response);
+        // Otro usuario en la misma pestaña no debe ver datos cacheados del anterior
+        apiCache.clear();
+        return data;
     },
 
     register: async (nombre, email, password, rol) => {
@@ -62,176 +391,132 @@ const authAPI = {
 
 // API de Libros
 const librosAPI = {
-    getAll: async (page = 1, perPage = 100) => {
-        const response = await fetch(`${API_URL}/libros/?page=${page}&per_page=${perPage}`, {
-            headers: getAuthHeaders()
-        });
-        const data = await handleResponse(response);
+    getAll: async (page = 1, perPage = 100, options = {}) => {
         // Si viene con metadata de paginación, retornar todo, sino solo los libros
-        return data.libros !== undefined ? data : { libros: data, total: data.length };
+        const normalize = (data) => data.libros !== undefined ? data : { libros: data, total: data.length };
+        const onUpdate = options.onUpdate && ((data) => options.onUpdate(normalize(data)));
+        const data = await cachedGet(`/libros/?page=${page}&per_page=${perPage}`, { ...options, onUpdate });
+        return normalize(data);
     },
 
-    getById: async (id) => {
-        const response = await fetch(`${API_URL}/libros/${id}`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getById: (id, options) => cachedGet(`/libros/${id}`, options),
 
-    getGeneros: async () => {
-        const response = await fetch(`${API_URL}/libros/generos`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getSimilares: (id, limite = 5, options) => cachedGet(`/libros/${id}/similares?limite=${limite}`, options),
 
-    search: async (params) => {
+    getGeneros: (options) => cachedGet('/libros/generos', options),
+
+    // Una búsqueda nueva cancela la anterior (rechaza con AbortError)
+    search: (params) => {
         const queryString = new URLSearchParams(params).toString();
-        const response = await fetch(`${API_URL}/libros/search?${queryString}`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
+        return cachedGet(`/libros/search?${queryString}`, { signal: nextSearchSignal() });
     },
 
-    create: async (libro) => {
-        const response = await fetch(`${API_URL}/libros/`, {
-            method: 'POST',
-            headers: getAuthHeaders(),
-            body: JSON.stringify(libro)
-        });
-        return handleResponse(response);
-    },
+    create: (libro) => send('/libros/', 'POST', libro),
 
-    update: async (id, libro) => {
-        const response = await fetch(`${API_URL}/libros/${id}`, {
-            method: 'PUT',
-            headers: getAuthHeaders(),
-            body: JSON.stringify(libro)
-        });
-        return handleResponse(response);
-    },
+    update: (id, libro) => send(`/libros/${id}`, 'PUT', libro),
 
-    delete: async (id) => {
-        const response = await fetch(`${API_URL}/libros/${id}`, {
-            method: 'DELETE',
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    delete: (id) => send(`/libros/${id}`, 'DELETE'),
 
-    getBajoStock: async () => {
-        const response = await fetch(`${API_URL}/libros/bajo-stock`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getBajoStock: (options) => cachedGet('/libros/bajo-stock', options),
 
-    getEstadisticas: async () => {
-        const response = await fetch(`${API_URL}/libros/estadisticas`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    }
+    getEstadisticas: (options) => cachedGet('/libros/estadisticas', options)
 };
 
 // API de Pr�stamos
 const prestamosAPI = {
-    getAll: async () => {
-        const response = await fetch(`${API_URL}/prestamos/`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getAll: (options) => cachedGet('/prestamos/', options),
 
-    getActivos: async () => {
-        const response = await fetch(`${API_URL}/prestamos/activos`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getActivos: (options) => cachedGet('/prestamos/activos', options),
 
-    getVencidos: async () => {
-        const response = await fetch(`${API_URL}/prestamos/vencidos`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getVencidos: (options) => cachedGet('/prestamos/vencidos', options),
 
-    getByUsuario: async (idUsuario) => {
-        const response = await fetch(`${API_URL}/prestamos/usuario/${idUsuario}`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getByUsuario: (idUsuario, options) => cachedGet(`/prestamos/usuario/${idUsuario}`, options),
+
+    create: (prestamo) => send('/prestamos/', 'POST', prestamo),
 
-    create: async (prestamo) => {
-        const response = await fetch(`${API_URL}/prestamos/`, {
+    devolver: (id) => send(`/prestamos/${id}/devolver`, 'PUT')
+};
+
+// API del Dashboard: todos los widgets del rol del usuario en una sola request
+const dashboardAPI = {
+    get: (options) => cachedGet('/dashboard/', options)
+};
+
+// API de lotes: varias consultas GET en una sola request.
+// Recibe [{ path: '/api/...' }, ...] y devuelve los cuerpos en el mismo orden;
+// si alguna falla, lanza su error.
+const batchAPI = {
+    run: async (solicitudes) => {
+        const response = await fetch(`${API_URL}/batch`, {
             method: 'POST',
             headers: getAuthHeaders(),
-            body: JSON.stringify(prestamo)
+            body: JSON.stringify({ solicitudes })
         });
-        return handleResponse(response);
-    },
+        const data = await handleResponse(response);
+        return data.respuestas.map(respuesta => {
+            if (respuesta.status >= 400) {
+                throw new Error(respuesta.body?.error || 'Error en la solicitud');
+            }
+            return respuesta.body;
+        });
+    }
+};
 
-    devolver: async (id) => {
-        const response = await fetch(`${API_URL}/prestamos/${id}/devolver`, {
-            method: 'PUT',
-            headers: getAuthHeaders()
+// Cambios en vivo (GET /api/events). Cada evento invalida la caché local antes
+// de llegar a la página; reinicio indica que se perdieron eventos y hay que recargar.
+const eventsAPI = {
+    connect: (handlers, onReset) => {
+        const stream = createEventStream({
+            url: `${API_URL}/events`,
+            fetchFn: (url, options) => fetch(url, options),
+            headers: () => ({ 'Authorization': `Bearer ${getToken()}` }),
+            handlers,
+            onEvent: () => apiCache.clear(),
+            onReset,
+            onUnauthorized: () => auth.logout()
         });
-        return handleResponse(response);
+        stream.start();
+        window.addEventListener('pagehide', () => stream.stop());
+        return stream;
     }
 };
 
 // API de Usuarios
 const usuariosAPI = {
-    getAll: async () => {
-        const response = await fetch(`${API_URL}/usuarios/`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
+    // Una página del directorio: params { q, campo, rol, activo, cursor, limite }.
+    // Devuelve { usuarios, siguiente, total_estimado, total_exacto }; una página
+    // nueva cancela la anterior si sigue en curso
+    getPage: (params = {}) => {
+        const definidos = Object.fromEntries(Object.entries(params).filter(([, valor]) => valor));
+        const queryString = new URLSearchParams(definidos).toString();
+        return cachedGet(`/usuarios/?${queryString}`, { signal: nextSearchSignal() });
     },
 
-    getById: async (id) => {
-        const response = await fetch(`${API_URL}/usuarios/${id}`, {
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    },
+    getById: (id, options) => cachedGet(`/usuarios/${id}`, options),
 
-    createAdmin: async (userData) => {
-        const response = await fetch(`${API_URL}/usuarios/admin`, {
-            method: 'POST',
-            headers: getAuthHeaders(),
-            body: JSON.stringify(userData)
-        });
-        return handleResponse(response);
-    },
+    createAdmin: (userData) => send('/usuarios/admin', 'POST', userData),
 
-    update: async (id, userData) => {
-        const response = await fetch(`${API_URL}/usuarios/${id}`, {
-            method: 'PUT',
-            headers: getAuthHeaders(),
-            body: JSON.stringify(userData)
-        });
-        return handleResponse(response);
-    },
+    update: (id, userData) => send(`/usuarios/${id}`, 'PUT', userData),
 
-    toggleEstado: async (id, nuevoEstado) => {
-        const response = await fetch(`${API_URL}/usuarios/${id}/estado`, {
-            method: 'PATCH',
-            headers: getAuthHeaders(),
-            body: JSON.stringify({ activo: nuevoEstado })
-        });
-        return handleResponse(response);
+    toggleEstado: (id, nuevoEstado) => send(`/usuarios/${id}/estado`, 'PATCH', { activo: nuevoEstado }),
+
+    // Activa o desactiva varios usuarios en una sola request
+    cambiarEstado: (ids, activo) => send('/usuarios/estado', 'PATCH', { ids, activo }),
+
+    // Alta masiva desde un archivo CSV o JSONL; el navegador arma el multipart
+    importar: async (archivo) => {
+        const formData = new FormData();
+        formData.append('archivo', archivo);
+        const headers = getAuthHeaders();
+        delete headers['Content-Type'];
+        const response = await fetch(`${API_URL}/usuarios/importar`, { method: 'POST', headers, body: formData });
+        const data = await handleResponse(response);
+        guardarMarcaPrimario(response);
+        apiCache.clear();
+        return data;
     },
 
-    delete: async (id) => {
-        const response = await fetch(`${API_URL}/usuarios/${id}`, {
-            method: 'DELETE',
-            headers: getAuthHeaders()
-        });
-        return handleResponse(response);
-    }
+    delete: (id) => send(`/usuarios/${id}`, 'DELETE')
 };
 
 // Utilidades de autenticaci�n
@@ -245,6 +530,8 @@ const auth = {
     },
 
     logout: () => {
+        apiCache.clear();
+        sessionStorage.removeItem(MARCA_PRIMARIO);
         localStorage.removeItem('user');
         window.location.href = '/index.html';
     },
@@ -264,3 +551,8 @@ const auth = {
         return auth.hasRole('BIBLIOTECARIO');
     }
 };
+
+// Exportación para las pruebas en Node; en el navegador no hay module
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { createApiCache, createLatest, isAbortError, createSSEParser, createEventStream };
+}
@@ -0,0 +1,225 @@
+// Pruebas de la capa de datos del cliente (caché SWR, deduplicación, ETag y
+// cancelación de búsquedas). Ejecutar con: node --test frontend/js/
+const test = require('node:test');
+const assert = require('node:assert/strict');
+
+const { createApiCache, createLatest, isAbortError } = require('./api.js');
+
+// Respuesta mínima compatible con lo que usa createApiCache
+function respuesta(status, body, etag = null) {
+    return {
+        status,
+        headers: { get: (nombre) => (nombre === 'ETag' ? etag : null) },
+        json: async () => body
+    };
+}
+
+// fetch falso: registra las llamadas y responde con lo que devuelva responder()
+function fetchFalso(responder) {
+    const llamadas = [];
+    const fetchFn = (url, options = {}) => {
+        llamadas.push({ url, options });
+        return Promise.resolve(responder(url, options, llamadas.length));
+    };
+    return { fetchFn, llamadas };
+}
+
+// Promesa que se resuelve desde afuera, para dejar una request "en curso"
+function diferida() {
+    let resolve;
+    const promise = new Promise(r => { resolve = r; });
+    return { promise, resolve };
+}
+
+function reloj(inicio = 0) {
+    let actual = inicio;
+    return { now: () => actual, avanzar: (ms) => { actual += ms; } };
+}
+
+const esperarMicrotareas = () => new Promise(resolve => setImmediate(resolve));
+
+test('SWR: sirve fresco desde la caché sin ir a la red', async () => {
+    const { fetchFn, llamadas } = fetchFalso(() => respuesta(200, { n: 1 }));
+    const { now, avanzar } = reloj();
+    const cache = createApiCache({ fetchFn, now, freshMs: 1000, maxStaleMs: 5000 });
+
+    assert.deepEqual(await cache.get('/libros'), { n: 1 });
+    avanzar(999);
+    assert.deepEqual(await cache.get('/libros'), { n: 1 });
+    assert.equal(llamadas.length, 1);
+});
+
+test('SWR: sirve vencido al instante, revalida y avisa con onUpdate', async () => {
+    let version = 1;
+    const { fetchFn, llamadas } = fetchFalso(() => respuesta(200, { n: version }));
+    const { now, avanzar } = reloj();
+    const cache = createApiCache({ fetchFn, now, freshMs: 1000, maxStaleMs: 5000 });
+
+    await cache.get('/libros');
+    version = 2;
+    avanzar(2000);
+    const actualizaciones = [];
+    const datos = await cache.get('/libros', { onUpdate: (nuevos) => actualizaciones.push(nuevos) });
+
+    assert.deepEqual(datos, { n: 1 }, 'devuelve la copia vencida sin esperar a la red');
+    await esperarMicrotareas();
+    assert.equal(llamadas.length, 2);
+    assert.deepEqual(actualizaciones, [{ n: 2 }]);
+    assert.deepEqual(await cache.get('/libros'), { n: 2 }, 'la revalidación quedó en la caché');
+});
+
+test('SWR: pasado maxStaleMs espera a la red', async () => {
+    let version = 1;
+    const { fetchFn } = fetchFalso(() => respuesta(200, { n: version }));
+    const { now, avanzar } = reloj();
+    const cache = createApiCache({ fetchFn, now, freshMs: 1000, maxStaleMs: 5000 });
+
+    await cache.get('/libros');
+    version = 2;
+    avanzar(5000);
+    assert.deepEqual(await cache.get('/libros'), { n: 2 });
+});
+
+test('deduplicación: requests simultáneas a la misma URL comparten un fetch', async () => {
+    const pendiente = diferida();
+    const { fetchFn, llamadas } = fetchFalso(() => pendiente.promise);
+    const cache = createApiCache({ fetchFn });
+
+    const primera = cache.get('/dashboard/');
+    const segunda = cache.get('/dashboard/');
+    const otra = cache.get('/libros/');
+    assert.equal(llamadas.filter(l => l.url === '/dashboard/').length, 1);
+    assert.equal(llamadas.length, 2);
+
+    pendiente.resolve(respuesta(200, { ok: true }));
+    assert.deepEqual(await primera, { ok: true });
+    assert.deepEqual(await segunda, { ok: true });
+    await otra;
+});
+
+test('deduplicación: terminada la request, la siguiente vuelve a la red', async () => {
+    const { fetchFn, llamadas } = fetchFalso(() => respuesta(200, {}));
+    const { now, avanzar } = reloj();
+    const cache = createApiCache({ fetchFn, now, freshMs: 10, maxStaleMs: 10 });
+
+    await cache.get('/libros');
+    avanzar(10);
+    await cache.get('/libros');
+    assert.equal(llamadas.length, 2);
+});
+
+test('ETag: revalida con If-None-Match y reutiliza los datos en un 304', async () => {
+    const { fetchFn, llamadas } = fetchFalso((url, options, n) =>
+        n === 1 ? respuesta(200, { n: 1 }, '"v1"') : respuesta(304, null, '"v1"'));
+    const { now, avanzar } = reloj();
+    const cache = createApiCache({ fetchFn, now, freshMs: 1000, maxStaleMs: 5000 });
+
+    await cache.get('/libros', { headers: { Authorization: 'Bearer t' } });
+    avanzar(6000);
+    const datos = await cache.get('/libros', { headers: { Authorization: 'Bearer t' } });
+
+    assert.deepEqual(datos, { n: 1 });
+    assert.equal(llamadas[0].options.headers['If-None-Match'], undefined);
+    assert.equal(llamadas[1].options.headers['If-None-Match'], '"v1"');
+    assert.equal(llamadas[1].options.headers.Authorization, 'Bearer t');
+
+    // El 304 renueva la entrada: vuelve a estar fresca
+    await cache.get('/libros');
+    assert.equal(llamadas.length, 2);
+});
+
+test('ETag: un 304 durante la revalidación no dispara onUpdate', async () => {
+    const { fetchFn } = fetchFalso((url, options, n) =>
+        n === 1 ? respuesta(200, { n: 1 }, '"v1"') : respuesta(304, null, '"v1"'));
+    const { now, avanzar } = reloj();
+    const cache = createApiCache({ fetchFn, now, freshMs: 1000, maxStaleMs: 5000 });
+
+    await cache.get('/libros');
+    avanzar(2000);
+    let avisos = 0;
+    await cache.get('/libros', { onUpdate: () => { avisos += 1; } });
+    await esperarMicrotareas();
+    assert.equal(avisos, 0);
+});
+
+test('clear: una respuesta pedida antes de limpiar no se guarda', async () => {
+    const pendiente = diferida();
+    const { fetchFn, llamadas } = fetchFalso((url, options, n) =>
+        n === 1 ? pendiente.promise : respuesta(200, { usuario: 'nuevo' }));
+    const cache = createApiCache({ fetchFn });
+
+    const vieja = cache.get('/dashboard/');
+    cache.clear();
+    pendiente.resolve(respuesta(200, { usuario: 'anterior' }));
+    assert.deepEqual(await vieja, { usuario: 'anterior' });
+
+    assert.deepEqual(await cache.get('/dashboard/'), { usuario: 'nuevo' });
+    assert.equal(llamadas.length, 2);
+});
+
+test('storage: una entrada guardada sobrevive a otra instancia de la caché', async () => {
+    const datos = new Map();
+    const storage = {
+        getItem: (k) => (datos.has(k) ? datos.get(k) : null),
+        setItem: (k, v) => datos.set(k, v),
+        removeItem: (k) => datos.delete(k),
+        key: (i) => [...datos.keys()][i],
+        get length() { return datos.size; }
+    };
+    const { fetchFn, llamadas } = fetchFalso(() => respuesta(200, { n: 1 }));
+    await createApiCache({ fetchFn, storage }).get('/libros');
+
+    assert.deepEqual(await createApiCache({ fetchFn, storage }).get('/libros'), { n: 1 });
+    assert.equal(llamadas.length, 1);
+
+    createApiCache({ fetchFn, storage }).clear();
+    assert.equal(datos.size, 0);
+});
+
+test('cancelación: cada búsqueda nueva aborta la anterior', () => {
+    const siguiente = createLatest();
+    const primera = siguiente();
+    const segunda = siguiente();
+    assert.equal(primera.aborted, true);
+    assert.equal(segunda.aborted, false);
+});
+
+test('cancelación: la búsqueda abortada rechaza con AbortError y no comparte la request', async () => {
+    const fetchFn = (url, { signal }) => new Promise((resolve, reject) => {
+        if (url.includes('titulo=b')) {
+            resolve(respuesta(200, ['b']));
+            return;
+        }
+        signal.addEventListener('abort', () => {
+            reject(new DOMException('Cancelada', 'AbortError'));
+        });
+    });
+    const cache = createApiCache({ fetchFn });
+    const siguiente = createLatest();
+
+    const vieja = cache.get('/libros/search?titulo=a', { signal: siguiente() });
+    const nueva = cache.get('/libros/search?titulo=b', { signal: siguiente() });
+
+    await assert.rejects(vieja, (error) => isAbortError(error));
+    assert.deepEqual(await nueva, ['b']);
+});
+
+test('cancelación: una búsqueda con signal no se une a una request compartida', async () => {
+    const pendiente = diferida();
+    const { fetchFn, llamadas } = fetchFalso(() => pendiente.promise);
+    const cache = createApiCache({ fetchFn });
+
+    const compartida = cache.get('/libros/search?titulo=a');
+    const propia = cache.get('/libros/search?titulo=a', { signal: createLatest()() });
+    assert.equal(llamadas.length, 2);
+    assert.ok(llamadas[1].options.signal);
+
+    pendiente.resolve(respuesta(200, []));
+    await Promise.all([compartida, propia]);
+});
+
+test('isAbortError solo reconoce cancelaciones', () => {
+    assert.equal(isAbortError(new DOMException('x', 'AbortError')), true);
+    assert.equal(isAbortError(new Error('x')), false);
+    assert.equal(Boolean(isAbortError(null)), false);
+});